@@ -1,18 +1,46 @@
 from __future__ import annotations
 
+import asyncio
+from contextlib import asynccontextmanager
+from typing import AsyncIterator
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
+from api.middleware import RequestMetricsMiddleware
+from core.pipeline.jobs import score_state_verify_interval, verify_score_state_periodically
 from infra.logging import setup_logging
-from infra.db import Base, engine
+from infra.db import dispose_engines, get_async_engine, get_engine
+from infra.jobqueue import close_backend
+from infra.redis import close_connections
+from infra.settings import settings
 from api.routers import ingest, heatmap, assets, health, jobs
 
-setup_logging()
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    # Importing the app has no side effects; the schema is managed by alembic.
+    # Engines are created here, but connect only when the first request needs one.
+    setup_logging()
+    get_engine()
+    get_async_engine()
+    # RQ workers get periodic jobs from `rq cron`; local jobs have only this process.
+    interval = score_state_verify_interval() if settings.job_backend == "local" else 0
+    verifier = asyncio.create_task(verify_score_state_periodically(interval)) if interval else None
+    yield
+    if verifier is not None:
+        verifier.cancel()
+    # Local jobs run in this process: finish them before the engines go away.
+    await asyncio.to_thread(close_backend, settings.job_drain_timeout_seconds)
+    await dispose_engines()
+    await close_connections()
+
 
 app = FastAPI(
     title="PAT Trading Heatmap Backend",
     description="Backend service for trading bias heatmap with economic indicators",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
 
 # Configure CORS for web access
@@ -29,7 +57,7 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-Base.metadata.create_all(bind=engine)
+app.add_middleware(RequestMetricsMiddleware)
 
 app.include_router(ingest.router)
 app.include_router(heatmap.router)
@@ -46,6 +74,9 @@ def root():
         "endpoints": {
             "heatmap_single": "/heatmap?asset=USD",
             "heatmap_batch": "/heatmap/batch?assets=USD,EUR,GBP",
+            "heatmap_all": "/heatmap/batch?assets=*",
+            "heatmap_stream": "/heatmap/stream?assets=USD,EUR",
+            "heatmap_ws": "/heatmap/ws?assets=USD,EUR",
             "health": "/health",
             "metrics": "/metrics",
             "assets": "/assets/{symbol}/indicators"
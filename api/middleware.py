@@ -0,0 +1,59 @@
+"""ASGI middleware recording per-route request metrics."""
+from __future__ import annotations
+
+import time
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from infra.db import QueryStats, track_queries
+from infra.metrics import HTTP_REQUEST_SECONDS, SQL_SECONDS, SQL_STATEMENTS
+from infra.profiling import profiled
+from infra.settings import settings
+
+
+def server_timing(stats: QueryStats, elapsed: float) -> bytes:
+    """``Server-Timing`` value with DB time, statement count and total time so far."""
+    return (
+        f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.statements} statements", '
+        f"app;dur={elapsed * 1000:.1f}"
+    ).encode()
+
+
+class RequestMetricsMiddleware:
+    """Observe latency and SQL statements and time per request, labelled by route template.
+
+    Plain ASGI rather than ``BaseHTTPMiddleware`` so streamed bodies are not
+    buffered and the statements they run are still attributed to the request.
+    The ``Server-Timing`` header is sent with the response headers, so for a
+    streamed body it only covers the work done before the first chunk.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        status = 500
+        start = time.perf_counter()
+
+        with track_queries() as stats, profiled("request", scope["path"]):
+
+            async def send_wrapper(message: Message) -> None:
+                nonlocal status
+                if message["type"] == "http.response.start":
+                    status = message["status"]
+                    if settings.server_timing_enabled:
+                        timing = server_timing(stats, time.perf_counter() - start)
+                        message["headers"] = [*message.get("headers", []), (b"server-timing", timing)]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                route = scope.get("route")
+                name = getattr(route, "path", "unmatched")
+                HTTP_REQUEST_SECONDS.labels(scope["method"], name, str(status)).observe(time.perf_counter() - start)
+                SQL_STATEMENTS.labels("request", name).observe(stats.statements)
+                SQL_SECONDS.labels("request", name).observe(stats.db_seconds)
@@ -1,18 +1,27 @@
 from __future__ import annotations
 
+import json
 from datetime import datetime
-from typing import List, Optional
+from itertools import islice
+from typing import Any, AsyncIterable, AsyncIterator, Iterable, List, Literal, Optional, Sequence
 
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy import func, select
 from pydantic import BaseModel
 
 from api.schemas.base import ORMBase
-from infra.db import get_session, Asset, Indicator, Score
+from infra.db import get_async_session, get_async_sessionmaker, Asset, AssetStats, Indicator, LatestScore, db_timestamp
+from infra.settings import settings
+from infra.tsstore import get_store
+from core.timeseries import Aggregate, Resolution, decode_cursor, encode_cursor, series_stmt
 
 router = APIRouter(prefix="/assets", tags=["assets"])
 
+# Rows fetched per round-trip when streaming an unpaginated series.
+STREAM_BATCH = 1000
+
 
 class IndicatorOut(ORMBase):
     key: str
@@ -34,92 +43,168 @@ class AssetSummary(BaseModel):
     last_updated: Optional[datetime]
 
 
-@router.get("/", response_model=List[AssetSummary])
-def list_assets(session: Session = Depends(get_session)) -> List[AssetSummary]:
-    """List all assets with summary information"""
-    assets = session.query(Asset).all()
-    summaries = []
-
-    for asset in assets:
-        # Get latest score
-        latest_score = (
-            session.query(Score)
-            .filter_by(asset_id=asset.id)
-            .order_by(Score.ts.desc())
-            .first()
-        )
+def _summary_query():
+    """Assets with their latest score and indicator stats, in one statement.
 
-        # Get indicator count and last update
-        indicator_stats = (
-            session.query(
-                func.count(Indicator.id).label('count'),
-                func.max(Indicator.ts).label('last_updated')
-            )
-            .filter_by(asset_id=asset.id)
-            .first()
+    Stats come from ``asset_stats`` when it is maintained, otherwise from
+    correlated aggregates that only run for the rows actually returned.
+    """
+    if settings.asset_stats_enabled:
+        count = func.coalesce(AssetStats.indicator_count, 0)
+        last_updated = AssetStats.last_updated
+    else:
+        count = (
+            select(func.count(Indicator.id)).where(Indicator.asset_id == Asset.id).scalar_subquery()
+        )
+        last_updated = select(func.max(Indicator.ts)).where(Indicator.asset_id == Asset.id).scalar_subquery()
+    q = (
+        select(
+            Asset,
+            LatestScore.total,
+            LatestScore.ts,
+            count.label("indicator_count"),
+            last_updated.label("last_updated"),
         )
+        .outerjoin(LatestScore, LatestScore.asset_id == Asset.id)
+    )
+    if settings.asset_stats_enabled:
+        q = q.outerjoin(AssetStats, AssetStats.asset_id == Asset.id)
+    return q
+
+
+def _summary(row) -> AssetSummary:
+    asset, total, ts, indicator_count, last_updated = row
+    return AssetSummary(
+        asset=AssetOut.model_validate(asset),
+        latest_score=total,
+        latest_score_ts=ts,
+        indicator_count=indicator_count or 0,
+        last_updated=last_updated,
+    )
 
-        summaries.append(AssetSummary(
-            asset=AssetOut.model_validate(asset),
-            latest_score=latest_score.total if latest_score else None,
-            latest_score_ts=latest_score.ts if latest_score else None,
-            indicator_count=indicator_stats.count or 0,
-            last_updated=indicator_stats.last_updated
-        ))
 
+@router.get("/", response_model=List[AssetSummary])
+async def list_assets(
+    response: Response,
+    kind: Optional[str] = None,
+    after: Optional[int] = Query(None, description="Return assets with an id greater than this cursor"),
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    session: AsyncSession = Depends(get_async_session),
+) -> List[AssetSummary]:
+    """List assets with summary information, ordered by id.
+
+    With ``limit`` set, the ``X-Next-Cursor`` header carries the ``after``
+    value for the next page when there may be more rows.
+    """
+    q = _summary_query()
+    if kind:
+        q = q.where(Asset.kind == kind)
+    if after is not None:
+        q = q.where(Asset.id > after)
+    q = q.order_by(Asset.id)
+    if limit:
+        q = q.limit(limit)
+    summaries = [_summary(row) for row in await session.execute(q)]
+    if limit and len(summaries) == limit:
+        response.headers["X-Next-Cursor"] = str(summaries[-1].asset.id)
     return summaries
 
 
+def _iso(ts: datetime) -> str:
+    # Same rendering pydantic uses for IndicatorOut.ts
+    return ts.isoformat().replace("+00:00", "Z")
+
+
+def _point(key: str, ts: datetime, value: float) -> bytes:
+    return json.dumps({"key": key, "ts": _iso(ts), "value": float(value)}, separators=(",", ":")).encode()
+
+
+async def _encode(points: AsyncIterable[tuple[str, datetime, float]], fmt: str) -> AsyncIterator[bytes]:
+    if fmt == "ndjson":
+        async for point in points:
+            yield _point(*point) + b"\n"
+        return
+    yield b"["
+    first = True
+    async for point in points:
+        yield _point(*point) if first else b"," + _point(*point)
+        first = False
+    yield b"]"
+
+
+async def _page_rows(points: Iterable[tuple[str, datetime, float]]) -> AsyncIterator[tuple[str, datetime, float]]:
+    for point in points:
+        yield point
+
+
+async def _stream_rows(stmt) -> AsyncIterator[tuple[str, datetime, float]]:
+    # Own session: the request-scoped one may be closed before the body is streamed
+    async with get_async_sessionmaker()() as session:
+        result = await session.stream(stmt.execution_options(yield_per=STREAM_BATCH))
+        async for row in result:
+            yield row
+
+
 @router.get("/{symbol}/indicators", response_model=List[IndicatorOut])
-def get_indicators(
+async def get_indicators(
     symbol: str,
     from_: datetime | None = None,
     to: datetime | None = None,
-    session: Session = Depends(get_session)
-) -> List[IndicatorOut]:
-    """Get indicators for a specific asset"""
-    asset = session.query(Asset).filter_by(symbol=symbol).first()
-    if not asset:
+    key: Optional[str] = Query(None, description="Comma-separated indicator keys"),
+    resolution: Optional[Resolution] = Query(None, description="Bucket points server-side"),
+    agg: Aggregate = Query("last", description="Bucket aggregate when resolution is set"),
+    limit: Optional[int] = Query(None, ge=1, le=10000, description="Page size; enables X-Next-Cursor"),
+    cursor: Optional[str] = None,
+    format: Literal["json", "ndjson"] = "json",
+    session: AsyncSession = Depends(get_async_session)
+) -> StreamingResponse:
+    """Get indicators for a specific asset as a streamed JSON array or NDJSON.
+
+    Rows are ordered by ``(ts, key)``. With ``limit`` set, at most one page is
+    read and the ``X-Next-Cursor`` header holds the ``cursor`` for the next one.
+    """
+    asset_id = await session.scalar(select(Asset.id).where(Asset.symbol == symbol))
+    if asset_id is None:
         raise HTTPException(status_code=404, detail="asset not found")
-    q = session.query(Indicator).filter_by(asset_id=asset.id)
-    if from_:
-        q = q.filter(Indicator.ts >= from_)
-    if to:
-        q = q.filter(Indicator.ts <= to)
-    q = q.order_by(Indicator.ts.asc())
-    indicators = [IndicatorOut.model_validate(i) for i in q.all()]
-    return indicators
+    try:
+        after = decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    keys = [k.strip() for k in key.split(",") if k.strip()] if key else None
+
+    headers = {}
+    media_type = "application/x-ndjson" if format == "ndjson" else "application/json"
+    store = get_store()
+    store_keys: list[str] = []
+    covered: list[str] = []
+    if store is not None and resolution is None:
+        store_keys, covered = store.coverage(asset_id, keys)
+    points: Sequence[Any]
+    if store is not None and store_keys and set(store_keys) <= set(covered):
+        # Raw points of series the local store covers; anything else is read from the database.
+        stored = (
+            (k, db_timestamp(session.sync_session, ts), v)
+            for k, ts, v in store.points(asset_id, store_keys, from_, to, after)
+        )
+        if not limit:
+            return StreamingResponse(_encode(_page_rows(stored), format), media_type=media_type)
+        points = list(islice(stored, limit + 1))
+    else:
+        stmt = series_stmt(session.sync_session, asset_id, keys, from_, to, resolution, agg, after)
+        if not limit:
+            return StreamingResponse(_encode(_stream_rows(stmt), format), media_type=media_type)
+        points = (await session.execute(stmt.limit(limit + 1))).all()
+    if len(points) > limit:
+        points = points[:limit]
+        last_key, last_ts, _ = points[-1]
+        headers["X-Next-Cursor"] = encode_cursor(last_ts, last_key)
+    return StreamingResponse(_encode(_page_rows(points), format), media_type=media_type, headers=headers)
 
 
 @router.get("/{symbol}", response_model=AssetSummary)
-def get_asset(symbol: str, session: Session = Depends(get_session)) -> AssetSummary:
+async def get_asset(symbol: str, session: AsyncSession = Depends(get_async_session)) -> AssetSummary:
     """Get detailed information about a specific asset"""
-    asset = session.query(Asset).filter_by(symbol=symbol).first()
-    if not asset:
+    row = (await session.execute(_summary_query().where(Asset.symbol == symbol))).first()
+    if not row:
         raise HTTPException(status_code=404, detail="asset not found")
-
-    # Get latest score
-    latest_score = (
-        session.query(Score)
-        .filter_by(asset_id=asset.id)
-        .order_by(Score.ts.desc())
-        .first()
-    )
-
-    # Get indicator count and last update
-    indicator_stats = (
-        session.query(
-            func.count(Indicator.id).label('count'),
-            func.max(Indicator.ts).label('last_updated')
-        )
-        .filter_by(asset_id=asset.id)
-        .first()
-    )
-
-    return AssetSummary(
-        asset=AssetOut.model_validate(asset),
-        latest_score=latest_score.total if latest_score else None,
-        latest_score_ts=latest_score.ts if latest_score else None,
-        indicator_count=indicator_stats.count or 0,
-        last_updated=indicator_stats.last_updated
-    )
+    return _summary(row)
@@ -1,9 +1,10 @@
 from __future__ import annotations
 
 from fastapi import APIRouter
-from prometheus_client import generate_latest, CONTENT_TYPE_LATEST
 from fastapi.responses import Response
 
+from infra.metrics import exposition
+
 router = APIRouter(tags=["health"])
 
 
@@ -14,5 +15,5 @@ def health() -> dict:
 
 @router.get("/metrics")
 def metrics() -> Response:
-    data = generate_latest()
-    return Response(content=data, media_type=CONTENT_TYPE_LATEST)
+    data, content_type = exposition()
+    return Response(content=data, media_type=content_type)
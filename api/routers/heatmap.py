@@ -1,126 +1,275 @@
 from __future__ import annotations
 
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException, Query
-from sqlalchemy.orm import Session
+import asyncio
+from datetime import datetime
+from typing import Any, AsyncIterator, List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
+from fastapi.responses import Response, StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 
-from api.schemas.heatmap import HeatmapResponse, HeatmapBatchResponse, Pillar, Component
-from infra.db import get_session, Asset, Score
+import orjson
+import redis
+
+from api.schemas.heatmap import HeatmapResponse, HeatmapBatchResponse
+from infra import cache
+from infra.db import get_async_session, get_async_sessionmaker, Asset, LatestScore
+from infra.metrics import STREAM_CLIENTS, STREAM_MESSAGES_SENT
+from infra.pubsub import Hub, Subscription
+from infra.settings import settings
 
 router = APIRouter(prefix="", tags=["heatmap"])
 
 
-@router.get("/heatmap", response_model=HeatmapResponse)
-def get_heatmap(asset: str, session: Session = Depends(get_session)) -> HeatmapResponse:
-    asset_obj = session.query(Asset).filter_by(symbol=asset).first()
-    if not asset_obj:
-        raise HTTPException(status_code=404, detail="asset not found")
-    score = (
-        session.query(Score)
-        .filter_by(asset_id=asset_obj.id)
-        .order_by(Score.ts.desc())
-        .first()
-    )
-    if not score:
-        raise HTTPException(status_code=404, detail="score not found")
-    pillars = []
-    for name, comps in score.breakdown.items():
-        components = [Component(key=c[0], score=c[1]) for c in comps]
-        pscore = sum(c.score for c in components)
-        pillars.append(Pillar(name=name, score=pscore, components=components))
-    return HeatmapResponse(
-        asset=asset,
-        score=score.total,
-        scale=(-24, 24),
-        pillars=pillars,
-        as_of=score.ts,
-        version=score.version,
-    )
+def _etag_matches(if_none_match: str, tag: str) -> bool:
+    """Whether an ``If-None-Match`` header lists ``tag``, using weak comparison (``W/`` ignored)."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(candidate.strip().removeprefix("W/") == tag for candidate in if_none_match.split(","))
 
 
-def _normalize_score_for_heatmap(backend_score: int) -> float:
-    """Normalize backend score (-24 to +24) to heatmap range (-2 to +2)"""
-    # Clamp to valid backend range
-    backend_score = max(-24, min(24, backend_score))
-    # Scale to heatmap range: -24→-2, 0→0, +24→+2
-    return round(backend_score / 12.0, 2)
+def _json_response(body: bytes, request: Request) -> Response:
+    """Serve pre-serialized JSON with an ETag, or 304 when the client already has it."""
+    tag = cache.etag(body)
+    if _etag_matches(request.headers.get("if-none-match", ""), tag):
+        return Response(status_code=304, headers={"ETag": tag})
+    return Response(content=body, media_type="application/json", headers={"ETag": tag})
 
 
-def _get_heatmap_for_asset(session: Session, asset_symbol: str) -> HeatmapResponse:
-    """Get heatmap response for a single asset"""
-    asset_obj = session.query(Asset).filter_by(symbol=asset_symbol).first()
-    if not asset_obj:
-        raise HTTPException(status_code=404, detail=f"asset '{asset_symbol}' not found")
+def _heatmap_json(
+    asset: str,
+    score: int | float,
+    scale: tuple[int, int],
+    pillars: list[dict[str, Any]],
+    as_of: datetime | None,
+    version: str,
+) -> bytes:
+    """Encode a heatmap entry without building models.
 
-    score = (
-        session.query(Score)
-        .filter_by(asset_id=asset_obj.id)
-        .order_by(Score.ts.desc())
-        .first()
+    The bytes equal ``HeatmapResponse(...).model_dump_json()`` for projection
+    rows: ``pillars`` is stored already shaped by ``shape_pillars``, in the
+    models' field order and types, and ``OPT_UTC_Z`` writes UTC timestamps
+    with pydantic's ``Z`` suffix. ``HeatmapResponse`` stays the documented
+    schema of these endpoints.
+    """
+    return orjson.dumps(
+        {"asset": asset, "score": score, "scale": scale, "pillars": pillars, "as_of": as_of, "version": version},
+        option=orjson.OPT_UTC_Z,
     )
-    if not score:
-        # Return default response if no score found
-        return HeatmapResponse(
-            asset=asset_symbol,
-            score=0,
-            scale=(-2, 2),  # Normalized scale for heatmap
-            pillars=[],
-            as_of=None,
-            version="0.0.0",
+
+
+async def _build_heatmap(session: AsyncSession, asset: str) -> bytes:
+    row = (
+        await session.execute(
+            select(Asset.id, LatestScore)
+            .outerjoin(LatestScore, LatestScore.asset_id == Asset.id)
+            .where(Asset.symbol == asset)
         )
+    ).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="asset not found")
+    latest = row.LatestScore
+    if not latest:
+        raise HTTPException(status_code=404, detail="score not found")
+    return _heatmap_json(asset, latest.total, (-24, 24), latest.pillars, latest.ts, latest.version)
 
-    pillars = []
-    for name, comps in score.breakdown.items():
-        components = [Component(key=c[0], score=c[1]) for c in comps]
-        pscore = sum(c.score for c in components)
-        pillars.append(Pillar(name=name, score=pscore, components=components))
-
-    # Normalize score for heatmap display
-    normalized_score = _normalize_score_for_heatmap(score.total)
-
-    return HeatmapResponse(
-        asset=asset_symbol,
-        score=normalized_score,
-        scale=(-2, 2),  # Normalized scale for heatmap
-        pillars=pillars,
-        as_of=score.ts,
-        version=score.version,
-    )
+
+@router.get("/heatmap", response_model=HeatmapResponse)
+async def get_heatmap(asset: str, request: Request, session: AsyncSession = Depends(get_async_session)) -> Response:
+    key = cache.heatmap_key(asset, "raw")
+    body = (await cache.get_many([key]))[0]
+    if body is None:
+        body = await _build_heatmap(session, asset)
+        await cache.set_many({key: body})
+    return _json_response(body, request)
+
+
+def _heatmap_for_asset(asset_symbol: str, latest: LatestScore | None) -> bytes:
+    """Normalized heatmap entry for one asset of a batch"""
+    if not latest:
+        # Return default response if no score found
+        return _heatmap_json(asset_symbol, 0, (-2, 2), [], None, "0.0.0")
+    # Normalized scale for heatmap
+    return _heatmap_json(asset_symbol, latest.heatmap_score, (-2, 2), latest.pillars, latest.ts, latest.version)
+
+
+async def _latest_by_symbol(session: AsyncSession, symbols: List[str] | None) -> dict[str, LatestScore | None]:
+    """Resolve symbols (all assets when None) and their latest scores with one joined query"""
+    q = select(Asset.symbol, LatestScore).outerjoin(LatestScore, LatestScore.asset_id == Asset.id)
+    if symbols is not None:
+        q = q.where(Asset.symbol.in_(symbols))
+    return {symbol: latest for symbol, latest in await session.execute(q.order_by(Asset.symbol))}
 
 
 @router.get("/heatmap/batch", response_model=HeatmapBatchResponse)
-def get_heatmap_batch(
-    assets: str = Query(..., description="Comma-separated list of asset symbols (e.g., 'USD,EUR,GBP')"),
-    session: Session = Depends(get_session)
-) -> HeatmapBatchResponse:
+async def get_heatmap_batch(
+    request: Request,
+    assets: str = Query(
+        ...,
+        description="Comma-separated list of asset symbols (e.g., 'USD,EUR,GBP'), or '*' for every asset",
+    ),
+    session: AsyncSession = Depends(get_async_session)
+) -> Response:
     """Get heatmap data for multiple assets in a single request"""
-    # Parse asset symbols
-    asset_symbols = [symbol.strip().upper() for symbol in assets.split(",") if symbol.strip()]
+    resolved: dict[str, LatestScore | None] | None = None
+    if assets.strip() == "*":
+        resolved = await _latest_by_symbol(session, None)
+        asset_symbols = list(resolved)
+    else:
+        # Parse asset symbols
+        asset_symbols = [symbol.strip().upper() for symbol in assets.split(",") if symbol.strip()]
 
-    if not asset_symbols:
-        raise HTTPException(status_code=400, detail="No valid asset symbols provided")
+        if not asset_symbols:
+            raise HTTPException(status_code=400, detail="No valid asset symbols provided")
 
-    if len(asset_symbols) > 20:  # Reasonable limit
-        raise HTTPException(status_code=400, detail="Too many assets requested (max 20)")
+        limit = settings.heatmap_batch_max_assets
+        if len(asset_symbols) > limit:
+            raise HTTPException(status_code=400, detail=f"Too many assets requested (max {limit})")
 
-    # Get heatmap data for each asset
-    heatmaps = []
+    # Per-asset entries come from one MGET; misses are resolved with one query
+    keys = [cache.heatmap_key(symbol, "heatmap") for symbol in asset_symbols]
+    parts: List[bytes | None] = await cache.get_many(keys)
+    missing = [symbol for symbol, part in zip(asset_symbols, parts) if part is None]
+    if resolved is None:
+        resolved = await _latest_by_symbol(session, sorted(set(missing))) if missing else {}
+    fresh: dict[str, bytes] = {}
     errors = []
 
-    for symbol in asset_symbols:
-        try:
-            heatmap = _get_heatmap_for_asset(session, symbol)
-            heatmaps.append(heatmap)
-        except HTTPException as e:
-            if e.status_code == 404:
-                errors.append(f"Asset '{symbol}' not found")
-            else:
-                errors.append(f"Error processing '{symbol}': {e.detail}")
-        except Exception as e:
-            errors.append(f"Unexpected error processing '{symbol}': {str(e)}")
-
-    return HeatmapBatchResponse(
-        heatmaps=heatmaps,
-        requested_assets=asset_symbols,
-        errors=errors if errors else None
+    for i, symbol in enumerate(asset_symbols):
+        if parts[i] is not None:
+            continue
+        if symbol not in resolved:
+            errors.append(f"Asset '{symbol}' not found")
+            continue
+        parts[i] = fresh[keys[i]] = _heatmap_for_asset(symbol, resolved[symbol])
+    await cache.set_many(fresh)
+
+    body = b"".join([
+        b'{"heatmaps":[',
+        b",".join(part for part in parts if part is not None),
+        b'],"requested_assets":',
+        orjson.dumps(asset_symbols),
+        b',"errors":',
+        orjson.dumps(errors or None),
+        b"}",
+    ])
+    return _json_response(body, request)
+
+
+def _decode_update(data: bytes) -> tuple[str, bytes]:
+    """Published update -> (symbol, body shaped like a /heatmap/batch entry)."""
+    update = orjson.loads(data)
+    as_of = datetime.fromisoformat(update["as_of"])
+    body = _heatmap_json(update["asset"], update["score"], (-2, 2), update["pillars"], as_of, update["version"])
+    return update["asset"], body
+
+
+hub = Hub(_decode_update)
+
+
+def _parse_subscription(assets: str) -> set[str] | None:
+    """Symbols to follow (None for every asset); raises 400 like /heatmap/batch."""
+    if assets.strip() == "*":
+        return None
+    symbols = {symbol.strip().upper() for symbol in assets.split(",") if symbol.strip()}
+    if not symbols:
+        raise HTTPException(status_code=400, detail="No valid asset symbols provided")
+    if len(symbols) > settings.heatmap_batch_max_assets:
+        raise HTTPException(status_code=400, detail=f"Too many assets requested (max {settings.heatmap_batch_max_assets})")
+    return symbols
+
+
+async def _snapshot(symbols: set[str] | None) -> list[bytes]:
+    """Current entries of the followed assets, sent before any update."""
+    async with get_async_sessionmaker()() as session:
+        resolved = await _latest_by_symbol(session, sorted(symbols) if symbols is not None else None)
+    return [_heatmap_for_asset(symbol, latest) for symbol, latest in resolved.items()]
+
+
+async def _subscribe(symbols: set[str] | None) -> Subscription:
+    if not settings.heatmap_stream_enabled:
+        raise HTTPException(status_code=503, detail="heatmap streaming is disabled")
+    try:
+        return await hub.subscribe(symbols)
+    except redis.RedisError:
+        raise HTTPException(status_code=503, detail="heatmap stream unavailable")
+
+
+async def _sse(subscription: Subscription, snapshot: list[bytes]) -> AsyncIterator[bytes]:
+    STREAM_CLIENTS.labels("sse").inc()
+    try:
+        yield b"event: snapshot\ndata: [" + b",".join(snapshot) + b"]\n\n"
+        while True:
+            bodies = await subscription.drain(settings.heatmap_stream_keepalive_seconds)
+            if not bodies:
+                yield b": keepalive\n\n"
+                continue
+            for body in bodies:
+                yield b"event: heatmap\ndata: " + body + b"\n\n"
+            STREAM_MESSAGES_SENT.labels("sse").inc(len(bodies))
+    finally:
+        STREAM_CLIENTS.labels("sse").dec()
+        hub.unsubscribe(subscription)
+
+
+@router.get("/heatmap/stream")
+async def stream_heatmap(
+    assets: str = Query("*", description="Comma-separated asset symbols to follow, or '*' for every asset"),
+) -> StreamingResponse:
+    """Server-sent events: a ``snapshot`` of the followed assets, then one ``heatmap``
+    event per asset whose score changes, shaped like a ``/heatmap/batch`` entry."""
+    symbols = _parse_subscription(assets)
+    subscription = await _subscribe(symbols)
+    try:
+        snapshot = await _snapshot(symbols)
+    except BaseException:
+        hub.unsubscribe(subscription)
+        raise
+    return StreamingResponse(
+        _sse(subscription, snapshot),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
     )
+
+
+@router.websocket("/heatmap/ws")
+async def heatmap_ws(websocket: WebSocket, assets: str = "*") -> None:
+    """WebSocket variant of ``/heatmap/stream``.
+
+    Sends ``{"type": "snapshot", "heatmaps": [...]}`` and then
+    ``{"type": "update", "heatmap": {...}}`` messages.
+    """
+    try:
+        symbols = _parse_subscription(assets)
+        subscription = await _subscribe(symbols)
+    except HTTPException as e:
+        await websocket.close(code=1008 if e.status_code == 400 else 1011, reason=str(e.detail))
+        return
+    await websocket.accept()
+    STREAM_CLIENTS.labels("websocket").inc()
+    # Read concurrently so a client that goes away is noticed without waiting for an update.
+    receiver = asyncio.ensure_future(websocket.receive())
+    try:
+        snapshot = await _snapshot(symbols)
+        await websocket.send_text('{"type":"snapshot","heatmaps":[' + b",".join(snapshot).decode() + "]}")
+        while True:
+            drainer = asyncio.ensure_future(subscription.drain(settings.heatmap_stream_keepalive_seconds))
+            done, _ = await asyncio.wait({receiver, drainer}, return_when=asyncio.FIRST_COMPLETED)
+            if drainer not in done:
+                drainer.cancel()
+            else:
+                bodies = drainer.result()
+                for body in bodies:
+                    await websocket.send_text('{"type":"update","heatmap":' + body.decode() + "}")
+                STREAM_MESSAGES_SENT.labels("websocket").inc(len(bodies))
+            if receiver.done():
+                if receiver.result()["type"] == "websocket.disconnect":
+                    break
+                # Client messages carry nothing yet; keep listening for the disconnect.
+                receiver = asyncio.ensure_future(websocket.receive())
+    except WebSocketDisconnect:
+        pass
+    finally:
+        receiver.cancel()
+        STREAM_CLIENTS.labels("websocket").dec()
+        hub.unsubscribe(subscription)
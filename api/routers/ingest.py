@@ -1,39 +1,159 @@
 from __future__ import annotations
 
-from fastapi import APIRouter, Depends, HTTPException, status
+import zlib
+from queue import Full
+from typing import AsyncIterator, Iterator
+
+import structlog
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import JSONResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 
-from api.schemas.ingest import EventBatch
-from infra.db import get_session, Asset, Event
-from infra.redis import queue
-from core.pipeline.jobs import normalize_event_job
+from api.schemas.ingest import EventBatch, EventDTO, ChunkReport, RejectedLine, StreamIngestReport
+from infra.db import get_session, SessionLocal
+from infra.settings import settings
+from core.pipeline.ingest import IngestResult, ingest_and_enqueue
 
 router = APIRouter(prefix="/ingest", tags=["ingest"])
+log = structlog.get_logger(__name__)
+
+# Longest accepted NDJSON line; anything beyond is rejected without buffering it.
+MAX_LINE_BYTES = 1 << 20
+# Most bytes inflated from a gzip body per decompress call.
+INFLATE_STEP = 64 << 10
+# Rejected-line samples reported per chunk.
+MAX_ERRORS_PER_CHUNK = 10
 
 
 @router.post("/events", status_code=status.HTTP_202_ACCEPTED)
 def ingest_events(batch: EventBatch, session: Session = Depends(get_session)) -> dict:
     if len(batch.events) > 1000:
         raise HTTPException(status_code=400, detail="batch too large")
-    for ev in batch.events:
-        asset = session.query(Asset).filter_by(symbol=ev.asset).first()
-        if not asset:
-            asset = Asset(symbol=ev.asset, kind="unknown")
-            session.add(asset)
-            session.commit()
-            session.refresh(asset)
-        exists = session.query(Event).filter_by(trace_id=str(ev.trace_id)).first()
-        if exists:
+    try:
+        result = ingest_and_enqueue(session, batch.events)
+    except Full:
+        # Nothing was stored; the client resends the batch later.
+        raise HTTPException(status_code=503, detail="job queue full", headers={"Retry-After": "5"})
+    return {"status": "accepted", "accepted": result.accepted, "duplicates": result.duplicates}
+
+
+async def _ndjson_lines(body: AsyncIterator[bytes], gzipped: bool) -> AsyncIterator[tuple[int, bytes | None]]:
+    """Yield ``(line_number, line)`` as the body arrives; ``line`` is None when oversized.
+
+    Gzip input is inflated at most ``INFLATE_STEP`` bytes at a time, so neither a
+    highly compressed body nor an endless line is ever held in memory whole. A
+    body of several concatenated gzip members (``cat a.gz b.gz``) is read whole.
+    """
+    inflater = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    buf = b""
+    lineno = 0
+    skipping = False
+
+    def split(data: bytes) -> Iterator[tuple[int, bytes | None]]:
+        nonlocal buf, lineno, skipping
+        while data:
+            nl = data.find(b"\n")
+            if nl < 0:
+                if not skipping:
+                    buf += data
+                    if len(buf) > MAX_LINE_BYTES:
+                        buf, skipping = b"", True
+                return
+            lineno += 1
+            if skipping or len(buf) + nl > MAX_LINE_BYTES:
+                yield lineno, None
+            else:
+                yield lineno, buf + data[:nl]
+            buf, skipping = b"", False
+            data = data[nl + 1:]
+
+    async for raw in body:
+        if inflater is None:
+            for item in split(raw):
+                yield item
             continue
-        event = Event(
-            trace_id=str(ev.trace_id),
-            source=ev.source,
-            asset_id=asset.id,
-            kind=ev.kind,
-            ingested_at=ev.ingested_at,
-            payload=ev.payload,
-        )
-        session.add(event)
-        session.commit()
-        queue.enqueue(normalize_event_job, event.trace_id)
-    return {"status": "accepted"}
+        data = inflater.decompress(raw, INFLATE_STEP)
+        while True:
+            for item in split(data):
+                yield item
+            if inflater.unconsumed_tail:
+                data = inflater.decompress(inflater.unconsumed_tail, INFLATE_STEP)
+            elif inflater.eof and inflater.unused_data:
+                # The next gzip member starts here.
+                rest = inflater.unused_data
+                inflater = zlib.decompressobj(16 + zlib.MAX_WBITS)
+                data = inflater.decompress(rest, INFLATE_STEP)
+            else:
+                break
+    if inflater:
+        for item in split(inflater.flush()):
+            yield item
+    if buf.strip() or skipping:
+        yield lineno + 1, None if skipping or len(buf) > MAX_LINE_BYTES else buf
+
+
+def _commit_chunk(events: list[EventDTO]) -> IngestResult:
+    with SessionLocal() as session:
+        return ingest_and_enqueue(session, events)
+
+
+@router.post("/events/stream", status_code=status.HTTP_202_ACCEPTED, response_model=StreamIngestReport)
+async def ingest_event_stream(request: Request) -> JSONResponse:
+    """Ingest newline-delimited JSON events, committing every ``ingest_stream_chunk_size`` lines.
+
+    Send ``Content-Encoding: gzip`` for a gzip-compressed body. Chunks are committed
+    independently, so after a failure the client resends from ``resume_from_line``.
+    """
+    gzipped = request.headers.get("content-encoding", "").lower() == "gzip"
+    chunk_size = settings.ingest_stream_chunk_size
+    report = StreamIngestReport(status="accepted")
+    events: list[EventDTO] = []
+    current = ChunkReport(chunk=0, first_line=1, last_line=0)
+
+    async def flush() -> None:
+        nonlocal current, events
+        if events:
+            result = await run_in_threadpool(_commit_chunk, events)
+            current.accepted = result.accepted
+            current.duplicates = result.duplicates
+        report.accepted += current.accepted
+        report.duplicates += current.duplicates
+        report.rejected += current.rejected
+        report.chunks.append(current)
+        current = ChunkReport(chunk=current.chunk + 1, first_line=current.last_line + 1, last_line=current.last_line)
+        events = []
+
+    try:
+        async for lineno, line in _ndjson_lines(request.stream(), gzipped):
+            current.last_line = lineno
+            if line is None:
+                current.rejected += 1
+                if len(current.errors) < MAX_ERRORS_PER_CHUNK:
+                    current.errors.append(RejectedLine(line=lineno, error="line too long"))
+            elif line.strip():
+                try:
+                    events.append(EventDTO.model_validate_json(line))
+                except ValidationError as exc:
+                    current.rejected += 1
+                    if len(current.errors) < MAX_ERRORS_PER_CHUNK:
+                        current.errors.append(RejectedLine(line=lineno, error=str(exc.errors()[0]["msg"])))
+            if lineno - current.first_line + 1 >= chunk_size:
+                await flush()
+        if current.last_line >= current.first_line:
+            await flush()
+    except Exception as exc:
+        report.status = "partial"
+        report.resume_from_line = current.first_line
+        if isinstance(exc, Full):
+            # A full job queue rejects the chunk before committing it; the client resends from there later.
+            report.error = "job queue full"
+            code = 503
+        else:
+            # Details stay in the log; the client only learns where to resume.
+            log.exception("ingest_stream_failed", line=current.last_line, resume_from_line=current.first_line)
+            report.error = f"internal error at line {current.last_line}"
+            code = 500
+        return JSONResponse(status_code=code, content=report.model_dump())
+    return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=report.model_dump())
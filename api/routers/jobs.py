@@ -1,22 +1,36 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from fastapi import APIRouter, Depends
 from sqlalchemy.orm import Session
 
 from infra.db import get_session, Asset
-from infra.redis import queue
-from core.pipeline.jobs import recompute_score_job
+from infra.jobqueue import get_backend
+from core.pipeline.jobs import asset_key, recompute_score_job, rescore_all_job
 
 router = APIRouter(prefix="/jobs", tags=["jobs"])
 
 
 @router.post("/recompute-bias")
-def recompute(asset: str | None = None, session: Session = Depends(get_session)) -> dict:
+def recompute(
+    asset: str | None = None,
+    mode: Literal["per_asset", "bulk"] = "per_asset",
+    session: Session = Depends(get_session),
+) -> dict:
+    """Recompute scores for one asset, or for all assets.
+
+    ``mode=bulk`` rescores the whole universe in a single vectorized job
+    instead of one job per asset; it is ignored when ``asset`` is given.
+    """
+    backend = get_backend()
     if asset:
         asset_obj = session.query(Asset).filter_by(symbol=asset).first()
         if asset_obj:
-            queue.enqueue(recompute_score_job, asset_obj.id)
+            backend.enqueue(recompute_score_job, asset_obj.id, key=asset_key(asset_obj.id))
+    elif mode == "bulk":
+        backend.enqueue(rescore_all_job)
     else:
         for a in session.query(Asset).all():
-            queue.enqueue(recompute_score_job, a.id)
+            backend.enqueue(recompute_score_job, a.id, key=asset_key(a.id))
     return {"status": "queued"}
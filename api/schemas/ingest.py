@@ -20,3 +20,28 @@ class EventDTO(BaseModel):
 
 class EventBatch(BaseModel):
     events: List[EventDTO]
+
+
+class RejectedLine(BaseModel):
+    line: int
+    error: str
+
+
+class ChunkReport(BaseModel):
+    chunk: int
+    first_line: int
+    last_line: int
+    accepted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    errors: List[RejectedLine] = []
+
+
+class StreamIngestReport(BaseModel):
+    status: str
+    accepted: int = 0
+    duplicates: int = 0
+    rejected: int = 0
+    chunks: List[ChunkReport] = []
+    resume_from_line: Optional[int] = None
+    error: Optional[str] = None
@@ -0,0 +1,83 @@
+"""Per-request CPU of encoding a ``/heatmap/batch`` body: pydantic models vs direct orjson.
+
+Builds ``--assets`` projection rows with ``--pillars`` x ``--components``
+breakdowns in memory and times both encoders with ``time.process_time`` over
+``--requests`` full-universe bodies, checking that they produce equal bytes::
+
+    python -m benchmarks.heatmap_encoding --assets 500 --pillars 4 --components 15
+"""
+from __future__ import annotations
+
+import argparse
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Callable
+
+from api.routers.heatmap import _heatmap_for_asset
+from api.schemas.heatmap import HeatmapResponse
+from core.scoring.latest import normalize_for_heatmap, shape_pillars
+from infra.db import LatestScore
+
+
+def make_rows(n_assets: int, n_pillars: int, n_components: int, seed: int) -> list[tuple[str, LatestScore]]:
+    rng = random.Random(seed)
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    rows = []
+    for i in range(n_assets):
+        breakdown = {
+            f"P{p}": [(f"p{p}_k{c:02d}", rng.randint(-3, 3)) for c in range(n_components)] for p in range(n_pillars)
+        }
+        total = max(-24, min(24, sum(v for comps in breakdown.values() for _, v in comps)))
+        # Transient projection rows; nothing touches a database.
+        latest = LatestScore(
+            heatmap_score=float(normalize_for_heatmap(total)),
+            pillars=shape_pillars(breakdown),
+            ts=start + timedelta(minutes=i),
+            version="2025.08.1",
+        )
+        rows.append((f"A{i:04d}", latest))
+    return rows
+
+
+def pydantic_entry(symbol: str, latest: LatestScore) -> bytes:
+    """The model-based encoding the endpoints used before."""
+    return HeatmapResponse(
+        asset=symbol,
+        score=latest.heatmap_score,
+        scale=(-2, 2),
+        pillars=latest.pillars,
+        as_of=latest.ts,
+        version=latest.version,
+    ).model_dump_json().encode()
+
+
+def cpu_per_request(encode: Callable[[str, LatestScore], bytes], rows: list, requests: int) -> float:
+    start = time.process_time()
+    for _ in range(requests):
+        b",".join(encode(symbol, latest) for symbol, latest in rows)
+    return (time.process_time() - start) / requests
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assets", type=int, default=500)
+    parser.add_argument("--pillars", type=int, default=4)
+    parser.add_argument("--components", type=int, default=15)
+    parser.add_argument("--requests", type=int, default=50)
+    parser.add_argument("--seed", type=int, default=1)
+    args = parser.parse_args()
+
+    rows = make_rows(args.assets, args.pillars, args.components, args.seed)
+    for symbol, latest in rows:
+        assert pydantic_entry(symbol, latest) == _heatmap_for_asset(symbol, latest), symbol
+
+    before = cpu_per_request(pydantic_entry, rows, args.requests)
+    after = cpu_per_request(_heatmap_for_asset, rows, args.requests)
+    print(f"assets={args.assets} components/asset={args.pillars * args.components}")
+    print(f"pydantic: {before * 1000:8.3f} ms CPU/request")
+    print(f"orjson:   {after * 1000:8.3f} ms CPU/request  ({before / after:.1f}x less)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,110 @@
+"""Compare the row-by-row ingest path with the set-based bulk path.
+
+Runs against a throwaway SQLite file (or ``--database-url``, whose tables are
+dropped) with Redis replaced by a counter, so only database work is measured::
+
+    python -m benchmarks.ingest_throughput --events 5000 --assets 20
+"""
+from __future__ import annotations
+
+import argparse
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from uuid import uuid4
+
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session, sessionmaker
+
+from api.schemas.ingest import EventDTO
+from core.pipeline.ingest import bulk_ingest
+from infra.db import Asset, Base, Event
+
+
+def make_events(n: int, n_assets: int, dup_ratio: float) -> list[EventDTO]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    events = [
+        EventDTO(
+            schema_version="2025.08.1",
+            source="bench",
+            asset=f"A{i % n_assets:04d}",
+            kind="indicator",
+            ingested_at=start + timedelta(seconds=i),
+            payload={"key": "macro", "value": i % 7},
+            trace_id=uuid4(),
+        )
+        for i in range(n)
+    ]
+    # Re-send a slice of already seen trace_ids, like a retried scraper would.
+    return events + events[: int(n * dup_ratio)]
+
+
+def legacy_ingest(session: Session, events: list[EventDTO], enqueue) -> None:
+    """The per-event path ``POST /ingest/events`` used before bulk ingest."""
+    for ev in events:
+        asset = session.query(Asset).filter_by(symbol=ev.asset).first()
+        if not asset:
+            asset = Asset(symbol=ev.asset, kind="unknown")
+            session.add(asset)
+            session.commit()
+            session.refresh(asset)
+        if session.query(Event).filter_by(trace_id=str(ev.trace_id)).first():
+            continue
+        event = Event(
+            trace_id=str(ev.trace_id),
+            source=ev.source,
+            asset_id=asset.id,
+            kind=ev.kind,
+            ingested_at=ev.ingested_at,
+            payload=ev.payload,
+        )
+        session.add(event)
+        session.commit()
+        enqueue(event.trace_id)
+
+
+def bulk_path(session: Session, events: list[EventDTO], enqueue) -> None:
+    result = bulk_ingest(session, events)
+    enqueue(result.trace_ids)
+
+
+def run(path, url: str, events: list[EventDTO], batch_size: int) -> float:
+    engine = create_engine(url, future=True)
+    Base.metadata.drop_all(engine)
+    Base.metadata.create_all(engine)
+    factory = sessionmaker(bind=engine, expire_on_commit=False)
+    enqueued: list = []
+    started = time.perf_counter()
+    for i in range(0, len(events), batch_size):
+        with factory() as session:
+            path(session, events[i:i + batch_size], enqueued.append)
+    elapsed = time.perf_counter() - started
+    engine.dispose()
+    return elapsed
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--events", type=int, default=5000)
+    parser.add_argument("--assets", type=int, default=20)
+    parser.add_argument("--batch-size", type=int, default=1000)
+    parser.add_argument("--dup-ratio", type=float, default=0.1)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument(
+        "--i-know-this-drops-tables", action="store_true", help="required with --database-url"
+    )
+    args = parser.parse_args()
+    if args.database_url and not args.i_know_this_drops_tables:
+        parser.error("--database-url drops and recreates every table there; add --i-know-this-drops-tables")
+
+    events = make_events(args.events, args.assets, args.dup_ratio)
+    with tempfile.TemporaryDirectory() as tmp:
+        url = args.database_url or f"sqlite:///{Path(tmp) / 'bench.db'}"
+        for name, path in (("legacy", legacy_ingest), ("bulk", bulk_path)):
+            elapsed = run(path, url, events, args.batch_size)
+            print(f"{name:>6}: {len(events)} events in {elapsed:.3f}s ({len(events) / elapsed:,.0f} events/s)")
+
+
+if __name__ == "__main__":
+    main()
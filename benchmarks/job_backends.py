@@ -0,0 +1,102 @@
+"""Job dispatch overhead: RQ vs the in-process ``local`` backend.
+
+Enqueues ``--jobs`` jobs that each sleep ``--work-ms`` (standing in for the
+database work of a normalize or recompute job), spread over ``--assets``
+ordering keys, and reports enqueue latency and the time until every job has
+run. RQ is driven by a burst ``SimpleWorker`` in this process against
+``--redis-url``, or fakeredis when it is not given (which leaves out the
+network round-trip a real deployment pays)::
+
+    python -m benchmarks.job_backends --jobs 5000 --assets 50 --work-ms 0
+    python -m benchmarks.job_backends --redis-url redis://localhost:6379/15
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import time
+from typing import Callable
+
+from infra.jobqueue import LocalBackend
+
+
+def work(asset_id: int, seq: int, seconds: float) -> None:
+    if seconds:
+        time.sleep(seconds)
+
+
+def _work() -> Callable[[int, int, float], None]:
+    # Imported by module path: RQ (and the local journal) cannot refer to functions in __main__.
+    from benchmarks.job_backends import work as job
+
+    return job
+
+
+def _enqueue_all(enqueue: Callable[[int, int], object], jobs: int, assets: int) -> list[float]:
+    # Distinct arguments per job: the local backend would merge identical keyed jobs.
+    latencies = []
+    for i in range(jobs):
+        start = time.perf_counter()
+        enqueue(i % assets, i)
+        latencies.append(time.perf_counter() - start)
+    return latencies
+
+
+def run_local(args: argparse.Namespace) -> tuple[list[float], float]:
+    backend = LocalBackend(workers=args.workers, max_queued=args.jobs + 1, path=args.journal or "")
+    seconds = args.work_ms / 1000
+    start = time.perf_counter()
+    job = _work()
+    latencies = _enqueue_all(lambda a, i: backend.enqueue(job, a, i, seconds, key=f"asset:{a}"), args.jobs, args.assets)
+    backend.close()
+    return latencies, time.perf_counter() - start
+
+
+def run_rq(args: argparse.Namespace) -> tuple[list[float], float]:
+    from rq import Queue, SimpleWorker
+
+    if args.redis_url:
+        import redis
+
+        conn = redis.Redis.from_url(args.redis_url)
+    else:
+        import fakeredis
+
+        conn = fakeredis.FakeRedis()
+    queue = Queue("bench", connection=conn)
+    queue.empty()
+    seconds = args.work_ms / 1000
+    start = time.perf_counter()
+    job = _work()
+    latencies = _enqueue_all(lambda a, i: queue.enqueue(job, a, i, seconds), args.jobs, args.assets)
+    # One worker per process is how RQ runs; --workers only applies to the local backend.
+    SimpleWorker([queue], connection=conn).work(burst=True, logging_level="WARNING")
+    return latencies, time.perf_counter() - start
+
+
+def report(name: str, latencies: list[float], total: float, jobs: int) -> None:
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(
+        f"{name:>6}: enqueue p50 {statistics.median(ordered) * 1e6:8.1f}us  p99 {p99 * 1e6:8.1f}us  "
+        f"all done in {total:7.3f}s  ({jobs / total:,.0f} jobs/s)"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--jobs", type=int, default=2000)
+    parser.add_argument("--assets", type=int, default=50)
+    parser.add_argument("--work-ms", type=float, default=0.0)
+    parser.add_argument("--workers", type=int, default=4, help="local backend threads")
+    parser.add_argument("--journal", default=None, help="SQLite journal path for the local backend")
+    parser.add_argument("--redis-url", default=None)
+    args = parser.parse_args()
+
+    for name, runner in (("local", run_local), ("rq", run_rq)):
+        latencies, total = runner(args)
+        report(name, latencies, total, args.jobs)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+"""Concurrent-request throughput against a running API.
+
+Opens ``--connections`` concurrent clients that hit ``--path`` for
+``--duration`` seconds and reports requests/s and latency percentiles.
+Run it against a server built from the previous commit and from this one to
+compare the sync and async endpoint stacks::
+
+    uvicorn api.main:app --workers 1 &
+    python -m benchmarks.load_concurrency --url http://localhost:8000 \\
+        --path '/heatmap/batch?assets=*' --connections 500 --duration 30
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+
+
+async def worker(client: httpx.AsyncClient, path: str, deadline: float, latencies: list[float], errors: list[int]) -> None:
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        try:
+            resp = await client.get(path)
+            if resp.status_code >= 500:
+                errors.append(resp.status_code)
+        except httpx.HTTPError:
+            errors.append(0)
+            continue
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run(url: str, path: str, connections: int, duration: float) -> None:
+    limits = httpx.Limits(max_connections=connections, max_keepalive_connections=connections)
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        latencies: list[float] = []
+        errors: list[int] = []
+        deadline = time.perf_counter() + duration
+        await asyncio.gather(*(worker(client, path, deadline, latencies, errors) for _ in range(connections)))
+    latencies.sort()
+    if not latencies:
+        print(f"no successful requests ({len(errors)} errors)")
+        return
+    p99 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))]
+    print(
+        f"{path} @ {connections} connections: {len(latencies) / duration:,.0f} req/s, "
+        f"p50 {statistics.median(latencies):.1f}ms, p99 {p99:.1f}ms, {len(errors)} errors"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--path", action="append", help="may be repeated; defaults to /heatmap/batch?assets=*")
+    parser.add_argument("--connections", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30.0)
+    args = parser.parse_args()
+    for path in args.path or ["/heatmap/batch?assets=*"]:
+        asyncio.run(run(args.url, path, args.connections, args.duration))
+
+
+if __name__ == "__main__":
+    main()
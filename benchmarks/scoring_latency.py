@@ -0,0 +1,99 @@
+"""Per-asset latest-indicator fetch latency: per-component queries vs one set-based query.
+
+Loads ``--rows`` indicator rows spread over ``--assets`` assets and
+``--components`` keys into a temporary SQLite file (or ``--database-url``,
+whose tables are dropped), then times both fetch strategies for every asset::
+
+    python -m benchmarks.scoring_latency --rows 2000000 --components 60
+"""
+from __future__ import annotations
+
+import argparse
+import statistics
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import Session
+
+from core.scoring.engine import latest_indicator_values
+from infra.db import Asset, Base, Indicator
+
+
+def per_component(session: Session, asset_id: int, keys: list[str]) -> dict[str, float]:
+    """The one-query-per-component lookup compute_score used before."""
+    latest = {}
+    for key in keys:
+        ind = (
+            session.query(Indicator)
+            .filter_by(asset_id=asset_id, key=key)
+            .order_by(Indicator.ts.desc())
+            .first()
+        )
+        if ind:
+            latest[key] = ind.value
+    return latest
+
+
+def load(session: Session, n_rows: int, n_assets: int, keys: list[str]) -> list[int]:
+    session.execute(insert(Asset), [{"symbol": f"A{i:04d}", "kind": "bench"} for i in range(n_assets)])
+    asset_ids = [a.id for a in session.query(Asset).order_by(Asset.id)]
+    start = datetime(2020, 1, 1, tzinfo=timezone.utc)
+    per_series = max(1, n_rows // (n_assets * len(keys)))
+    batch = []
+    for asset_id in asset_ids:
+        for key in keys:
+            for i in range(per_series):
+                batch.append({"asset_id": asset_id, "key": key, "ts": start + timedelta(minutes=i), "value": i % 5, "meta": {}})
+                if len(batch) >= 50_000:
+                    session.execute(insert(Indicator), batch)
+                    batch.clear()
+    if batch:
+        session.execute(insert(Indicator), batch)
+    session.commit()
+    return asset_ids
+
+
+def timed(fn, session: Session, asset_ids: list[int], keys: list[str]) -> list[float]:
+    samples = []
+    for asset_id in asset_ids:
+        started = time.perf_counter()
+        fn(session, asset_id, keys)
+        samples.append((time.perf_counter() - started) * 1000)
+    return samples
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--assets", type=int, default=20)
+    parser.add_argument("--components", type=int, default=50)
+    parser.add_argument("--database-url", default=None, help="defaults to a temporary SQLite file")
+    parser.add_argument(
+        "--i-know-this-drops-tables", action="store_true", help="required with --database-url"
+    )
+    args = parser.parse_args()
+    if args.database_url and not args.i_know_this_drops_tables:
+        parser.error("--database-url drops and recreates every table there; add --i-know-this-drops-tables")
+
+    keys = [f"k{i:03d}" for i in range(args.components)]
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = create_engine(args.database_url or f"sqlite:///{Path(tmp) / 'bench.db'}", future=True)
+        Base.metadata.drop_all(engine)
+        Base.metadata.create_all(engine)
+        with Session(engine) as session:
+            started = time.perf_counter()
+            asset_ids = load(session, args.rows, args.assets, keys)
+            print(f"loaded {session.query(Indicator).count():,} rows in {time.perf_counter() - started:.1f}s")
+            assert per_component(session, asset_ids[0], keys) == latest_indicator_values(session, asset_ids[0], keys)
+            for name, fn in (("per-component", per_component), ("set-based", latest_indicator_values)):
+                samples = sorted(timed(fn, session, asset_ids, keys))
+                p99 = samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+                print(f"{name:>14}: p50 {statistics.median(samples):.2f}ms  p99 {p99:.2f}ms per asset")
+        engine.dispose()
+
+
+if __name__ == "__main__":
+    main()
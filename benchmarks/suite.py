@@ -0,0 +1,237 @@
+"""End-to-end benchmark suite: ingest, normalization, scoring and read endpoints.
+
+Runs in-process with no outside services: a temporary SQLite file, the app
+behind ``TestClient``, the heatmap cache and streams off, and RQ replaced by an
+in-memory list the suite drains itself (the same idea as the synchronous
+``queue.enqueue`` patch in the e2e tests). Synthetic events are generated from
+``--seed``, so runs at the same scale are comparable::
+
+    python -m benchmarks.suite --assets 50 --keys 10 --events 20000 --output bench.json
+    python -m benchmarks.suite --compare bench.json --threshold 0.2
+
+Each stage reports throughput and p50/p99 latency. With ``--compare`` the
+results are checked against an earlier JSON file, and the exit status is 1 when
+a stage's p50 or p99 grew (or its throughput fell) by more than ``--threshold``.
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from pathlib import Path
+from typing import Any, Callable, Iterable
+from uuid import UUID
+
+
+def percentile(samples: list[float], q: float) -> float:
+    """Nearest-rank percentile of ``samples`` (``q`` in 0..100)."""
+    ordered = sorted(samples)
+    rank = max(1, min(len(ordered), round(q / 100 * len(ordered) + 0.5)))
+    return ordered[rank - 1]
+
+
+def summarize(samples: list[float], items: int) -> dict[str, float]:
+    """Stats for per-call latencies (seconds); ``items`` is what the calls processed in total."""
+    total = sum(samples)
+    return {
+        "calls": len(samples),
+        "items": items,
+        "total_s": round(total, 6),
+        "throughput_per_s": round(items / total, 2) if total else 0.0,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "mean_ms": round(total / len(samples) * 1000, 3),
+    }
+
+
+def timed(calls: Iterable[Callable[[], Any]]) -> list[float]:
+    samples = []
+    for call in calls:
+        start = time.perf_counter()
+        call()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def make_events(rng: random.Random, n_events: int, n_assets: int, n_keys: int) -> list[dict[str, Any]]:
+    start = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    return [
+        {
+            "schema_version": "2025.08.1",
+            "source": "bench",
+            "asset": f"A{rng.randrange(n_assets):04d}",
+            "kind": "indicator",
+            "ingested_at": (start + timedelta(seconds=i)).isoformat(),
+            "payload": {"key": f"k{rng.randrange(n_keys):03d}", "value": round(rng.uniform(-10, 10), 3)},
+            "trace_id": str(UUID(int=rng.getrandbits(128), version=4)),
+        }
+        for i in range(n_events)
+    ]
+
+
+def weights_file(tmp: Path, n_keys: int) -> Path:
+    """A weights file spreading the synthetic keys over four pillars."""
+    import yaml  # type: ignore[import-untyped]
+
+    pillars: dict[str, dict] = {}
+    for i in range(n_keys):
+        pillar = pillars.setdefault(f"P{i % 4}", {"components": {}})
+        pillar["components"][f"k{i:03d}"] = round(0.1 + (i % 7) * 0.15, 2)
+    path = tmp / "weights.yaml"
+    path.write_text(yaml.safe_dump({"version": "bench", "pillars": pillars}))
+    return path
+
+
+def run(args: argparse.Namespace, tmp: Path) -> dict[str, Any]:
+    os.environ["DATABASE_URL"] = f"sqlite:///{tmp / 'bench.db'}"
+    os.environ["HEATMAP_CACHE_ENABLED"] = "false"
+    os.environ["HEATMAP_STREAM_ENABLED"] = "false"
+    os.environ["RECOMPUTE_DEBOUNCE_SECONDS"] = "0"
+
+    from fastapi.testclient import TestClient
+
+    from api.main import app
+    from core.pipeline import jobs
+    from core.scoring.engine import compute_score
+    from core.scoring.weights import registry
+    from infra.db import Asset, Base, Event, SessionLocal, get_engine
+    from infra.redis import queue
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    Base.metadata.create_all(get_engine())
+    registry.path = weights_file(tmp, args.keys)
+
+    pending: list[tuple[Callable, tuple]] = []
+    queue.enqueue = lambda func, *a, **kw: pending.append((func, a))  # type: ignore[method-assign]
+    queue.enqueue_many = lambda datas, pipeline=None: pending.extend((d.func, d.args) for d in datas)  # type: ignore[method-assign]
+    recompute_requests: set[int] = set()
+    jobs.request_recompute = recompute_requests.add  # type: ignore[assignment]
+
+    rng = random.Random(args.seed)
+    client = TestClient(app)
+    events = make_events(rng, args.events, args.assets, args.keys)
+    results: dict[str, Any] = {}
+
+    batches = [events[i:i + args.batch_size] for i in range(0, len(events), args.batch_size)]
+
+    def post(batch: list[dict[str, Any]]) -> Callable[[], Any]:
+        def call() -> None:
+            resp = client.post("/ingest/events", json={"events": batch})
+            assert resp.status_code == 202, resp.text
+        return call
+
+    results["ingest_events"] = summarize(timed(post(b) for b in batches), len(events))
+
+    # Per-event jobs on a sample, then the batched jobs ingest queued for the rest.
+    with SessionLocal() as s:
+        sample = [t for (t,) in s.query(Event.trace_id).order_by(Event.id).limit(args.single_jobs)]
+    results["normalize_event_job"] = summarize(
+        timed(partial(jobs.normalize_event_job, t) for t in sample), len(sample)
+    )
+    batch_jobs = [(func, a) for func, a in pending if func is jobs.normalize_events_job]
+    pending.clear()
+    results["normalize_events_job"] = summarize(
+        timed(partial(f, *a) for f, a in batch_jobs), sum(len(a[0]) for _, a in batch_jobs)
+    )
+
+    with SessionLocal() as s:
+        asset_ids = [a for (a,) in s.query(Asset.id).order_by(Asset.id)]
+
+        def score(asset_id: int) -> Callable[[], Any]:
+            return lambda: compute_score(s, asset_id)
+
+        results["compute_score"] = summarize(timed(score(a) for a in asset_ids), len(asset_ids))
+
+    symbols = [f"A{i:04d}" for i in range(args.assets)]
+
+    def batch_read() -> Callable[[], Any]:
+        picked = ",".join(rng.sample(symbols, min(args.batch_assets, len(symbols))))
+        return lambda: client.get("/heatmap/batch", params={"assets": picked}).raise_for_status()
+
+    results["heatmap_batch"] = summarize(timed(batch_read() for _ in range(args.reads)), args.reads)
+    results["assets_list"] = summarize(
+        timed((lambda: client.get("/assets/", params={"limit": 100}).raise_for_status()) for _ in range(args.reads)),
+        args.reads,
+    )
+    return results
+
+
+def git_revision() -> str | None:
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True)
+    except (OSError, subprocess.CalledProcessError):
+        return None
+    return out.stdout.strip()
+
+
+def compare(current: dict[str, Any], baseline: dict[str, Any], threshold: float) -> list[str]:
+    """Lines describing stages that regressed by more than ``threshold`` (a fraction)."""
+    regressions = []
+    for stage, now in current["results"].items():
+        before = baseline.get("results", {}).get(stage)
+        if not before:
+            continue
+        for metric in ("p50_ms", "p99_ms"):
+            if before[metric] and now[metric] > before[metric] * (1 + threshold):
+                regressions.append(f"{stage}.{metric}: {before[metric]} -> {now[metric]}")
+        if before["throughput_per_s"] and now["throughput_per_s"] < before["throughput_per_s"] * (1 - threshold):
+            regressions.append(f"{stage}.throughput_per_s: {before['throughput_per_s']} -> {now['throughput_per_s']}")
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--assets", type=int, default=50)
+    parser.add_argument("--keys", type=int, default=10)
+    parser.add_argument("--events", type=int, default=20000)
+    parser.add_argument("--batch-size", type=int, default=500, help="events per POST /ingest/events")
+    parser.add_argument("--single-jobs", type=int, default=200, help="events timed through normalize_event_job")
+    parser.add_argument("--reads", type=int, default=200, help="requests per read endpoint")
+    parser.add_argument("--batch-assets", type=int, default=20, help="assets per /heatmap/batch request")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", type=Path, default=None, help="write results JSON here")
+    parser.add_argument("--compare", type=Path, default=None, help="baseline results JSON")
+    parser.add_argument("--threshold", type=float, default=0.2, help="allowed relative regression")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = run(args, Path(tmp))
+    report = {
+        "meta": {
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "git": git_revision(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "compare", "threshold")},
+        },
+        "results": results,
+    }
+    for stage, stats in results.items():
+        print(
+            f"{stage:>22}: {stats['throughput_per_s']:>12,.1f}/s  "
+            f"p50 {stats['p50_ms']:>9.3f}ms  p99 {stats['p99_ms']:>9.3f}ms"
+        )
+    if args.output:
+        args.output.write_text(json.dumps(report, indent=2, default=str))
+
+    if args.compare:
+        baseline = json.loads(args.compare.read_text())
+        if baseline.get("meta", {}).get("params") != report["meta"]["params"]:
+            print("warning: baseline was recorded with different parameters", file=sys.stderr)
+        regressions = compare(report, baseline, args.threshold)
+        for line in regressions:
+            print(f"REGRESSION {line}")
+        raise SystemExit(1 if regressions else 0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,330 @@
+"""Cold-event archival.
+
+Events ingested before a cutoff are moved out of the ``events`` table into
+gzip-compressed, column-oriented JSON chunks on local disk, partitioned by
+ingestion day::
+
+    <ARCHIVE_DIR>/events/2024/01/31/000000123-000004567.json.gz
+
+``manifest.jsonl`` in the archive root indexes every chunk by day, time
+range, asset ids and kinds, so readers only open chunks that can match.
+A chunk is written under a ``.pending`` name, the rows are deleted in the
+same step that commits, and only then is the chunk renamed and indexed;
+:meth:`EventArchive.recover` finishes or discards chunks left behind by an
+interrupted run, including renamed chunks missing from the manifest. The trace ids of archived events stay in
+``archived_events`` so ingest keeps rejecting them as duplicates. Run
+archival with::
+
+    python -m core.pipeline.archive run --older-than-days 30
+"""
+from __future__ import annotations
+
+import argparse
+import gzip
+import json
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from itertools import groupby
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Sequence
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from infra.db import ArchivedEvent, Event, SessionLocal, db_timestamp, upsert
+from infra.settings import settings
+
+COLUMNS = ("id", "trace_id", "source", "asset_id", "kind", "ingested_at", "payload")
+PENDING = ".pending"
+# Trace ids per tombstone insert.
+TOMBSTONE_CHUNK = 1000
+
+
+@dataclass(frozen=True)
+class Chunk:
+    """Manifest entry for one archived file."""
+
+    path: str
+    day: str
+    count: int
+    min_id: int
+    max_id: int
+    min_ts: str
+    max_ts: str
+    asset_ids: tuple[int, ...]
+    kinds: tuple[str, ...]
+
+    def matches(
+        self,
+        asset_ids: set[int] | None,
+        kinds: set[str] | None,
+        start: datetime | None,
+        end: datetime | None,
+    ) -> bool:
+        if asset_ids is not None and asset_ids.isdisjoint(self.asset_ids):
+            return False
+        if kinds is not None and kinds.isdisjoint(self.kinds):
+            return False
+        if start is not None and datetime.fromisoformat(self.max_ts) < _naive(start):
+            return False
+        if end is not None and datetime.fromisoformat(self.min_ts) > _naive(end):
+            return False
+        return True
+
+
+@dataclass
+class ArchiveReport:
+    archived: int = 0
+    chunks: int = 0
+
+
+def _naive(ts: datetime) -> datetime:
+    # Archived timestamps are stored as naive UTC so chunks from either backend compare alike.
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def _columns(events: Sequence[Event]) -> dict[str, list[Any]]:
+    return {
+        "id": [e.id for e in events],
+        "trace_id": [e.trace_id for e in events],
+        "source": [e.source for e in events],
+        "asset_id": [e.asset_id for e in events],
+        "kind": [e.kind for e in events],
+        "ingested_at": [_naive(e.ingested_at).isoformat() for e in events],
+        "payload": [e.payload for e in events],
+    }
+
+
+class EventArchive:
+    """A directory of archived event chunks plus their manifest."""
+
+    def __init__(self, root: str | os.PathLike[str] | None = None) -> None:
+        self.root = Path(root or settings.archive_dir)
+        self.manifest_path = self.root / "manifest.jsonl"
+
+    def chunks(self) -> list[Chunk]:
+        if not self.manifest_path.exists():
+            return []
+        with self.manifest_path.open() as fh:
+            entries = [json.loads(line) for line in fh if line.strip()]
+        chunks = [
+            Chunk(**{**e, "asset_ids": tuple(e["asset_ids"]), "kinds": tuple(e["kinds"])}) for e in entries
+        ]
+        return sorted(chunks, key=lambda c: (c.day, c.min_id))
+
+    def write(self, events: Sequence[Event]) -> tuple[Path, Chunk]:
+        """Write one day's events to a pending chunk; returns its path and manifest entry."""
+        ts = [_naive(e.ingested_at) for e in events]
+        day = ts[0].date()
+        rel = Path("events", f"{day:%Y}", f"{day:%m}", f"{day:%d}", f"{events[0].id:09d}-{events[-1].id:09d}.json.gz")
+        chunk = Chunk(
+            path=rel.as_posix(),
+            day=day.isoformat(),
+            count=len(events),
+            min_id=events[0].id,
+            max_id=events[-1].id,
+            min_ts=min(ts).isoformat(),
+            max_ts=max(ts).isoformat(),
+            asset_ids=tuple(sorted({e.asset_id for e in events})),
+            kinds=tuple(sorted({e.kind for e in events})),
+        )
+        pending = self.root / (chunk.path + PENDING)
+        pending.parent.mkdir(parents=True, exist_ok=True)
+        with gzip.open(pending, "wt", encoding="utf-8") as fh:
+            json.dump({"columns": _columns(events)}, fh, separators=(",", ":"))
+        return pending, chunk
+
+    def publish(self, pending: Path, chunk: Chunk) -> None:
+        """Make a pending chunk visible once its rows are gone from the table."""
+        os.replace(pending, self.root / chunk.path)
+        self._index(chunk)
+
+    def _index(self, chunk: Chunk) -> None:
+        with self.manifest_path.open("a") as fh:
+            fh.write(json.dumps(chunk.__dict__, separators=(",", ":")) + "\n")
+
+    def recover(self, session: Session) -> int:
+        """Settle chunks an interrupted run left pending or unindexed; returns how many were published."""
+        published = 0
+        for pending in sorted(self.root.glob(f"events/**/*{PENDING}")):
+            columns = self._load(pending)
+            if session.scalar(select(Event.id).where(Event.id.in_(columns["id"])).limit(1)) is None:
+                # The delete committed: the chunk holds the only copy of these rows.
+                self.publish(pending, self._chunk_of(pending.with_suffix(""), columns))
+                published += 1
+            else:
+                pending.unlink()
+        indexed = {chunk.path for chunk in self.chunks()}
+        for path in sorted(self.root.glob("events/**/*.json.gz")):
+            if path.relative_to(self.root).as_posix() not in indexed:
+                # Renamed, but the run stopped before the manifest append.
+                self._index(self._chunk_of(path, self._load(path)))
+                published += 1
+        return published
+
+    def _chunk_of(self, path: Path, columns: dict[str, list[Any]]) -> Chunk:
+        ts = [datetime.fromisoformat(t) for t in columns["ingested_at"]]
+        return Chunk(
+            path=path.relative_to(self.root).as_posix(),
+            day=ts[0].date().isoformat(),
+            count=len(ts),
+            min_id=columns["id"][0],
+            max_id=columns["id"][-1],
+            min_ts=min(ts).isoformat(),
+            max_ts=max(ts).isoformat(),
+            asset_ids=tuple(sorted(set(columns["asset_id"]))),
+            kinds=tuple(sorted(set(columns["kind"]))),
+        )
+
+    @staticmethod
+    def _load(path: Path) -> dict[str, list[Any]]:
+        with gzip.open(path, "rt", encoding="utf-8") as fh:
+            return json.load(fh)["columns"]
+
+    def iter_events(
+        self,
+        asset_ids: Iterable[int] | None = None,
+        kinds: Iterable[str] | None = None,
+        start: datetime | None = None,
+        end: datetime | None = None,
+    ) -> Iterator[Event]:
+        """Stream archived events as detached ``Event`` objects, oldest chunk first.
+
+        Filters select on asset id, kind and ``start <= ingested_at <= end``;
+        chunks that cannot match are not opened.
+        """
+        asset_set = set(asset_ids) if asset_ids is not None else None
+        kind_set = set(kinds) if kinds is not None else None
+        lo = _naive(start) if start else None
+        hi = _naive(end) if end else None
+        for chunk in self.chunks():
+            if not chunk.matches(asset_set, kind_set, start, end):
+                continue
+            columns = self._load(self.root / chunk.path)
+            for row in zip(*(columns[c] for c in COLUMNS)):
+                values = dict(zip(COLUMNS, row))
+                ts = datetime.fromisoformat(values["ingested_at"])
+                if asset_set is not None and values["asset_id"] not in asset_set:
+                    continue
+                if kind_set is not None and values["kind"] not in kind_set:
+                    continue
+                if (lo and ts < lo) or (hi and ts > hi):
+                    continue
+                values["ingested_at"] = ts
+                yield Event(**values)
+
+
+def record_tombstones(session: Session, trace_ids: Sequence[str]) -> None:
+    """Remember archived trace ids for ingest dedup; ids already recorded are ignored."""
+    for start in range(0, len(trace_ids), TOMBSTONE_CHUNK):
+        chunk = trace_ids[start:start + TOMBSTONE_CHUNK]
+        session.execute(
+            upsert(session, ArchivedEvent)
+            .values([{"trace_id": t} for t in chunk])
+            .on_conflict_do_nothing(index_elements=["trace_id"])
+        )
+
+
+def backfill_tombstones(session: Session, archive: EventArchive | None = None) -> int:
+    """Record the trace ids of every archived chunk, for archives written before tombstones existed."""
+    archive = archive or EventArchive()
+    count = 0
+    for chunk in archive.chunks():
+        trace_ids = archive._load(archive.root / chunk.path)["trace_id"]
+        record_tombstones(session, trace_ids)
+        session.commit()
+        count += len(trace_ids)
+    return count
+
+
+def archive_events(
+    session: Session,
+    before: datetime,
+    archive: EventArchive | None = None,
+    batch_size: int | None = None,
+) -> ArchiveReport:
+    """Move events ingested before ``before`` into ``archive``, ``batch_size`` rows per transaction."""
+    archive = archive or EventArchive()
+    batch_size = batch_size or settings.archive_batch_size
+    archive.recover(session)
+    cutoff = db_timestamp(session, before)
+    report = ArchiveReport()
+    last_id = 0
+    while True:
+        batch = list(
+            session.scalars(
+                select(Event)
+                .where(Event.ingested_at < cutoff, Event.id > last_id)
+                .order_by(Event.id)
+                .limit(batch_size)
+            )
+        )
+        if not batch:
+            return report
+        last_id = batch[-1].id
+        by_day = sorted(batch, key=lambda e: (_naive(e.ingested_at).date(), e.id))
+        written = [
+            archive.write(list(events)) for _, events in groupby(by_day, key=lambda e: _naive(e.ingested_at).date())
+        ]
+        session.execute(delete(Event).where(Event.id.in_([e.id for e in batch])))
+        record_tombstones(session, [e.trace_id for e in batch])
+        session.commit()
+        for pending, chunk in written:
+            archive.publish(pending, chunk)
+        session.expunge_all()
+        report.archived += len(batch)
+        report.chunks += len(written)
+
+
+def iter_events(
+    session: Session,
+    asset_ids: Iterable[int] | None = None,
+    kinds: Iterable[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    archive: EventArchive | None = None,
+) -> Iterator[Event]:
+    """Archived events followed by those still in the table, with the same filters."""
+    asset_ids = list(asset_ids) if asset_ids is not None else None
+    kinds = list(kinds) if kinds is not None else None
+    yield from (archive or EventArchive()).iter_events(asset_ids, kinds, start, end)
+    q = select(Event)
+    if asset_ids is not None:
+        q = q.where(Event.asset_id.in_(asset_ids))
+    if kinds is not None:
+        q = q.where(Event.kind.in_(kinds))
+    if start is not None:
+        q = q.where(Event.ingested_at >= db_timestamp(session, start))
+    if end is not None:
+        q = q.where(Event.ingested_at <= db_timestamp(session, end))
+    yield from session.scalars(q.order_by(Event.id).execution_options(yield_per=1000))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Archive cold events to compressed files")
+    sub = parser.add_subparsers(dest="command", required=True)
+    run = sub.add_parser("run", help="Move old events from the table into the archive")
+    run.add_argument("--older-than-days", type=float, default=settings.archive_after_days)
+    run.add_argument("--batch-size", type=int, default=None)
+    sub.add_parser("list", help="Print the archive manifest")
+    sub.add_parser("tombstones", help="Record the trace ids of already archived events for ingest dedup")
+    args = parser.parse_args()
+
+    archive = EventArchive()
+    if args.command == "tombstones":
+        with SessionLocal() as session:
+            print(f"recorded {backfill_tombstones(session, archive)} archived trace ids")
+        return
+    if args.command == "list":
+        for chunk in archive.chunks():
+            print(f"{chunk.path}\t{chunk.count}\t{chunk.min_ts}..{chunk.max_ts}")
+        return
+    before = datetime.now(timezone.utc) - timedelta(days=args.older_than_days)
+    with SessionLocal() as session:
+        report = archive_events(session, before, archive, args.batch_size)
+    print(f"archived {report.archived} events into {report.chunks} chunks under {archive.root}")
+
+
+if __name__ == "__main__":
+    main()
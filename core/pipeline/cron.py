@@ -0,0 +1,13 @@
+"""Periodic jobs for RQ deployments, loaded by ``rq cron core.pipeline.cron``.
+
+Run one cron scheduler per Redis; it enqueues onto the queue the workers read.
+With ``JOB_BACKEND=local`` the API process schedules these itself.
+"""
+from __future__ import annotations
+
+from rq import cron
+
+from .jobs import score_state_verify_interval, verify_score_state_job
+
+if interval := score_state_verify_interval():
+    cron.register(verify_score_state_job, "default", interval=interval)
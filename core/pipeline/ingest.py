@@ -0,0 +1,133 @@
+from __future__ import annotations
+
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from infra.db import ArchivedEvent, Asset, Event, upsert
+from infra.jobqueue import get_backend
+from infra.metrics import INGEST_EVENTS
+from infra.settings import settings
+from .jobs import normalize_events_job
+
+if TYPE_CHECKING:
+    from api.schemas.ingest import EventDTO
+
+# Rows per multi-row INSERT; keeps bound parameters well under SQLite/Postgres limits.
+INSERT_CHUNK = 1000
+
+
+@dataclass
+class IngestResult:
+    accepted: int = 0
+    duplicates: int = 0
+    trace_ids: list[str] = field(default_factory=list)
+
+
+def resolve_assets(session: Session, symbols: set[str]) -> dict[str, int]:
+    """Map symbols to asset ids, creating missing assets with ``kind="unknown"``."""
+    if not symbols:
+        return {}
+    ids = dict(session.execute(select(Asset.symbol, Asset.id).where(Asset.symbol.in_(symbols))).all())
+    missing = symbols - ids.keys()
+    if missing:
+        stmt = (
+            upsert(session, Asset)
+            .values([{"symbol": s, "kind": "unknown"} for s in sorted(missing)])
+            .on_conflict_do_nothing(index_elements=["symbol"])
+            .returning(Asset.symbol, Asset.id)
+        )
+        ids.update(dict(session.execute(stmt).all()))
+        if missing - ids.keys():
+            # Created concurrently by another ingest; the rows are visible now.
+            rest = missing - ids.keys()
+            ids.update(dict(session.execute(select(Asset.symbol, Asset.id).where(Asset.symbol.in_(rest))).all()))
+    return ids
+
+
+def bulk_ingest(session: Session, events: Sequence[EventDTO]) -> IngestResult:
+    """Insert a batch of events set-wise in a single transaction.
+
+    Duplicate trace_ids (within the batch, already stored or archived) are
+    skipped. The returned ``trace_ids`` are the events actually inserted, in
+    batch order.
+    """
+    result = IngestResult()
+    unique: dict[str, EventDTO] = {}
+    for ev in events:
+        unique.setdefault(str(ev.trace_id), ev)
+    result.duplicates = len(events) - len(unique)
+    if not unique:
+        return _observed(result)
+
+    asset_ids = resolve_assets(session, {ev.asset for ev in unique.values()})
+    existing = set(
+        session.execute(select(Event.trace_id).where(Event.trace_id.in_(unique.keys()))).scalars()
+    )
+    existing.update(
+        session.execute(select(ArchivedEvent.trace_id).where(ArchivedEvent.trace_id.in_(unique.keys()))).scalars()
+    )
+    rows = [
+        {
+            "trace_id": trace_id,
+            "source": ev.source,
+            "asset_id": asset_ids[ev.asset],
+            "kind": ev.kind,
+            "ingested_at": ev.ingested_at,
+            "payload": ev.payload,
+        }
+        for trace_id, ev in unique.items()
+        if trace_id not in existing
+    ]
+
+    inserted: set[str] = set()
+    for start in range(0, len(rows), INSERT_CHUNK):
+        stmt = (
+            upsert(session, Event)
+            .values(rows[start:start + INSERT_CHUNK])
+            .on_conflict_do_nothing(index_elements=["trace_id"])
+            .returning(Event.trace_id)
+        )
+        inserted.update(session.execute(stmt).scalars())
+    session.commit()
+
+    result.trace_ids = [row["trace_id"] for row in rows if row["trace_id"] in inserted]
+    result.accepted = len(result.trace_ids)
+    result.duplicates += len(unique) - result.accepted
+    return _observed(result)
+
+
+def _observed(result: IngestResult) -> IngestResult:
+    INGEST_EVENTS.labels("accepted").observe(result.accepted)
+    INGEST_EVENTS.labels("duplicate").observe(result.duplicates)
+    return result
+
+
+def normalization_jobs(events: int) -> int:
+    """Upper bound of the jobs :func:`enqueue_normalization` creates for ``events`` trace ids."""
+    return -(-events // max(1, settings.normalize_batch_size))
+
+
+def ingest_and_enqueue(session: Session, events: Sequence[EventDTO]) -> IngestResult:
+    """:func:`bulk_ingest` then :func:`enqueue_normalization`, with the job queue's room taken first.
+
+    A full queue raises ``queue.Full`` before anything is committed, so the
+    client can resend the batch; once the events are stored their jobs are
+    always queued.
+    """
+    with get_backend().reserve(normalization_jobs(len(events))):
+        result = bulk_ingest(session, events)
+        enqueue_normalization(result.trace_ids)
+    return result
+
+
+def enqueue_normalization(trace_ids: Sequence[str]) -> None:
+    """Enqueue ``normalize_events_job`` per ``normalize_batch_size`` trace_ids (one round-trip on RQ)."""
+    if not trace_ids:
+        return
+    size = max(1, settings.normalize_batch_size)
+    get_backend().enqueue_many(
+        normalize_events_job, [(list(trace_ids[start:start + size]),) for start in range(0, len(trace_ids), size)]
+    )
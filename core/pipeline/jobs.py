@@ -1,17 +1,133 @@
 from __future__ import annotations
 
+import asyncio
+from datetime import datetime, timedelta, timezone
+from queue import Full
+
+import structlog
+
 from infra.db import SessionLocal, Event
-from .normalize import normalize_event
+from infra.jobqueue import get_backend
+from infra.metrics import SCORE_RECOMPUTE_MERGED, SCORE_RECOMPUTE_REQUESTS, SCORE_RECOMPUTES, tracked_job
+from infra.settings import settings
+from .archive import archive_events
+from .normalize import normalize_event, normalize_events
+from . import scheduler
 from core.scoring.engine import compute_score
+from core.scoring.bulk import rescore_all
+from core.scoring.history import compact_scores
+from core.scoring.incremental import compute_incremental_score, verify_states
 
+log = structlog.get_logger(__name__)
 
+
+@tracked_job
 def normalize_event_job(trace_id: str) -> None:
     with SessionLocal() as session:
         event = session.query(Event).filter_by(trace_id=trace_id).one()
         normalize_event(session, event)
-        recompute_score_job(event.asset_id)
+    request_recompute(event.asset_id)
+
+
+@tracked_job
+def normalize_events_job(trace_ids: list[str]) -> None:
+    """Normalize a batch of events, then request one recompute per touched asset."""
+    with SessionLocal() as session:
+        events = session.query(Event).filter(Event.trace_id.in_(trace_ids)).order_by(Event.id).all()
+        asset_ids = normalize_events(session, events)
+    for asset_id in sorted(asset_ids):
+        request_recompute(asset_id)
 
 
+@tracked_job
 def recompute_score_job(asset_id: int) -> None:
     with SessionLocal() as session:
-        compute_score(session, asset_id)
+        if settings.score_mode == "incremental":
+            compute_incremental_score(session, asset_id)
+        else:
+            compute_score(session, asset_id)
+    SCORE_RECOMPUTES.inc()
+
+
+@tracked_job
+def verify_score_state_job() -> list[int]:
+    """Check incremental score state against a full recompute; returns the repaired assets."""
+    with SessionLocal() as session:
+        return verify_states(session)
+
+
+def score_state_verify_interval() -> int:
+    """Seconds between scheduled ``verify_score_state_job`` runs; 0 when none should run."""
+    if settings.score_mode != "incremental" or settings.score_state_verify_interval_seconds <= 0:
+        return 0
+    return max(1, round(settings.score_state_verify_interval_seconds))
+
+
+async def verify_score_state_periodically(interval: float) -> None:
+    """Enqueue ``verify_score_state_job`` every ``interval`` seconds until cancelled.
+
+    Runs in the API process for ``JOB_BACKEND=local``; RQ deployments schedule
+    the job with ``rq cron core.pipeline.cron`` instead.
+    """
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Keyed, so a run still waiting absorbs the next one.
+            await asyncio.to_thread(get_backend().enqueue, verify_score_state_job, key="score-state:verify")
+        except Full:
+            log.warning("score_state_verify_skipped", reason="job queue full")
+
+
+@tracked_job
+def rescore_all_job(version: str | None = None) -> int:
+    with SessionLocal() as session:
+        return rescore_all(session, version)
+
+
+@tracked_job
+def compact_scores_job() -> int:
+    """Compact score history; returns the number of rows reclaimed."""
+    with SessionLocal() as session:
+        return compact_scores(session).total
+
+
+@tracked_job
+def archive_events_job(older_than_days: float | None = None) -> int:
+    """Archive events older than the cutoff; returns the number moved."""
+    days = settings.archive_after_days if older_than_days is None else older_than_days
+    with SessionLocal() as session:
+        return archive_events(session, datetime.now(timezone.utc) - timedelta(days=days)).archived
+
+
+def asset_key(asset_id: int) -> str:
+    """Ordering key of an asset's jobs on backends that honour one."""
+    return f"asset:{asset_id}"
+
+
+def request_recompute(asset_id: int) -> None:
+    """Recompute now, or coalesce into the asset's debounce window when one is configured."""
+    if settings.recompute_debounce_seconds <= 0:
+        recompute_score_job(asset_id)
+        return
+    backend = get_backend()
+    if backend.debounces:
+        # The backend merges a request into the asset's waiting recompute.
+        SCORE_RECOMPUTE_REQUESTS.inc()
+        window = timedelta(seconds=min(settings.recompute_debounce_seconds, settings.recompute_max_staleness_seconds))
+        if not backend.enqueue_in(window, recompute_score_job, asset_id, key=asset_key(asset_id)):
+            SCORE_RECOMPUTE_MERGED.inc()
+        return
+    delay = scheduler.mark_dirty(asset_id)
+    if delay is not None:
+        backend.enqueue_in(timedelta(seconds=delay), scheduled_recompute_job, asset_id)
+
+
+@tracked_job
+def scheduled_recompute_job(asset_id: int) -> None:
+    remaining = scheduler.claim_due(asset_id)
+    if remaining is None:
+        return
+    if remaining > 0:
+        get_backend().enqueue_in(timedelta(seconds=remaining), scheduled_recompute_job, asset_id)
+        return
+    recompute_score_job(asset_id)
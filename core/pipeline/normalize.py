@@ -1,20 +1,98 @@
 from __future__ import annotations
 
+from typing import Any, Iterable, Iterator
+
+import structlog
 from sqlalchemy.orm import Session
 
-from infra.db import Event, Indicator
+from infra.db import Event, Indicator, upsert
+from infra.metrics import EVENTS_UNPARSEABLE, STAGE_SECONDS
+from infra.settings import settings
+from infra.tsstore import get_store
 from core.scoring import features
+from core.scoring.incremental import apply_indicators
+from .stats import bump_asset_stats, new_indicator_rows
 
+log = structlog.get_logger(__name__)
 
-def normalize_event(session: Session, event: Event) -> Indicator:
+# Rows per multi-row upsert; keeps bound parameters well under SQLite/Postgres limits.
+UPSERT_CHUNK = 1000
+
+
+def indicator_row(event: Event) -> dict[str, Any]:
     key, value = features.payload_to_indicator(event.payload)
-    indicator = Indicator(
-        asset_id=event.asset_id,
-        key=key,
-        ts=event.ingested_at,
-        value=value,
-        meta={},
-    )
-    session.merge(indicator)
-    session.commit()
-    return indicator
+    return {"asset_id": event.asset_id, "key": key, "ts": event.ingested_at, "value": value, "meta": {}}
+
+
+def indicator_rows(events: Iterable[Event]) -> Iterator[dict[str, Any]]:
+    """Indicator rows of ``events`` in order; events whose payload holds no indicator are logged and skipped."""
+    for event in events:
+        try:
+            yield indicator_row(event)
+        except (KeyError, TypeError, ValueError) as exc:
+            EVENTS_UNPARSEABLE.inc()
+            log.warning("event_unparseable", trace_id=event.trace_id, kind=event.kind, error=repr(exc))
+
+
+def upsert_indicators(session: Session, rows: list[dict[str, Any]]) -> None:
+    """Insert indicators, overwriting the value of an existing ``(asset_id, key, ts)`` row."""
+    if settings.asset_stats_enabled:
+        bump_asset_stats(session, new_indicator_rows(session, rows))
+    for start in range(0, len(rows), UPSERT_CHUNK):
+        stmt = upsert(session, Indicator).values(rows[start:start + UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["asset_id", "key", "ts"],
+            set_={"value": stmt.excluded.value, "meta": stmt.excluded.meta},
+        )
+        session.execute(stmt)
+
+
+def _commit(session: Session, rows: list[dict[str, Any]]) -> None:
+    # The store marks the rows' series pending first, so a crash before _after_commit
+    # stores them leaves those series read from the database.
+    store = get_store()
+    if store is not None:
+        store.begin(rows)
+    try:
+        session.commit()
+    except BaseException:
+        if store is not None:
+            store.cancel(rows)
+        raise
+
+
+def _after_commit(session: Session, rows: list[dict[str, Any]]) -> None:
+    # After the commit, so neither holds points the database rolled back.
+    store = get_store()
+    if store is not None:
+        store.write(rows)
+    if settings.score_mode == "incremental":
+        apply_indicators(session, rows)
+
+
+@STAGE_SECONDS.labels("normalize").time()
+def normalize_event(session: Session, event: Event) -> Indicator:
+    row = indicator_row(event)
+    upsert_indicators(session, [row])
+    _commit(session, [row])
+    _after_commit(session, [row])
+    return Indicator(**row)
+
+
+@STAGE_SECONDS.labels("normalize").time()
+def normalize_events(session: Session, events: Iterable[Event]) -> set[int]:
+    """Normalize many events with one upsert and commit; returns the touched asset ids.
+
+    When several events map to the same ``(asset_id, key, ts)`` the last one wins,
+    as it would when normalizing them one by one. An event whose payload holds
+    no indicator is skipped without failing the rest of the batch.
+    """
+    rows: dict[tuple, dict[str, Any]] = {}
+    for row in indicator_rows(events):
+        rows[(row["asset_id"], row["key"], row["ts"])] = row
+    if not rows:
+        return set()
+    upsert_indicators(session, list(rows.values()))
+    _commit(session, list(rows.values()))
+    _after_commit(session, list(rows.values()))
+    return {asset_id for asset_id, _, _ in rows}
@@ -0,0 +1,383 @@
+"""Rebuild indicators and scores by replaying every event.
+
+Assets are split into partitions of roughly equal event counts and handed to a
+process pool. Each worker streams its assets' events, archived ones first,
+then the table in keyset-paginated batches ordered by
+``(asset_id, ingested_at, id)``, and upserts the indicators of each batch in
+its own transaction. Once every partition is in, the memory-mapped store and
+incremental score state are rebuilt when enabled, and every asset is scored
+once with :func:`core.scoring.bulk.rescore_all`.
+
+Finished partitions are recorded in a checkpoint file; rerunning the same
+command after an interruption skips them (upserts are idempotent, so a
+partition cut off halfway is simply replayed again). The file is removed when
+the replay completes. Events whose payload holds no indicator are skipped and
+counted.
+
+Replaying only upserts, so indicators no event produces any more (say, under
+a key ``payload_to_indicator`` no longer emits) survive and keep feeding
+scores. ``--prune`` replaces each asset's indicators instead: once an asset
+is replayed, its stored points that the replay did not produce are deleted.
+``diff`` replays into memory instead and reports, per asset, indicators the
+replay would add, change and leave without a source event (deleted with
+``--prune``), and whether the asset's score would change::
+
+    python -m core.pipeline.replay diff --prune
+    python -m core.pipeline.replay run --workers 8 --prune
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import asdict, dataclass, field
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Sequence
+
+import numpy as np
+from sqlalchemy import delete, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from infra.db import Event, Indicator, SessionLocal, get_engine
+from infra.settings import settings
+from infra.tsstore import get_store, rebuild as rebuild_tsstore
+from core.scoring.bulk import rescore_all, score_matrix
+from core.scoring.history import content_hash, current_scores
+from core.scoring.incremental import rebuild_states
+from core.scoring.weights import registry
+from .archive import EventArchive
+from .normalize import indicator_rows, upsert_indicators
+from .stats import _naive_utc, rebuild_asset_stats
+
+CHECKPOINT = "replay-checkpoint.json"
+# Partitions per worker, so a slow partition does not leave the other workers idle at the end.
+PARTITIONS_PER_WORKER = 4
+# Indicator ids per prune DELETE.
+PRUNE_CHUNK = 1000
+
+
+@dataclass
+class AssetDiff:
+    """What a replay would do to one asset's indicators and score."""
+
+    asset_id: int
+    added: int = 0
+    changed: int = 0
+    # Stored points no replayed event produces: kept, or deleted with prune.
+    orphaned: int = 0
+    score_changed: bool = False
+
+
+@dataclass
+class ReplayReport:
+    assets: int = 0
+    events: int = 0
+    skipped: int = 0
+    indicators: int = 0
+    pruned: int = 0
+    scored: int = 0
+    diffs: list[AssetDiff] = field(default_factory=list)
+
+    def add(self, other: ReplayReport) -> None:
+        self.assets += other.assets
+        self.events += other.events
+        self.skipped += other.skipped
+        self.indicators += other.indicators
+        self.pruned += other.pruned
+        self.diffs.extend(other.diffs)
+
+
+def _batches(events: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    it = iter(events)
+    while batch := list(islice(it, size)):
+        yield batch
+
+
+def table_events(session: Session, asset_ids: Sequence[int], batch_size: int) -> Iterator[Sequence[Any]]:
+    """Yield the assets' events in batches, keyset-paginated on ``(asset_id, ingested_at, id)``."""
+    cols = (Event.asset_id, Event.ingested_at, Event.id)
+    last: tuple | None = None
+    while True:
+        q = select(*cols, Event.payload, Event.trace_id, Event.kind).where(Event.asset_id.in_(asset_ids))
+        if last is not None:
+            q = q.where(tuple_(*cols) > last)
+        batch = session.execute(q.order_by(*cols).limit(batch_size)).all()
+        if not batch:
+            return
+        yield batch
+        last = batch[-1][:3]
+
+
+def _rows(batch: Sequence[Any], report: ReplayReport) -> dict[tuple, dict[str, Any]]:
+    # Keyed on (asset_id, key, ts); a later event for the same point wins, as in normalize_events.
+    rows = {}
+    parsed = 0
+    for row in indicator_rows(batch):
+        rows[(row["asset_id"], row["key"], _naive_utc(row["ts"]))] = row
+        parsed += 1
+    report.events += len(batch)
+    report.skipped += len(batch) - parsed
+    return rows
+
+
+def prune_indicators(session: Session, asset_ids: Sequence[int], produced: set[tuple]) -> int:
+    """Delete the assets' indicators whose ``(asset_id, key, ts)`` is not in ``produced``; returns the count."""
+    stale = [
+        indicator_id
+        for indicator_id, asset_id, key, ts in session.execute(
+            select(Indicator.id, Indicator.asset_id, Indicator.key, Indicator.ts).where(Indicator.asset_id.in_(asset_ids))
+        )
+        if (asset_id, key, _naive_utc(ts)) not in produced
+    ]
+    for start in range(0, len(stale), PRUNE_CHUNK):
+        session.execute(delete(Indicator).where(Indicator.id.in_(stale[start:start + PRUNE_CHUNK])))
+    session.commit()
+    return len(stale)
+
+
+def replay_assets(
+    session: Session,
+    asset_ids: Sequence[int],
+    batch_size: int,
+    dry_run: bool = False,
+    archive_root: str | None = None,
+    prune: bool = False,
+) -> ReplayReport:
+    """Replay the events of ``asset_ids``; with ``dry_run``, diff instead of writing.
+
+    With ``prune``, stored indicators of these assets that no event produced
+    are deleted (or, with ``dry_run``, left out of the score diff).
+    """
+    report = ReplayReport(assets=len(asset_ids))
+    replayed: dict[tuple, dict[str, Any]] = {}
+    produced: set[tuple] = set()
+    archived = EventArchive(archive_root).iter_events(asset_ids) if archive_root is not None else iter(())
+    for source in (_batches(archived, batch_size), table_events(session, asset_ids, batch_size)):
+        for batch in source:
+            rows = _rows(batch, report)
+            if dry_run:
+                replayed.update(rows)
+                continue
+            upsert_indicators(session, list(rows.values()))
+            session.commit()
+            report.indicators += len(rows)
+            if prune:
+                produced.update(rows)
+    if dry_run:
+        report.indicators = len(replayed)
+        report.diffs = diff_assets(session, asset_ids, replayed, prune)
+    elif prune:
+        report.pruned = prune_indicators(session, asset_ids, produced)
+    return report
+
+
+def diff_assets(
+    session: Session, asset_ids: Sequence[int], replayed: dict[tuple, dict[str, Any]], prune: bool = False
+) -> list[AssetDiff]:
+    """Compare replayed indicator rows with the stored ones; returns the assets that differ.
+
+    Stored points the replay does not produce are kept and still count towards
+    the score it would compute, unless ``prune`` deletes them.
+    """
+    stored = {
+        (asset_id, key, _naive_utc(ts)): value
+        for asset_id, key, ts, value in session.execute(
+            select(Indicator.asset_id, Indicator.key, Indicator.ts, Indicator.value).where(
+                Indicator.asset_id.in_(asset_ids)
+            )
+        )
+    }
+    diffs = {asset_id: AssetDiff(asset_id) for asset_id in asset_ids}
+    after = {} if prune else dict(stored)
+    for point, row in replayed.items():
+        if point not in stored:
+            diffs[point[0]].added += 1
+        elif stored[point] != row["value"]:
+            diffs[point[0]].changed += 1
+        after[point] = row["value"]
+    for point in stored.keys() - replayed.keys():
+        diffs[point[0]].orphaned += 1
+
+    weights = registry.get()
+    row_of = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+    latest: dict[tuple[int, str], tuple] = {}
+    for (asset_id, key, ts), value in after.items():
+        if key in weights.key_index and ((asset_id, key) not in latest or ts > latest[asset_id, key][0]):
+            latest[asset_id, key] = (ts, value)
+    matrix = np.full((len(asset_ids), len(weights.keys)), np.nan)
+    for (asset_id, key), (_, value) in latest.items():
+        matrix[row_of[asset_id], weights.key_index[key]] = value
+    totals, breakdowns = score_matrix(weights, matrix)
+    current = current_scores(session, list(asset_ids))
+    for i, asset_id in enumerate(asset_ids):
+        digest = content_hash(int(totals[i]), breakdowns[i], weights.version)
+        diffs[asset_id].score_changed = current.get(asset_id, (None, None, None))[1] != digest
+    return [d for d in diffs.values() if d.added or d.changed or d.orphaned or d.score_changed]
+
+
+def _init_worker() -> None:
+    # A forked worker must not share the parent's pooled connections.
+    if get_engine.cache_info().currsize:
+        get_engine().dispose(close=False)
+
+
+def replay_partition(
+    asset_ids: list[int], batch_size: int, dry_run: bool, archive_root: str | None, prune: bool = False
+) -> tuple[list[int], ReplayReport]:
+    """Process pool entry point: replay one partition on a session of its own."""
+    with SessionLocal() as session:
+        return asset_ids, replay_assets(session, asset_ids, batch_size, dry_run, archive_root, prune)
+
+
+def event_counts(session: Session, archive_root: str | None = None, with_indicators: bool = False) -> dict[int, int]:
+    """Events per asset, in the table and (estimated from the manifest) in the archive.
+
+    ``with_indicators`` also lists assets that have indicators but no events, with a count of 0.
+    """
+    counts = dict(session.execute(select(Event.asset_id, func.count()).group_by(Event.asset_id)).all())
+    if with_indicators:
+        for asset_id in session.scalars(select(Indicator.asset_id).distinct()):
+            counts.setdefault(asset_id, 0)
+    if archive_root is not None:
+        for chunk in EventArchive(archive_root).chunks():
+            for asset_id in chunk.asset_ids:
+                counts[asset_id] = counts.get(asset_id, 0) + max(1, chunk.count // len(chunk.asset_ids))
+    return counts
+
+
+def partition(counts: dict[int, int], parts: int) -> list[list[int]]:
+    """Split assets, in id order, into about ``parts`` runs of similar event counts."""
+    target = max(1, sum(counts.values()) // max(1, parts))
+    partitions: list[list[int]] = [[]]
+    size = 0
+    for asset_id in sorted(counts):
+        if size >= target:
+            partitions.append([])
+            size = 0
+        partitions[-1].append(asset_id)
+        size += counts[asset_id]
+    return [p for p in partitions if p]
+
+
+def _load_checkpoint(path: Path, mode: str) -> tuple[set[int], ReplayReport]:
+    if not path.exists():
+        return set(), ReplayReport()
+    state = json.loads(path.read_text())
+    if state["mode"] != mode:
+        raise ValueError(f"{path} belongs to an interrupted {state['mode']!r} replay")
+    report = ReplayReport(**{**state["report"], "diffs": [AssetDiff(**d) for d in state["report"]["diffs"]]})
+    return set(state["done"]), report
+
+
+def _save_checkpoint(path: Path, mode: str, done: set[int], report: ReplayReport) -> None:
+    tmp = path.with_name(path.name + ".tmp")
+    tmp.write_text(json.dumps({"mode": mode, "done": sorted(done), "report": asdict(report)}))
+    os.replace(tmp, path)
+
+
+def replay(
+    session: Session,
+    workers: int | None = None,
+    batch_size: int | None = None,
+    dry_run: bool = False,
+    checkpoint: str | os.PathLike[str] | None = CHECKPOINT,
+    asset_ids: Iterable[int] | None = None,
+    archive_root: str | None = None,
+    prune: bool = False,
+) -> ReplayReport:
+    """Replay events into indicators across ``workers`` processes, then rescore every asset.
+
+    ``workers=0`` replays in this process on ``session``. ``archive_root``
+    defaults to ``settings.archive_dir``; pass ``""`` to leave archived events
+    out. ``checkpoint=None`` disables resuming. ``prune`` replaces each
+    asset's indicators with exactly what its events produce.
+    """
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    batch_size = batch_size or settings.replay_batch_size
+    if prune and archive_root == "" and EventArchive().chunks():
+        raise ValueError("pruning without the archive would delete the indicators of archived events")
+    archive_root = settings.archive_dir if archive_root is None else archive_root or None
+    mode = ("diff" if dry_run else "run") + ("+prune" if prune else "")
+    path = Path(checkpoint) if checkpoint is not None else None
+    done, report = _load_checkpoint(path, mode) if path is not None else (set(), ReplayReport())
+
+    counts = event_counts(session, archive_root, with_indicators=prune)
+    if asset_ids is not None:
+        wanted = set(asset_ids)
+        counts = {a: c for a, c in counts.items() if a in wanted}
+    pending = {a: c for a, c in counts.items() if a not in done}
+    partitions = partition(pending, max(1, workers) * PARTITIONS_PER_WORKER)
+
+    def finished(assets: list[int], result: ReplayReport) -> None:
+        done.update(assets)
+        report.add(result)
+        if path is not None:
+            _save_checkpoint(path, mode, done, report)
+
+    if workers == 0:
+        for assets in partitions:
+            finished(assets, replay_assets(session, assets, batch_size, dry_run, archive_root, prune))
+    elif partitions:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker) as pool:
+            futures = [pool.submit(replay_partition, p, batch_size, dry_run, archive_root, prune) for p in partitions]
+            for future in as_completed(futures):
+                finished(*future.result())
+
+    if not dry_run:
+        if prune and settings.asset_stats_enabled:
+            # Normalization's bookkeeping only counts inserts.
+            rebuild_asset_stats(session)
+        store = get_store()
+        if store is not None:
+            rebuild_tsstore(session, store)
+        if settings.score_mode == "incremental":
+            rebuild_states(session)
+        report.scored = rescore_all(session)
+    report.diffs.sort(key=lambda d: d.asset_id)
+    if path is not None:
+        path.unlink(missing_ok=True)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Rebuild indicators and scores from events")
+    parser.add_argument("command", choices=["run", "diff"])
+    parser.add_argument("--workers", type=int, default=None, help="processes (default: all cores, 0: inline)")
+    parser.add_argument("--batch-size", type=int, default=None)
+    parser.add_argument("--checkpoint", default=CHECKPOINT)
+    parser.add_argument("--asset-id", type=int, action="append", dest="asset_ids")
+    parser.add_argument("--skip-archive", action="store_true", help="replay table events only")
+    parser.add_argument("--prune", action="store_true", help="delete indicators no event produces")
+    args = parser.parse_args()
+
+    with SessionLocal() as session:
+        report = replay(
+            session,
+            workers=args.workers,
+            batch_size=args.batch_size,
+            dry_run=args.command == "diff",
+            checkpoint=args.checkpoint,
+            asset_ids=args.asset_ids,
+            archive_root="" if args.skip_archive else None,
+            prune=args.prune,
+        )
+    print(f"replayed {report.events} events of {report.assets} assets into {report.indicators} indicators")
+    if report.skipped:
+        print(f"skipped {report.skipped} events without an indicator payload")
+    if args.command == "run":
+        if args.prune:
+            print(f"pruned {report.pruned} indicators")
+        print(f"scored {report.scored} assets")
+        return
+    orphaned = "-" if args.prune else "="
+    for d in report.diffs:
+        score = "  score changes" if d.score_changed else ""
+        print(f"{d.asset_id}\t+{d.added}\t~{d.changed}\t{orphaned}{d.orphaned}{score}")
+    print(f"{len(report.diffs)} assets differ")
+    raise SystemExit(1 if report.diffs else 0)
+
+
+if __name__ == "__main__":
+    main()
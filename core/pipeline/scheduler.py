@@ -0,0 +1,109 @@
+"""Debounced score recompute bookkeeping.
+
+Dirty assets live in a Redis sorted set scored by the time their recompute is
+due. The first request for an asset schedules exactly one delayed job; later
+requests only push the due time out (up to the max-staleness bound), so
+duplicates are merged in Redis instead of piling up in the RQ queue. A pending
+entry whose job never claimed it (lost, or failed for good) would otherwise
+merge every later request forever; once it is overdue by
+``RECOMPUTE_LOST_AFTER_SECONDS`` the next request treats the asset as newly
+dirty and schedules a fresh job. The Lua scripts are registered on first use,
+so importing this module needs no Redis.
+"""
+from __future__ import annotations
+
+import functools
+import time
+
+import structlog
+from redis.commands.core import Script
+
+from infra.metrics import SCORE_RECOMPUTE_MERGED, SCORE_RECOMPUTE_REQUESTS
+from infra.redis import get_redis
+from infra.settings import settings
+
+DUE_KEY = "recompute:due"
+FIRST_KEY = "recompute:first"
+
+log = structlog.get_logger(__name__)
+
+MARK_DIRTY = """
+local now = tonumber(ARGV[2])
+local first = redis.call('HGET', KEYS[2], ARGV[1])
+local new = 0
+if first then
+  local due = redis.call('ZSCORE', KEYS[1], ARGV[1])
+  if not due or now > tonumber(due) + tonumber(ARGV[5]) then
+    first = false
+    new = 2
+  end
+end
+if not first then
+  first = now
+  if new == 0 then new = 1 end
+  redis.call('HSET', KEYS[2], ARGV[1], ARGV[2])
+end
+local due = math.min(now + tonumber(ARGV[3]), tonumber(first) + tonumber(ARGV[4]))
+redis.call('ZADD', KEYS[1], due, ARGV[1])
+return new
+"""
+
+CLAIM_DUE = """
+local due = redis.call('ZSCORE', KEYS[1], ARGV[1])
+if not due then return -1 end
+local wait = tonumber(due) - tonumber(ARGV[2])
+if wait > 0 then return tostring(wait) end
+redis.call('ZREM', KEYS[1], ARGV[1])
+redis.call('HDEL', KEYS[2], ARGV[1])
+return 0
+"""
+
+
+@functools.cache
+def _script(source: str) -> Script:
+    return get_redis().register_script(source)
+
+
+def mark_dirty(asset_id: int) -> float | None:
+    """Record a recompute request.
+
+    Returns the delay after which a recompute job must be scheduled when the
+    asset just became dirty (or its pending job was lost), or None when a
+    recompute is already pending.
+    """
+    SCORE_RECOMPUTE_REQUESTS.inc()
+    new = int(
+        _script(MARK_DIRTY)(
+            keys=[DUE_KEY, FIRST_KEY],
+            args=[
+                asset_id,
+                time.time(),
+                settings.recompute_debounce_seconds,
+                settings.recompute_max_staleness_seconds,
+                settings.recompute_lost_after_seconds,
+            ],
+        )
+    )
+    if not new:
+        SCORE_RECOMPUTE_MERGED.inc()
+        return None
+    if new == 2:
+        log.warning("recompute_job_lost", asset_id=asset_id)
+    return min(settings.recompute_debounce_seconds, settings.recompute_max_staleness_seconds)
+
+
+def claim_due(asset_id: int) -> float | None:
+    """Claim a pending recompute.
+
+    Returns 0 when the caller should recompute now, the remaining seconds when
+    the window was extended by later requests, or None when nothing is pending.
+    """
+    result = _script(CLAIM_DUE)(keys=[DUE_KEY, FIRST_KEY], args=[asset_id, time.time()])
+    wait = float(result)
+    if wait < 0:
+        return None
+    return wait
+
+
+def pending_count() -> int:
+    return int(get_redis().zcard(DUE_KEY))
@@ -0,0 +1,94 @@
+"""Per-asset indicator statistics backing ``GET /assets/``.
+
+Normalization bumps ``asset_stats`` for indicators it inserts (updates of an
+existing ``(asset_id, key, ts)`` do not change the count). Rebuild it from the
+``indicators`` table with::
+
+    python -m core.pipeline.stats rebuild
+"""
+from __future__ import annotations
+
+import argparse
+from datetime import datetime, timezone
+from typing import Any
+
+from sqlalchemy import case, func, select, tuple_
+from sqlalchemy.orm import Session
+
+from infra.db import AssetStats, Indicator, SessionLocal, upsert
+
+# (asset_id, key, ts) tuples per existence check.
+LOOKUP_CHUNK = 500
+
+
+def _naive_utc(ts: datetime) -> datetime:
+    return ts.astimezone(timezone.utc).replace(tzinfo=None) if ts.tzinfo else ts
+
+
+def new_indicator_rows(session: Session, rows: list[dict[str, Any]]) -> list[dict[str, Any]]:
+    """Return the rows whose ``(asset_id, key, ts)`` is not stored yet."""
+    existing = set()
+    cols = tuple_(Indicator.asset_id, Indicator.key, Indicator.ts)
+    for start in range(0, len(rows), LOOKUP_CHUNK):
+        chunk = [(r["asset_id"], r["key"], r["ts"]) for r in rows[start:start + LOOKUP_CHUNK]]
+        for asset_id, key, ts in session.execute(
+            select(Indicator.asset_id, Indicator.key, Indicator.ts).where(cols.in_(chunk))
+        ):
+            existing.add((asset_id, key, _naive_utc(ts)))
+    return [r for r in rows if (r["asset_id"], r["key"], _naive_utc(r["ts"])) not in existing]
+
+
+def bump_asset_stats(session: Session, rows: list[dict[str, Any]]) -> None:
+    """Add newly inserted indicator rows to ``asset_stats``. The caller commits."""
+    deltas: dict[int, tuple[int, datetime]] = {}
+    for r in rows:
+        count, last = deltas.get(r["asset_id"], (0, r["ts"]))
+        deltas[r["asset_id"]] = (count + 1, max(last, r["ts"]))
+    if not deltas:
+        return
+    stmt = upsert(session, AssetStats).values(
+        [{"asset_id": a, "indicator_count": c, "last_updated": ts} for a, (c, ts) in deltas.items()]
+    )
+    stmt = stmt.on_conflict_do_update(
+        index_elements=["asset_id"],
+        set_={
+            "indicator_count": AssetStats.indicator_count + stmt.excluded.indicator_count,
+            "last_updated": case(
+                (
+                    AssetStats.last_updated.is_(None) | (stmt.excluded.last_updated > AssetStats.last_updated),
+                    stmt.excluded.last_updated,
+                ),
+                else_=AssetStats.last_updated,
+            ),
+        },
+    )
+    session.execute(stmt)
+
+
+def rebuild_asset_stats(session: Session) -> int:
+    """Recompute ``asset_stats`` from ``indicators``; returns the number of assets."""
+    session.query(AssetStats).delete()
+    rows = session.execute(
+        select(Indicator.asset_id, func.count(Indicator.id), func.max(Indicator.ts)).group_by(Indicator.asset_id)
+    ).all()
+    for start in range(0, len(rows), LOOKUP_CHUNK):
+        session.execute(
+            upsert(session, AssetStats).values(
+                [{"asset_id": a, "indicator_count": c, "last_updated": ts} for a, c, ts in rows[start:start + LOOKUP_CHUNK]]
+            )
+        )
+    session.commit()
+    return len(rows)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain the asset_stats table")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    with SessionLocal() as session:
+        count = rebuild_asset_stats(session)
+    print(f"rebuilt asset_stats for {count} assets")
+
+
+if __name__ == "__main__":
+    main()
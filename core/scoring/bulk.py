@@ -0,0 +1,110 @@
+"""Whole-universe rescoring.
+
+Loads the latest indicator matrix (assets x weighted keys) in one query and
+scores every asset at once with NumPy. Component products, truncation and
+summation order mirror :func:`core.scoring.engine.compute_score`, so the rows
+written are identical to calling it once per asset.
+"""
+from __future__ import annotations
+
+from typing import Sequence
+
+import numpy as np
+from sqlalchemy import insert, select
+from sqlalchemy.orm import Session
+
+from infra.db import Asset, Score
+from infra.metrics import SCORE_WRITES, SCORES_UNCHANGED, STAGE_SECONDS
+from infra.settings import settings
+from .engine import latest_indicator_ts, latest_indicators_stmt
+from .history import content_hash, current_scores, touch_scores
+from .latest import scores_committed, upsert_latest_scores
+from .weights import CompiledWeights, registry
+
+
+def latest_indicator_matrix(
+    session: Session, weights: CompiledWeights, asset_ids: Sequence[int]
+) -> np.ndarray:
+    """Return an ``len(asset_ids) x len(weights.keys)`` matrix of latest values, NaN where missing."""
+    matrix = np.full((len(asset_ids), len(weights.keys)), np.nan)
+    if not weights.keys or not asset_ids:
+        return matrix
+    row_of = {asset_id: i for i, asset_id in enumerate(asset_ids)}
+    for asset_id, key, value in session.execute(latest_indicators_stmt(session, weights.keys)):
+        row = row_of.get(asset_id)
+        if row is not None:
+            matrix[row, weights.key_index[key]] = value
+    return matrix
+
+
+def score_matrix(weights: CompiledWeights, matrix: np.ndarray) -> tuple[np.ndarray, list[dict]]:
+    """Score every row of ``matrix``; returns clamped totals and per-row breakdowns."""
+    n_assets = matrix.shape[0]
+    present = ~np.isnan(matrix)
+    total = np.zeros(n_assets)
+    breakdowns: list[dict] = [{} for _ in range(n_assets)]
+    for pillar in weights.pillars:
+        cols = [weights.key_index[k] for k in pillar.keys]
+        contrib = matrix[:, cols] * np.asarray(pillar.weights)
+        mask = present[:, cols]
+        truncated = np.trunc(contrib)
+        pillar_total = np.zeros(n_assets)
+        # Accumulate column by column to keep compute_score's summation order bit for bit.
+        for j in range(len(cols)):
+            pillar_total += np.where(mask[:, j], contrib[:, j], 0.0)
+        total += pillar_total
+        for i in range(n_assets):
+            breakdowns[i][pillar.name] = [
+                [key, int(truncated[i, j])] for j, key in enumerate(pillar.keys) if mask[i, j]
+            ]
+    return np.clip(np.trunc(total), -24, 24).astype(int), breakdowns
+
+
+@STAGE_SECONDS.labels("rescore_all").time()
+def rescore_all(session: Session, version: str | None = None) -> int:
+    """Rescore every asset in one transaction; returns the number of assets scored.
+
+    Assets whose result matches their current score are touched or skipped per
+    ``settings.score_unchanged`` rather than getting a new row.
+    """
+    weights = registry.get(version)
+    asset_ids = list(session.execute(select(Asset.id).order_by(Asset.id)).scalars())
+    if not asset_ids:
+        return 0
+    totals, breakdowns = score_matrix(weights, latest_indicator_matrix(session, weights, asset_ids))
+    ts = latest_indicator_ts(session)
+    current = current_scores(session, asset_ids) if settings.score_unchanged != "insert" else {}
+    rows = []
+    touched: list[int] = []
+    changed: list[int] = []
+    for i, asset_id in enumerate(asset_ids):
+        total = int(totals[i])
+        digest = content_hash(total, breakdowns[i], weights.version)
+        held = current.get(asset_id)
+        if held is not None and held[1] == digest:
+            score_id, _, current_ts = held
+            if settings.score_unchanged == "touch" and current_ts < ts:
+                touched.append(score_id)
+                changed.append(asset_id)
+            continue
+        rows.append(
+            {
+                "asset_id": asset_id,
+                "ts": ts,
+                "total": total,
+                "breakdown": breakdowns[i],
+                "version": weights.version,
+                "content_hash": digest,
+            }
+        )
+        changed.append(asset_id)
+    SCORES_UNCHANGED.inc(len(asset_ids) - len(rows))
+    if rows:
+        scores = session.scalars(insert(Score).returning(Score, sort_by_parameter_order=True), rows).all()
+        upsert_latest_scores(session, scores)
+    touch_scores(session, touched, ts)
+    session.commit()
+    SCORE_WRITES.labels("insert").inc(len(rows))
+    SCORE_WRITES.labels("touch").inc(len(touched))
+    scores_committed(session, changed)
+    return len(asset_ids)
@@ -2,12 +2,18 @@ from __future__ import annotations
 
 from dataclasses import dataclass
 from datetime import datetime
+from typing import Sequence
 
+from sqlalchemy import ColumnElement, Select, func, select
 from sqlalchemy.orm import Session
 
-from infra.db import Indicator, Score
-
-import yaml  # type: ignore[import-untyped]
+from infra.db import Indicator, LatestScore, Score
+from infra.metrics import SCORE_WRITES, SCORES_UNCHANGED, STAGE_SECONDS
+from infra.settings import settings
+from infra.tsstore import get_store
+from .history import content_hash, touch_scores
+from .latest import scores_committed, upsert_latest_scores
+from .weights import registry
 
 
 @dataclass
@@ -18,41 +24,119 @@ class PillarScore:
 
 
 def load_weights() -> dict:
-    with open("core/scoring/weights.yaml", "r") as fh:
-        return yaml.safe_load(fh)
+    return registry.current().raw
+
+
+def latest_indicators_stmt(
+    session: Session, keys: Sequence[str], asset_ids: Sequence[int] | None = None, with_ts: bool = False
+) -> Select:
+    """Select ``(asset_id, key, value)`` of the newest indicator per asset and key.
+
+    ``asset_ids=None`` covers every asset; ``with_ts`` appends the indicator ``ts``.
+    """
+    cond: ColumnElement[bool] = Indicator.key.in_(keys)
+    if asset_ids is not None:
+        cond &= Indicator.asset_id.in_(asset_ids)
+    cols = (Indicator.asset_id, Indicator.key, Indicator.value) + ((Indicator.ts,) if with_ts else ())
+    if session.get_bind().dialect.name == "postgresql":
+        return (
+            select(*cols)
+            .where(cond)
+            .order_by(Indicator.asset_id, Indicator.key, Indicator.ts.desc())
+            .distinct(Indicator.asset_id, Indicator.key)
+        )
+    # SQLite answers MAX(ts) per key from the (asset_id, key, ts) index; join back for the value.
+    latest_ts = (
+        select(Indicator.asset_id, Indicator.key, func.max(Indicator.ts).label("ts"))
+        .where(cond)
+        .group_by(Indicator.asset_id, Indicator.key)
+        .subquery()
+    )
+    return select(*cols).join(
+        latest_ts,
+        (Indicator.asset_id == latest_ts.c.asset_id)
+        & (Indicator.key == latest_ts.c.key)
+        & (Indicator.ts == latest_ts.c.ts),
+    )
+
+
+def latest_indicator_values(session: Session, asset_id: int, keys: Sequence[str]) -> dict[str, float]:
+    """Fetch the most recent value of each of ``keys`` for an asset.
 
+    Keys the time-series store covers are read from it; the rest take one query.
+    """
+    if not keys:
+        return {}
+    store = get_store()
+    values = store.latest_values(asset_id, store.coverage(asset_id, keys)[1]) if store is not None else {}
+    missing = [key for key in keys if key not in values]
+    if missing:
+        rows = session.execute(latest_indicators_stmt(session, missing, [asset_id]))
+        values.update({key: value for _, key, value in rows})
+    return values
 
-def compute_score(session: Session, asset_id: int) -> Score:
-    weights = load_weights()
+
+def latest_indicator_ts(session: Session) -> datetime:
+    """The as-of timestamp stamped on new scores: the newest indicator overall."""
+    ts_row = session.query(Indicator.ts).order_by(Indicator.ts.desc()).first()
+    return ts_row[0] if ts_row else datetime.utcnow()
+
+
+@STAGE_SECONDS.labels("score").time()
+def compute_score(session: Session, asset_id: int, version: str | None = None) -> Score:
+    """Score an asset under the current weights, or under a loaded weights ``version``.
+
+    When the result matches the asset's current score, that score is returned
+    (touched or left as is per ``settings.score_unchanged``) instead of a new row.
+    """
+    weights = registry.get(version)
+    latest = latest_indicator_values(session, asset_id, list(weights.keys))
     breakdown: dict[str, list[tuple[str, int]]] = {}
     total = 0.0
-    for pillar_name, pdata in weights["pillars"].items():
+    for pillar in weights.pillars:
         comps: list[tuple[str, int]] = []
         pillar_total = 0.0
-        for key, w in pdata["components"].items():
-            ind = (
-                session.query(Indicator)
-                .filter_by(asset_id=asset_id, key=key)
-                .order_by(Indicator.ts.desc())
-                .first()
-            )
-            if ind:
-                comp_score = ind.value * float(w)
+        for key, w in zip(pillar.keys, pillar.weights):
+            value = latest.get(key)
+            if value is not None:
+                comp_score = value * w
                 comps.append((key, int(comp_score)))
                 pillar_total += comp_score
-        breakdown[pillar_name] = comps
+        breakdown[pillar.name] = comps
         total += pillar_total
-    total_int = max(-24, min(24, int(total)))
-    ts_row = session.query(Indicator.ts).order_by(Indicator.ts.desc()).first()
-    ts = ts_row[0] if ts_row else datetime.utcnow()
+    return store_score(session, asset_id, max(-24, min(24, int(total))), breakdown, weights.version)
+
+
+def store_score(session: Session, asset_id: int, total_int: int, breakdown: dict[str, list], version: str) -> Score:
+    """Write a computed score with its projection and commit, unless it matches the current one."""
+    ts = latest_indicator_ts(session)
+    digest = content_hash(total_int, breakdown, version)
+    if settings.score_unchanged != "insert":
+        current = session.scalar(
+            select(Score).join(LatestScore, LatestScore.score_id == Score.id).where(LatestScore.asset_id == asset_id)
+        )
+        if current is not None and current.content_hash == digest:
+            SCORES_UNCHANGED.inc()
+            if settings.score_unchanged == "touch" and current.ts < ts:
+                touch_scores(session, [current.id], ts)
+                session.commit()
+                SCORE_WRITES.labels("touch").inc()
+                scores_committed(session, [asset_id])
+                session.refresh(current)
+            return current
     score_obj = Score(
         asset_id=asset_id,
         ts=ts,
         total=total_int,
         breakdown=breakdown,
-        version=weights["version"],
+        version=version,
+        content_hash=digest,
     )
     session.add(score_obj)
+    session.flush()
+    upsert_latest_scores(session, [score_obj])
     session.commit()
+    SCORE_WRITES.labels("insert").inc()
+    scores_committed(session, [asset_id])
     session.refresh(score_obj)
     return score_obj
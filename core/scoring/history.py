@@ -0,0 +1,138 @@
+"""Score history: change detection on write and compaction of old rows.
+
+A recompute whose result matches the asset's current score (same content
+hash) does not insert a new row; depending on ``SCORE_UNCHANGED`` it touches
+the current row's ``ts`` or skips the write entirely.
+
+Compaction downsamples old history to one row per asset per hour past
+``SCORE_COMPACT_HOURLY_AFTER_DAYS`` and per day past
+``SCORE_COMPACT_DAILY_AFTER_DAYS``, keeping the newest row of each bucket, and
+drops rows past ``SCORE_RETENTION_DAYS`` when set. Rows referenced by
+``latest_scores`` are never removed. Run it with::
+
+    python -m core.scoring.history compact
+"""
+from __future__ import annotations
+
+import argparse
+import hashlib
+import json
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import Any, Iterable, Sequence, cast
+
+from sqlalchemy import CursorResult, Select, delete, func, select, update
+from sqlalchemy.orm import Session
+
+from core.timeseries import bucket_start
+from infra.db import LatestScore, Score, SessionLocal, db_timestamp
+from infra.metrics import SCORE_ROWS_COMPACTED
+from infra.settings import settings
+
+# Ids per lookup/update statement.
+LOOKUP_CHUNK = 500
+
+
+def content_hash(total: int, breakdown: dict[str, Any], version: str) -> str:
+    """Digest of what a score says; equal hashes mean an identical row."""
+    raw = json.dumps([total, breakdown, version], separators=(",", ":")).encode()
+    return hashlib.blake2b(raw, digest_size=16).hexdigest()
+
+
+def current_scores(session: Session, asset_ids: Sequence[int]) -> dict[int, tuple[int, str | None, datetime]]:
+    """Map asset id to ``(score_id, content_hash, ts)`` of the score ``latest_scores`` points at."""
+    current = {}
+    for start in range(0, len(asset_ids), LOOKUP_CHUNK):
+        chunk = asset_ids[start:start + LOOKUP_CHUNK]
+        rows = session.execute(
+            select(LatestScore.asset_id, Score.id, Score.content_hash, Score.ts)
+            .join(Score, Score.id == LatestScore.score_id)
+            .where(LatestScore.asset_id.in_(chunk))
+        )
+        for asset_id, score_id, digest, ts in rows:
+            current[asset_id] = (score_id, digest, ts)
+    return current
+
+
+def touch_scores(session: Session, score_ids: Sequence[int], ts: datetime) -> None:
+    """Move unchanged scores (and their projection rows) forward to ``ts``. The caller commits."""
+    for start in range(0, len(score_ids), LOOKUP_CHUNK):
+        chunk = score_ids[start:start + LOOKUP_CHUNK]
+        session.execute(update(Score).where(Score.id.in_(chunk), Score.ts < ts).values(ts=ts))
+        session.execute(
+            update(LatestScore).where(LatestScore.score_id.in_(chunk), LatestScore.ts < ts).values(ts=ts)
+        )
+
+
+@dataclass
+class CompactionReport:
+    expired: int = 0
+    daily: int = 0
+    hourly: int = 0
+
+    @property
+    def total(self) -> int:
+        return self.expired + self.daily + self.hourly
+
+
+def _superseded_stmt(session: Session, seconds: int, before: datetime, since: datetime | None) -> Select:
+    """Ids in ``[since, before)`` that are not the newest row of their asset's ``seconds`` bucket."""
+    cond = (Score.ts < before) & Score.id.not_in(select(LatestScore.score_id))
+    if since is not None:
+        cond &= Score.ts >= since
+    bucket = bucket_start(session, Score.ts, seconds)
+    rn = func.row_number().over(partition_by=(Score.asset_id, bucket), order_by=(Score.ts.desc(), Score.id.desc()))
+    ranked = select(Score.id, rn.label("rn")).where(cond).subquery()
+    return select(ranked.c.id).where(ranked.c.rn > 1)
+
+
+def _delete_ids(session: Session, ids: Iterable[int], batch_size: int) -> int:
+    """Delete ``ids`` committing every ``batch_size`` rows; returns the number removed."""
+    ids = list(ids)
+    removed = 0
+    for start in range(0, len(ids), batch_size):
+        result = session.execute(delete(Score).where(Score.id.in_(ids[start:start + batch_size])))
+        removed += cast(CursorResult, result).rowcount
+        session.commit()
+    SCORE_ROWS_COMPACTED.inc(removed)
+    return removed
+
+
+def compact_scores(session: Session, now: datetime | None = None, batch_size: int | None = None) -> CompactionReport:
+    """Downsample and expire score history in bounded transactions."""
+    now = now or datetime.now(timezone.utc)
+    batch_size = batch_size or settings.score_compact_batch_size
+    daily_before = db_timestamp(session, now - timedelta(days=settings.score_compact_daily_after_days))
+    hourly_before = db_timestamp(session, now - timedelta(days=settings.score_compact_hourly_after_days))
+    report = CompactionReport()
+
+    expire_before = None
+    if settings.score_retention_days > 0:
+        expire_before = db_timestamp(session, now - timedelta(days=settings.score_retention_days))
+        expired = session.execute(
+            select(Score.id).where(Score.ts < expire_before, Score.id.not_in(select(LatestScore.score_id)))
+        ).scalars()
+        report.expired = _delete_ids(session, expired, batch_size)
+
+    daily = session.execute(_superseded_stmt(session, 86400, daily_before, expire_before)).scalars()
+    report.daily = _delete_ids(session, daily, batch_size)
+    hourly = session.execute(_superseded_stmt(session, 3600, hourly_before, daily_before)).scalars()
+    report.hourly = _delete_ids(session, hourly, batch_size)
+    return report
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain score history")
+    parser.add_argument("command", choices=["compact"])
+    parser.add_argument("--batch-size", type=int, default=None, help="Rows deleted per transaction")
+    args = parser.parse_args()
+    with SessionLocal() as session:
+        report = compact_scores(session, batch_size=args.batch_size)
+    print(
+        f"reclaimed {report.total} score rows "
+        f"(expired {report.expired}, daily {report.daily}, hourly {report.hourly})"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+"""Incremental scoring from per-asset component state.
+
+With ``SCORE_MODE=incremental`` normalization folds each committed indicator
+into ``score_state``: the newest value per weighted key, its contribution to
+every pillar that uses the key, pillar subtotals and the unclamped total. Only
+the pillars containing a changed key are re-summed, in ``compute_score``'s
+order, so the state yields exactly the score a full recompute would. An
+indicator older than the one already held for its key is ignored, as it cannot
+be the latest value.
+
+Score jobs then write the score from the state without re-reading indicators.
+State missing or built under other weights is rebuilt from the database.
+Verification checks the state against a full recompute and repairs drift. It is
+scheduled every ``SCORE_STATE_VERIFY_INTERVAL_SECONDS`` (see ``core.pipeline.cron``),
+or run by hand::
+
+    python -m core.scoring.incremental verify
+"""
+from __future__ import annotations
+
+import argparse
+from collections import defaultdict
+from typing import Any, Iterable, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+from sqlalchemy.orm.util import identity_key
+
+from infra.db import Asset, Score, ScoreState, SessionLocal, upsert
+from infra.metrics import SCORE_STATE_DRIFT, STAGE_SECONDS
+from infra.tsstore import to_micros
+from .engine import latest_indicators_stmt, store_score
+from .weights import CompiledWeights, registry
+
+# Assets per state lookup.
+LOOKUP_CHUNK = 500
+STATE_COLUMNS = ("version", "components", "pillars", "total")
+
+
+def fold(
+    weights: CompiledWeights,
+    components: dict[str, list],
+    pillars: dict[str, dict] | None = None,
+    changed: set[str] | None = None,
+) -> tuple[dict[str, dict], float]:
+    """Pillar state and unclamped total for ``components``.
+
+    With previous ``pillars`` and the ``changed`` keys, only pillars using a
+    changed key are re-summed; the others are carried over.
+    """
+    result = {}
+    total = 0.0
+    for pillar in weights.pillars:
+        if pillars is not None and changed is not None and pillar.name in pillars and changed.isdisjoint(pillar.keys):
+            result[pillar.name] = pillars[pillar.name]
+        else:
+            contributions = {}
+            pillar_total = 0.0
+            for key, w in zip(pillar.keys, pillar.weights):
+                if key in components:
+                    contributions[key] = components[key][1] * w
+                    pillar_total += contributions[key]
+            result[pillar.name] = {"total": pillar_total, "contributions": contributions}
+        total += result[pillar.name]["total"]
+    return result, total
+
+
+def build_states(session: Session, weights: CompiledWeights, asset_ids: Sequence[int]) -> dict[int, ScoreState]:
+    """Compute state from the newest indicators in the database (not added to the session)."""
+    components: dict[int, dict[str, list]] = {asset_id: {} for asset_id in asset_ids}
+    for start in range(0, len(asset_ids), LOOKUP_CHUNK):
+        chunk = asset_ids[start:start + LOOKUP_CHUNK]
+        stmt = latest_indicators_stmt(session, weights.keys, chunk, with_ts=True)
+        for asset_id, key, value, ts in session.execute(stmt):
+            components[asset_id][key] = [to_micros(ts), value]
+    states = {}
+    for asset_id, comps in components.items():
+        pillars, total = fold(weights, comps)
+        states[asset_id] = ScoreState(
+            asset_id=asset_id, version=weights.version, components=comps, pillars=pillars, total=total
+        )
+    return states
+
+
+def save_states(session: Session, states: Iterable[ScoreState]) -> None:
+    """Insert or overwrite ``states`` (not committed).
+
+    An upsert rather than ``session.merge``: workers building the first state
+    for the same asset would otherwise race on the insert. Copies already
+    loaded in the session are expired so they are re-read.
+    """
+    values = [{"asset_id": s.asset_id, **{col: getattr(s, col) for col in STATE_COLUMNS}} for s in states]
+    for start in range(0, len(values), LOOKUP_CHUNK):
+        stmt = upsert(session, ScoreState).values(values[start:start + LOOKUP_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["asset_id"], set_={col: getattr(stmt.excluded, col) for col in STATE_COLUMNS}
+        )
+        session.execute(stmt)
+    for row in values:
+        loaded = session.identity_map.get(identity_key(ScoreState, row["asset_id"]))
+        if loaded is not None:
+            session.expire(loaded)
+
+
+def _load_states(session: Session, asset_ids: Sequence[int]) -> dict[int, ScoreState]:
+    states = {}
+    for start in range(0, len(asset_ids), LOOKUP_CHUNK):
+        chunk = asset_ids[start:start + LOOKUP_CHUNK]
+        for state in session.scalars(select(ScoreState).where(ScoreState.asset_id.in_(chunk)).with_for_update()):
+            states[state.asset_id] = state
+    return states
+
+
+def apply_indicators(session: Session, rows: Iterable[dict[str, Any]]) -> None:
+    """Fold committed indicator rows into their assets' state and commit."""
+    weights = registry.current()
+    newest: dict[int, dict[str, list]] = defaultdict(dict)
+    for row in rows:
+        if row["key"] not in weights.key_index:
+            continue
+        point = [to_micros(row["ts"]), float(row["value"])]
+        held = newest[row["asset_id"]].get(row["key"])
+        if held is None or point[0] >= held[0]:
+            newest[row["asset_id"]][row["key"]] = point
+    if not newest:
+        return
+
+    states = _load_states(session, list(newest))
+    stale = [asset_id for asset_id in newest if asset_id not in states or states[asset_id].version != weights.version]
+    # Built after the rows were committed, so they are already included.
+    save_states(session, build_states(session, weights, stale).values())
+    for asset_id, points in newest.items():
+        if asset_id in stale:
+            continue
+        state = states[asset_id]
+        components = dict(state.components)
+        changed = set()
+        for key, point in points.items():
+            held = components.get(key)
+            if held is None or point[0] >= held[0]:
+                components[key] = point
+                changed.add(key)
+        if changed:
+            state.pillars, state.total = fold(weights, components, state.pillars, changed)
+            state.components = components
+    session.commit()
+
+
+@STAGE_SECONDS.labels("score").time()
+def compute_incremental_score(session: Session, asset_id: int) -> Score:
+    """Score an asset from its component state; same result as ``compute_score``."""
+    weights = registry.current()
+    state = session.get(ScoreState, asset_id)
+    if state is None or state.version != weights.version:
+        state = build_states(session, weights, [asset_id])[asset_id]
+        save_states(session, [state])
+    breakdown = {
+        pillar.name: [(key, int(c)) for key, c in state.pillars[pillar.name]["contributions"].items()]
+        for pillar in weights.pillars
+    }
+    return store_score(session, asset_id, max(-24, min(24, int(state.total))), breakdown, weights.version)
+
+
+def verify_states(session: Session, repair: bool = True) -> list[int]:
+    """Compare every state with a full recompute; returns assets that drifted (repaired unless told not to)."""
+    weights = registry.current()
+    asset_ids = list(session.scalars(select(ScoreState.asset_id).order_by(ScoreState.asset_id)))
+    states = _load_states(session, asset_ids)
+    expected = build_states(session, weights, asset_ids)
+    drifted = []
+    for asset_id, state in states.items():
+        if state.version != weights.version:
+            continue
+        want = expected[asset_id]
+        if (state.components, state.pillars, state.total) != (want.components, want.pillars, want.total):
+            drifted.append(asset_id)
+    if repair:
+        save_states(session, [expected[asset_id] for asset_id in drifted])
+    SCORE_STATE_DRIFT.inc(len(drifted))
+    session.commit()
+    return drifted
+
+
+def rebuild_states(session: Session) -> int:
+    """Recreate state for every asset; returns the number of assets."""
+    weights = registry.current()
+    asset_ids = list(session.scalars(select(Asset.id).order_by(Asset.id)))
+    save_states(session, build_states(session, weights, asset_ids).values())
+    session.commit()
+    return len(asset_ids)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain incremental scoring state")
+    parser.add_argument("command", choices=["rebuild", "verify"])
+    args = parser.parse_args()
+    with SessionLocal() as session:
+        if args.command == "rebuild":
+            print(f"rebuilt score state for {rebuild_states(session)} assets")
+            return
+        drifted = verify_states(session)
+    print(f"{len(drifted)} assets drifted" + (f": {drifted}" if drifted else ""))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+"""The ``latest_scores`` projection: one pre-shaped row per asset.
+
+``compute_score`` and bulk rescoring upsert it in the same transaction that
+inserts into ``scores``. Rebuild it from history with::
+
+    python -m core.scoring.latest rebuild
+"""
+from __future__ import annotations
+
+import argparse
+from typing import Any, Iterable
+
+from sqlalchemy import func, select
+from sqlalchemy.orm import Session
+
+from infra.cache import invalidate_heatmaps
+from infra.db import Asset, LatestScore, Score, SessionLocal, upsert
+from infra.pubsub import publish_heatmaps
+from infra.settings import settings
+
+# Rows per multi-row upsert; keeps bound parameters well under SQLite/Postgres limits.
+UPSERT_CHUNK = 500
+
+PROJECTED_COLUMNS = ("score_id", "ts", "total", "heatmap_score", "pillars", "version")
+
+
+def normalize_for_heatmap(backend_score: int) -> float:
+    """Normalize backend score (-24 to +24) to heatmap range (-2 to +2)"""
+    # Clamp to valid backend range
+    backend_score = max(-24, min(24, backend_score))
+    # Scale to heatmap range: -24→-2, 0→0, +24→+2
+    return round(backend_score / 12.0, 2)
+
+
+def shape_pillars(breakdown: dict[str, list]) -> list[dict[str, Any]]:
+    """Turn a score breakdown into the ``pillars`` list of the heatmap response."""
+    pillars = []
+    for name, comps in breakdown.items():
+        components = [{"key": c[0], "score": int(c[1])} for c in comps]
+        pillars.append({"name": name, "score": sum(c["score"] for c in components), "components": components})
+    return pillars
+
+
+def projection_row(score: Score) -> dict[str, Any]:
+    return {
+        "asset_id": score.asset_id,
+        "score_id": score.id,
+        "ts": score.ts,
+        "total": score.total,
+        "heatmap_score": normalize_for_heatmap(score.total),
+        "pillars": shape_pillars(score.breakdown),
+        "version": score.version,
+    }
+
+
+def upsert_latest_scores(session: Session, scores: Iterable[Score]) -> None:
+    """Point each asset's projection at ``scores`` unless it already holds a newer one.
+
+    Scores must be flushed (have an id). The caller commits.
+    """
+    rows: dict[int, dict[str, Any]] = {}
+    for score in scores:
+        rows[score.asset_id] = projection_row(score)
+    values = list(rows.values())
+    for start in range(0, len(values), UPSERT_CHUNK):
+        stmt = upsert(session, LatestScore).values(values[start:start + UPSERT_CHUNK])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=["asset_id"],
+            set_={col: getattr(stmt.excluded, col) for col in PROJECTED_COLUMNS},
+            where=LatestScore.ts <= stmt.excluded.ts,
+        )
+        session.execute(stmt)
+
+
+def heatmap_update(symbol: str, latest: LatestScore) -> dict[str, Any]:
+    """Stream message for an asset's new projection row (the ``/heatmap/batch`` entry fields)."""
+    return {
+        "asset": symbol,
+        "score": latest.heatmap_score,
+        "pillars": latest.pillars,
+        "as_of": latest.ts.isoformat(),
+        "version": latest.version,
+    }
+
+
+def scores_committed(session: Session, asset_ids: Iterable[int]) -> None:
+    """Drop cached heatmap responses for assets whose score was just committed and publish the change."""
+    ids = list(asset_ids)
+    for start in range(0, len(ids), UPSERT_CHUNK):
+        chunk = ids[start:start + UPSERT_CHUNK]
+        if not settings.heatmap_stream_enabled:
+            invalidate_heatmaps(session.execute(select(Asset.symbol).where(Asset.id.in_(chunk))).scalars())
+            continue
+        rows = session.execute(
+            select(Asset.symbol, LatestScore).join(LatestScore, LatestScore.asset_id == Asset.id).where(Asset.id.in_(chunk))
+        ).all()
+        invalidate_heatmaps(symbol for symbol, _ in rows)
+        publish_heatmaps(heatmap_update(symbol, latest) for symbol, latest in rows)
+
+
+def rebuild_latest_scores(session: Session) -> int:
+    """Recreate the projection from ``scores`` history; returns the number of assets."""
+    latest_ts = select(Score.asset_id, func.max(Score.ts).label("ts")).group_by(Score.asset_id).subquery()
+    latest_ids = (
+        select(func.max(Score.id))
+        .select_from(Score)
+        .join(latest_ts, (Score.asset_id == latest_ts.c.asset_id) & (Score.ts == latest_ts.c.ts))
+        .group_by(Score.asset_id)
+    )
+    session.query(LatestScore).delete()
+    count = 0
+    ids = list(session.execute(latest_ids).scalars())
+    for start in range(0, len(ids), UPSERT_CHUNK):
+        scores = session.query(Score).filter(Score.id.in_(ids[start:start + UPSERT_CHUNK])).all()
+        upsert_latest_scores(session, scores)
+        count += len(scores)
+    session.commit()
+    scores_committed(session, [asset_id for (asset_id,) in session.query(LatestScore.asset_id)])
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain the latest_scores projection")
+    parser.add_argument("command", choices=["rebuild"])
+    parser.parse_args()
+    with SessionLocal() as session:
+        count = rebuild_latest_scores(session)
+    print(f"rebuilt latest_scores for {count} assets")
+
+
+if __name__ == "__main__":
+    main()
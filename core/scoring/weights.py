@@ -0,0 +1,119 @@
+"""Compiled, cached scoring weights.
+
+``weights.yaml`` is parsed once into a :class:`CompiledWeights` and cached by
+file mtime; a changed file is re-parsed and swapped in atomically on the next
+lookup. Every compiled version stays addressable by its ``version`` string, so
+scores can be recomputed under an older or candidate weights file.
+"""
+from __future__ import annotations
+
+import os
+import threading
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any
+
+import structlog
+import yaml  # type: ignore[import-untyped]
+
+WEIGHTS_PATH = Path(__file__).with_name("weights.yaml")
+
+log = structlog.get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class CompiledPillar:
+    name: str
+    keys: tuple[str, ...]
+    weights: tuple[float, ...]
+
+
+@dataclass(frozen=True)
+class CompiledWeights:
+    version: str
+    pillars: tuple[CompiledPillar, ...]
+    # Distinct component keys in first-seen order, and their positions.
+    keys: tuple[str, ...]
+    key_index: dict[str, int] = field(hash=False)
+    raw: dict[str, Any] = field(hash=False, repr=False)
+
+    @classmethod
+    def from_mapping(cls, data: dict[str, Any]) -> CompiledWeights:
+        pillars = []
+        key_index: dict[str, int] = {}
+        for name, pdata in data["pillars"].items():
+            components = pdata["components"]
+            pillars.append(
+                CompiledPillar(
+                    name=name,
+                    keys=tuple(components),
+                    weights=tuple(float(w) for w in components.values()),
+                )
+            )
+            for key in components:
+                key_index.setdefault(key, len(key_index))
+        return cls(
+            version=str(data["version"]),
+            pillars=tuple(pillars),
+            keys=tuple(key_index),
+            key_index=key_index,
+            raw=data,
+        )
+
+
+def _parse(path: Path) -> CompiledWeights:
+    with open(path, "r") as fh:
+        return CompiledWeights.from_mapping(yaml.safe_load(fh))
+
+
+class WeightsRegistry:
+    """Holds the current weights file plus any other loaded weight versions."""
+
+    def __init__(self, path: Path | str = WEIGHTS_PATH) -> None:
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._stamp: tuple[int, int] | None = None
+        self._current: CompiledWeights | None = None
+        self._versions: dict[str, CompiledWeights] = {}
+
+    def current(self) -> CompiledWeights:
+        """Return the compiled weights file, re-parsing it if it changed on disk."""
+        st = os.stat(self.path)
+        stamp = (st.st_mtime_ns, st.st_size)
+        if stamp == self._stamp and self._current is not None:
+            return self._current
+        with self._lock:
+            if stamp != self._stamp or self._current is None:
+                try:
+                    compiled = _parse(self.path)
+                except Exception:
+                    if self._current is None:
+                        raise
+                    log.warning("weights_reload_failed", path=str(self.path), version=self._current.version)
+                    return self._current
+                self._versions[compiled.version] = compiled
+                self._current, self._stamp = compiled, stamp
+        return self._current
+
+    def get(self, version: str | None = None) -> CompiledWeights:
+        """Return the weights for ``version``, or the current file when None."""
+        current = self.current()
+        if version is None or version == current.version:
+            return current
+        try:
+            return self._versions[version]
+        except KeyError:
+            raise ValueError(f"weights version {version!r} is not loaded") from None
+
+    def load(self, path: Path | str) -> CompiledWeights:
+        """Parse an additional weights file (e.g. a candidate) and keep it addressable by version."""
+        compiled = _parse(Path(path))
+        with self._lock:
+            self._versions[compiled.version] = compiled
+        return compiled
+
+    def versions(self) -> list[str]:
+        return sorted(self._versions)
+
+
+registry = WeightsRegistry()
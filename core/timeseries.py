@@ -0,0 +1,97 @@
+"""Indicator time-series queries: raw points or server-side buckets, keyset-paginated.
+
+Statements select plain ``(key, ts, value)`` rows ordered by ``(ts, key)``;
+bucketed rows carry the bucket start as ``ts``.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import datetime
+from typing import Literal, Sequence
+
+from sqlalchemy import DateTime, Integer, Select, String, cast, func, literal_column, select, tuple_, type_coerce
+from sqlalchemy.orm import Session
+
+from infra.db import Indicator
+
+Resolution = Literal["1m", "1h", "1d"]
+Aggregate = Literal["last", "mean", "min", "max"]
+
+RESOLUTION_SECONDS: dict[str, int] = {"1m": 60, "1h": 3600, "1d": 86400}
+
+
+def encode_cursor(ts: datetime, key: str) -> str:
+    raw = json.dumps([ts.isoformat(), key], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    """Inverse of :func:`encode_cursor`; raises ValueError on malformed input."""
+    try:
+        ts, key = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        return datetime.fromisoformat(ts), str(key)
+    except Exception as exc:
+        raise ValueError("invalid cursor") from exc
+
+
+def bucket_start(session: Session, column, seconds: int):
+    """Bucket start of the timestamp ``column`` floored to ``seconds``."""
+    # Inlined rather than bound so the SELECT and GROUP BY expressions are textually identical.
+    width = literal_column(str(int(seconds)), Integer)
+    if session.get_bind().dialect.name == "postgresql":
+        epoch = func.floor(func.extract("epoch", column) / width) * width
+        return func.to_timestamp(epoch, type_=DateTime(timezone=True))
+    epoch = cast(func.strftime("%s", column), Integer) // width * width
+    # Spelled like the stored values ("YYYY-MM-DD HH:MM:SS.ffffff"), so string comparisons
+    # against them and against bound cursor timestamps order correctly.
+    text = func.strftime("%Y-%m-%d %H:%M:%S", epoch, "unixepoch", type_=String).concat(
+        literal_column("'.000000'", String)
+    )
+    return type_coerce(text, DateTime(timezone=True))
+
+
+def series_stmt(
+    session: Session,
+    asset_id: int,
+    keys: Sequence[str] | None = None,
+    start: datetime | None = None,
+    end: datetime | None = None,
+    resolution: Resolution | None = None,
+    agg: Aggregate = "last",
+    after: tuple[datetime, str] | None = None,
+) -> Select:
+    """Select ``(key, ts, value)`` for an asset, ordered by ``(ts, key)`` and starting after ``after``."""
+    cond = Indicator.asset_id == asset_id
+    if keys:
+        cond &= Indicator.key.in_(keys)
+    if start:
+        cond &= Indicator.ts >= start
+    if end:
+        cond &= Indicator.ts <= end
+
+    if resolution is None:
+        if after:
+            cond &= tuple_(Indicator.ts, Indicator.key) > tuple_(*after)
+        return select(Indicator.key, Indicator.ts, Indicator.value).where(cond).order_by(Indicator.ts, Indicator.key)
+
+    if after:
+        # Points before the cursor's bucket can't contribute to later buckets.
+        cond &= Indicator.ts >= after[0]
+    bucket = bucket_start(session, Indicator.ts, RESOLUTION_SECONDS[resolution]).label("ts")
+    if agg == "last":
+        rn = func.row_number().over(partition_by=(Indicator.key, bucket), order_by=Indicator.ts.desc())
+        ranked = select(Indicator.key, bucket, Indicator.value, rn.label("rn")).where(cond).subquery()
+        rows = select(ranked.c.key, ranked.c.ts, ranked.c.value).where(ranked.c.rn == 1).subquery()
+    else:
+        fn = getattr(func, {"mean": "avg", "min": "min", "max": "max"}[agg])
+        rows = (
+            select(Indicator.key, bucket, fn(Indicator.value).label("value"))
+            .where(cond)
+            .group_by(Indicator.key, bucket)
+            .subquery()
+        )
+    stmt = select(rows.c.key, rows.c.ts, rows.c.value)
+    if after:
+        stmt = stmt.where(tuple_(rows.c.ts, rows.c.key) > tuple_(*after))
+    return stmt.order_by(rows.c.ts, rows.c.key)
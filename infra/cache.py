@@ -0,0 +1,65 @@
+"""Redis cache of pre-serialized heatmap responses.
+
+Entries are JSON bytes keyed by asset symbol and scale. Reads use the asyncio
+client from the API event loop; score writers (workers) call
+:func:`invalidate_heatmaps` after committing; the TTL bounds how long an
+entry rebuilt from a read that raced with that commit can stay stale. Redis
+errors are treated as misses so the API keeps serving from the database.
+"""
+from __future__ import annotations
+
+import hashlib
+from typing import Iterable, Literal, Sequence
+
+import redis
+
+from .metrics import HEATMAP_CACHE_HITS, HEATMAP_CACHE_MISSES
+from .redis import get_async_redis, get_redis
+from .settings import settings
+
+Scale = Literal["raw", "heatmap"]
+SCALES: tuple[Scale, ...] = ("raw", "heatmap")
+
+
+def heatmap_key(symbol: str, scale: Scale) -> str:
+    return f"heatmap:{scale}:{symbol}"
+
+
+async def get_many(keys: Sequence[str]) -> list[bytes | None]:
+    """Fetch cached bodies with one MGET; misses (and Redis errors) come back as None."""
+    values: list[bytes | None] = [None] * len(keys)
+    if keys and settings.heatmap_cache_enabled:
+        try:
+            values = await get_async_redis().mget(keys)
+        except redis.RedisError:
+            pass
+    hits = sum(v is not None for v in values)
+    HEATMAP_CACHE_HITS.inc(hits)
+    HEATMAP_CACHE_MISSES.inc(len(keys) - hits)
+    return values
+
+
+async def set_many(entries: dict[str, bytes]) -> None:
+    if not entries or not settings.heatmap_cache_enabled:
+        return
+    try:
+        async with get_async_redis().pipeline(transaction=False) as pipe:
+            for key, body in entries.items():
+                pipe.set(key, body, ex=settings.heatmap_cache_ttl_seconds)
+            await pipe.execute()
+    except redis.RedisError:
+        pass
+
+
+def invalidate_heatmaps(symbols: Iterable[str]) -> None:
+    keys = [heatmap_key(symbol, scale) for symbol in symbols for scale in SCALES]
+    if not keys or not settings.heatmap_cache_enabled:
+        return
+    try:
+        get_redis().delete(*keys)
+    except redis.RedisError:
+        pass
+
+
+def etag(body: bytes) -> str:
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
@@ -1,22 +1,39 @@
 from __future__ import annotations
 
-from datetime import datetime
-from typing import Generator
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import TYPE_CHECKING, Any, AsyncGenerator, Generator, Iterator
 
+import structlog
 from sqlalchemy import (
+    Column,
     DateTime,
+    Float,
     Integer,
     String,
     Text,
     JSON,
     ForeignKey,
+    Index,
     UniqueConstraint,
     create_engine,
+    event,
+    text,
 )
+from sqlalchemy.engine import URL, Engine, make_url
 from sqlalchemy.orm import DeclarativeBase, Mapped, mapped_column, relationship, sessionmaker, Session
 
 from .settings import settings
 
+if TYPE_CHECKING:
+    from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker
+
+log = structlog.get_logger(__name__)
+
 
 class Base(DeclarativeBase):
     pass
@@ -26,7 +43,7 @@ class Asset(Base):
     __tablename__ = "assets"
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
-    symbol: Mapped[str] = mapped_column(String(20), unique=True, index=True)
+    symbol: Mapped[str] = mapped_column(String(20), unique=True)
     kind: Mapped[str] = mapped_column(String(20))
 
     events: Mapped[list["Event"]] = relationship(back_populates="asset")
@@ -34,7 +51,11 @@ class Asset(Base):
 
 class Event(Base):
     __tablename__ = "events"
-    __table_args__ = (UniqueConstraint("trace_id"),)
+    __table_args__ = (
+        UniqueConstraint("trace_id"),
+        Index("ix_events_asset_kind_ts", "asset_id", "kind", "ingested_at"),
+        Index("ix_events_asset_ingested_id", "asset_id", "ingested_at", "id"),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     trace_id: Mapped[str] = mapped_column(String(36))
@@ -47,20 +68,38 @@ class Event(Base):
     asset: Mapped[Asset] = relationship(back_populates="events")
 
 
+class ArchivedEvent(Base):
+    """Trace id of an event moved to the archive, so ingest still rejects it as a duplicate."""
+
+    __tablename__ = "archived_events"
+
+    trace_id: Mapped[str] = mapped_column(String(36), primary_key=True)
+
+
 class Indicator(Base):
     __tablename__ = "indicators"
-    __table_args__ = (UniqueConstraint("asset_id", "key", "ts"),)
+    __table_args__ = (
+        UniqueConstraint("asset_id", "key", "ts"),
+        Index(
+            "ix_indicators_asset_key_ts_desc",
+            "asset_id",
+            "key",
+            text("ts DESC"),
+            postgresql_include=["value"],
+        ),
+    )
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id"))
     key: Mapped[str] = mapped_column(String(50))
-    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True))
-    value: Mapped[float] = mapped_column()
-    meta: Mapped[dict] = mapped_column(JSON, default={})
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True), index=True)
+    value: Mapped[float] = mapped_column(Float)
+    meta: Mapped[dict | None] = mapped_column(JSON, nullable=True, default={})
 
 
 class Score(Base):
     __tablename__ = "scores"
+    __table_args__ = (Index("ix_scores_asset_ts", "asset_id", "ts"),)
 
     id: Mapped[int] = mapped_column(Integer, primary_key=True)
     asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id"))
@@ -68,12 +107,216 @@ class Score(Base):
     total: Mapped[int] = mapped_column(Integer)
     breakdown: Mapped[dict] = mapped_column(JSON)
     version: Mapped[str] = mapped_column(String(20))
+    # Digest of (total, breakdown, version); see core.scoring.history.content_hash.
+    content_hash: Mapped[str | None] = mapped_column(String(32), nullable=True)
+
+
+class LatestScore(Base):
+    """One row per asset mirroring its newest ``Score``, shaped for the read endpoints."""
+
+    __tablename__ = "latest_scores"
+
+    asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id"), primary_key=True)
+    score_id: Mapped[int] = mapped_column(ForeignKey("scores.id"))
+    ts: Mapped[datetime] = mapped_column(DateTime(timezone=True))
+    total: Mapped[int] = mapped_column(Integer)
+    heatmap_score: Mapped[float] = mapped_column(Float)
+    pillars: Mapped[list] = mapped_column(JSON)
+    version: Mapped[str] = mapped_column(String(20))
+
+
+class AssetStats(Base):
+    """Per-asset indicator count and newest ts, maintained by normalization when enabled."""
+
+    __tablename__ = "asset_stats"
+
+    asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id"), primary_key=True)
+    indicator_count: Mapped[int] = mapped_column(Integer, default=0)
+    last_updated: Mapped[datetime | None] = mapped_column(DateTime(timezone=True), nullable=True)
+
+
+class ScoreState(Base):
+    """Per-asset component state for incremental scoring (see core.scoring.incremental)."""
+
+    __tablename__ = "score_state"
+
+    asset_id: Mapped[int] = mapped_column(ForeignKey("assets.id"), primary_key=True)
+    version: Mapped[str] = mapped_column(String(20))
+    # {key: [ts in epoch microseconds, value]} of the newest indicator per weighted key.
+    components: Mapped[dict] = mapped_column(JSON)
+    # {pillar: {"total": float, "contributions": {key: float}}}
+    pillars: Mapped[dict] = mapped_column(JSON)
+    total: Mapped[float] = mapped_column(Float)
+
+
+@functools.cache
+def get_engine() -> Engine:
+    """The engine for ``DATABASE_URL``, created on first use (no connection is opened until a query)."""
+    return create_engine(settings.database_url, future=True)
+
+
+def async_database_url(url: str) -> URL:
+    """Map a sync DATABASE_URL onto its asyncio driver (asyncpg / aiosqlite)."""
+    u = make_url(url)
+    backend = u.get_backend_name()
+    if backend in ("postgres", "postgresql"):
+        return u.set(drivername="postgresql+asyncpg")
+    if backend == "sqlite":
+        return u.set(drivername="sqlite+aiosqlite")
+    return u
+
+
+# sqlalchemy.ext.asyncio is imported only by processes that use it; workers never do.
+@functools.cache
+def get_async_engine() -> AsyncEngine:
+    """The asyncio engine for ``DATABASE_URL``, created on first use."""
+    from sqlalchemy.ext.asyncio import create_async_engine
+
+    return create_async_engine(async_database_url(settings.database_url))
+
+
+@functools.cache
+def get_async_sessionmaker() -> async_sessionmaker[AsyncSession]:
+    from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
 
+    return async_sessionmaker(bind=get_async_engine(), class_=AsyncSession, expire_on_commit=False)
 
-engine = create_engine(settings.database_url, future=True)
-SessionLocal = sessionmaker(bind=engine, class_=Session, expire_on_commit=False)
+
+class _Session(Session):
+    # Binds to the shared engine when the session is created, not when this module is imported.
+    def __init__(self, bind: Any = None, **kwargs: Any) -> None:
+        super().__init__(bind=bind if bind is not None else get_engine(), **kwargs)
+
+
+SessionLocal = sessionmaker(class_=_Session, expire_on_commit=False)
+
+
+def __getattr__(name: str) -> Any:
+    # ``engine``, ``async_engine`` and ``AsyncSessionLocal`` stay importable, created on first access.
+    if name == "engine":
+        return get_engine()
+    if name == "async_engine":
+        return get_async_engine()
+    if name == "AsyncSessionLocal":
+        return get_async_sessionmaker()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def dispose_engines() -> None:
+    """Close the pooled connections of whichever engines were created."""
+    if get_engine.cache_info().currsize:
+        get_engine().dispose()
+    if get_async_engine.cache_info().currsize:
+        await get_async_engine().dispose()
+
+
+@dataclass
+class QueryStats:
+    """Statements executed, and the seconds spent executing them, within a :func:`track_queries` block.
+
+    Nested blocks are included in their parents.
+    """
+
+    statements: int = 0
+    db_seconds: float = 0.0
+    parent: QueryStats | None = None
+
+
+_query_stats: ContextVar[QueryStats | None] = ContextVar("query_stats", default=None)
+
+
+def parameter_shape(parameters: Any) -> Any:
+    """Types of bound parameters without their values; runs of one type collapse to ``"int*500"``."""
+    if isinstance(parameters, dict):
+        return {k: type(v).__name__ for k, v in parameters.items()}
+    if isinstance(parameters, (list, tuple)):
+        if parameters and isinstance(parameters[0], (dict, list, tuple)):
+            # executemany: the shape of the first parameter set and how many there are.
+            return {"rows": len(parameters), "row": parameter_shape(parameters[0])}
+        shape: list[str] = []
+        run = 0
+        for i, value in enumerate(parameters):
+            name = type(value).__name__
+            run += 1
+            if i + 1 == len(parameters) or type(parameters[i + 1]).__name__ != name:
+                shape.append(name if run == 1 else f"{name}*{run}")
+                run = 0
+        return shape
+    return type(parameters).__name__
+
+
+@event.listens_for(Engine, "before_cursor_execute")
+def _count_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _query_stats.get()
+    while stats is not None:
+        stats.statements += 1
+        stats = stats.parent
+    context._query_started = time.perf_counter()
+
+
+@event.listens_for(Engine, "after_cursor_execute")
+def _time_statement(conn, cursor, statement, parameters, context, executemany) -> None:
+    elapsed = time.perf_counter() - context._query_started
+    stats = _query_stats.get()
+    while stats is not None:
+        stats.db_seconds += elapsed
+        stats = stats.parent
+    if settings.slow_query_ms and elapsed * 1000 >= settings.slow_query_ms:
+        log.warning(
+            "slow_query",
+            duration_ms=round(elapsed * 1000, 1),
+            statement=" ".join(statement.split())[:1000],
+            parameters=parameter_shape(parameters),
+            executemany=executemany,
+        )
+
+
+@contextmanager
+def track_queries() -> Iterator[QueryStats]:
+    """Count and time statements run on any engine by this context, including async sessions it awaits."""
+    stats = QueryStats(parent=_query_stats.get())
+    token = _query_stats.set(stats)
+    try:
+        yield stats
+    finally:
+        _query_stats.reset(token)
 
 
 def get_session() -> Generator[Session, None, None]:
     with SessionLocal() as session:
         yield session
+
+
+async def get_async_session() -> AsyncGenerator[AsyncSession, None]:
+    async with get_async_sessionmaker()() as session:
+        yield session
+
+
+def upsert(session: Session, model: type[Base]):
+    """Return an INSERT for ``model`` that supports ``on_conflict_*`` on the session's dialect."""
+    if session.get_bind().dialect.name == "postgresql":
+        from sqlalchemy.dialects import postgresql
+
+        return postgresql.insert(model)
+    from sqlalchemy.dialects import sqlite
+
+    return sqlite.insert(model)
+
+
+def db_timestamp(session: Session, ts: datetime) -> datetime:
+    """``ts`` as the session's dialect stores it: naive UTC on SQLite, unchanged elsewhere."""
+    if session.get_bind().dialect.name == "sqlite" and ts.tzinfo:
+        return ts.astimezone(timezone.utc).replace(tzinfo=None)
+    return ts
+
+
+def include_in_autogenerate(obj: Any, name: str | None, type_: str, reflected: bool, compare_to: Any) -> bool:
+    """Alembic ``include_object`` hook: skip indexes alembic cannot compare.
+
+    Reflection reports expression elements such as ``ts DESC`` as plain columns, so
+    those indexes would always show up as changed.
+    """
+    if type_ != "index":
+        return True
+    index = compare_to if reflected else obj
+    return index is None or all(isinstance(expr, Column) for expr in index.expressions)
@@ -0,0 +1,406 @@
+"""Job backends behind the pipeline's enqueue calls.
+
+``JOB_BACKEND`` selects one per process:
+
+``rq``
+    Jobs go to Redis and run in ``rq worker`` processes (the default).
+``local``
+    Jobs run on ``JOB_WORKERS`` threads inside the process that enqueued them;
+    no Redis and no worker container are needed. Jobs with the same ``key``
+    (one per asset for score recomputes) always land on the same thread, so
+    they run one at a time, by due time and then in the order they were
+    enqueued. A job that raises
+    is retried in place ``JOB_RETRIES`` times with exponential backoff from
+    ``JOB_RETRY_BACKOFF_SECONDS``, which keeps the order of its key. At most
+    ``JOB_QUEUE_MAX`` jobs wait; beyond that ``enqueue`` blocks for up to
+    ``JOB_ENQUEUE_TIMEOUT_SECONDS`` and then raises ``queue.Full``. Callers
+    that must not fail after committing (ingest) take the slots first with
+    ``reserve``, so the wait and the ``Full`` come before the commit. A keyed job
+    identical to one that is still waiting is merged into it. With
+    ``JOB_QUEUE_PATH`` set, waiting jobs are also kept in that SQLite file
+    until they finish and are picked up again after a restart; jobs that
+    exhaust their retries stay there marked failed. ``close`` (called on API
+    shutdown) runs whatever is still waiting, delays ignored, before
+    returning.
+``sync``
+    Jobs run inline in the caller, delays ignored; for tests and scripts.
+"""
+from __future__ import annotations
+
+import heapq
+import importlib
+import itertools
+import json
+import sqlite3
+import threading
+import time
+import zlib
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from datetime import timedelta
+from queue import Full
+from typing import Any, Callable, Iterable, Iterator
+
+import structlog
+
+from .settings import settings
+
+log = structlog.get_logger(__name__)
+
+
+def func_path(func: Callable) -> str:
+    return f"{func.__module__}.{func.__qualname__}"
+
+
+def resolve(path: str) -> Callable:
+    module, _, name = path.rpartition(".")
+    return getattr(importlib.import_module(module), name)
+
+
+class RQBackend:
+    """Enqueue onto the RQ queue from :mod:`infra.redis`."""
+
+    # Recompute debouncing is left to core.pipeline.scheduler's Redis bookkeeping.
+    debounces = False
+
+    @property
+    def name(self) -> str:
+        from .redis import get_queue
+
+        return get_queue().name
+
+    def enqueue(self, func: Callable, *args: Any, key: str | None = None) -> bool:
+        from .redis import get_queue
+
+        get_queue().enqueue(func, *args)
+        return True
+
+    def enqueue_many(self, func: Callable, arg_lists: Iterable[tuple]) -> None:
+        """One pipelined round-trip for all the jobs."""
+        from rq import Queue
+
+        from .redis import get_queue
+
+        get_queue().enqueue_many([Queue.prepare_data(func, args) for args in arg_lists])
+
+    @contextmanager
+    def reserve(self, count: int) -> Iterator[None]:
+        yield
+
+    def enqueue_in(self, delay: timedelta, func: Callable, *args: Any, key: str | None = None) -> bool:
+        from .redis import get_queue
+
+        get_queue().enqueue_in(delay, func, *args)
+        return True
+
+    def depth(self) -> dict[str, int]:
+        from rq.registry import ScheduledJobRegistry, StartedJobRegistry
+
+        from .redis import get_queue
+
+        queue = get_queue()
+        return {
+            "queued": queue.count,
+            "scheduled": ScheduledJobRegistry(queue=queue).count,
+            "started": StartedJobRegistry(queue=queue).count,
+        }
+
+    def close(self, timeout: float | None = None) -> None:
+        pass
+
+
+class SyncBackend:
+    """Run every job inline."""
+
+    name = "sync"
+    debounces = True
+
+    def enqueue(self, func: Callable, *args: Any, key: str | None = None) -> bool:
+        func(*args)
+        return True
+
+    def enqueue_many(self, func: Callable, arg_lists: Iterable[tuple]) -> None:
+        for args in arg_lists:
+            func(*args)
+
+    @contextmanager
+    def reserve(self, count: int) -> Iterator[None]:
+        yield
+
+    def enqueue_in(self, delay: timedelta, func: Callable, *args: Any, key: str | None = None) -> bool:
+        func(*args)
+        return True
+
+    def depth(self) -> dict[str, int]:
+        return {}
+
+    def close(self, timeout: float | None = None) -> None:
+        pass
+
+
+@dataclass(order=True)
+class _Job:
+    due: float
+    seq: int
+    func: str = field(compare=False)
+    args: tuple = field(compare=False)
+    key: str | None = field(compare=False, default=None)
+    row_id: int | None = field(compare=False, default=None)
+
+    @property
+    def identity(self) -> tuple:
+        return (self.func, self.key, json.dumps(self.args, default=str))
+
+
+class _Store:
+    """SQLite copy of the waiting jobs."""
+
+    def __init__(self, path: str) -> None:
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "id INTEGER PRIMARY KEY, func TEXT NOT NULL, args TEXT NOT NULL, key TEXT, due REAL NOT NULL, "
+            "failed INTEGER NOT NULL DEFAULT 0, error TEXT)"
+        )
+        self._lock = threading.Lock()
+
+    def add(self, job: _Job, due: float) -> int:
+        """Journal ``job``, due at wall-clock time ``due``."""
+        with self._lock:
+            cur = self._db.execute(
+                "INSERT INTO jobs (func, args, key, due) VALUES (?, ?, ?, ?)",
+                (job.func, json.dumps(job.args), job.key, due),
+            )
+            assert cur.lastrowid is not None
+            return cur.lastrowid
+
+    def done(self, row_id: int) -> None:
+        with self._lock:
+            self._db.execute("DELETE FROM jobs WHERE id = ?", (row_id,))
+
+    def failed(self, row_id: int, error: str) -> None:
+        with self._lock:
+            self._db.execute("UPDATE jobs SET failed = 1, error = ? WHERE id = ?", (error, row_id))
+
+    def waiting(self) -> list[tuple[int, str, list, str | None, float]]:
+        with self._lock:
+            rows = self._db.execute("SELECT id, func, args, key, due FROM jobs WHERE failed = 0 ORDER BY id").fetchall()
+        return [(row_id, func, json.loads(args), key, due) for row_id, func, args, key, due in rows]
+
+    def close(self) -> None:
+        self._db.close()
+
+
+class _Lane:
+    """One worker thread and the jobs routed to it, ordered by due time then enqueue order."""
+
+    def __init__(self, backend: LocalBackend, index: int) -> None:
+        self.backend = backend
+        self.heap: list[_Job] = []
+        self.thread = threading.Thread(target=self.run, name=f"job-lane-{index}", daemon=True)
+
+    def run(self) -> None:
+        backend = self.backend
+        while True:
+            with backend._cond:
+                while True:
+                    if self.heap and (backend._draining or self.heap[0].due <= time.monotonic()):
+                        job = heapq.heappop(self.heap)
+                        backend._waiting.pop(job.identity, None)
+                        break
+                    if backend._draining and backend._size == 0:
+                        return
+                    backend._cond.wait(self.heap[0].due - time.monotonic() if self.heap else None)
+                backend._running += 1
+            try:
+                backend._execute(job)
+            finally:
+                with backend._cond:
+                    backend._running -= 1
+                    backend._size -= 1
+                    backend._cond.notify_all()
+
+
+class LocalBackend:
+    """Thread-pool executor with keyed ordering, retries and an optional SQLite journal."""
+
+    name = "local"
+    debounces = True
+
+    def __init__(
+        self,
+        workers: int | None = None,
+        max_queued: int | None = None,
+        path: str | None = None,
+        retries: int | None = None,
+        backoff: float | None = None,
+    ) -> None:
+        self.retries = settings.job_retries if retries is None else retries
+        self.backoff = settings.job_retry_backoff_seconds if backoff is None else backoff
+        self.max_queued = max_queued or settings.job_queue_max
+        self._cond = threading.Condition()
+        self._seq = itertools.count()
+        self._waiting: dict[tuple, _Job] = {}
+        self._size = 0
+        self._reserved = 0
+        self._held = threading.local()
+        self._running = 0
+        self._draining = False
+        self._closed = False
+        self._lanes = [_Lane(self, i) for i in range(max(1, workers or settings.job_workers))]
+        self._round_robin = itertools.cycle(range(len(self._lanes)))
+        path = settings.job_queue_path if path is None else path
+        self._store = _Store(path) if path else None
+        if self._store is not None:
+            restored = self._store.waiting()
+            now, wall = time.monotonic(), time.time()
+            for row_id, func, args, key, due in restored:
+                self._push(_Job(now + max(0.0, due - wall), next(self._seq), func, tuple(args), key, row_id))
+            if restored:
+                log.info("jobs_restored", count=len(restored))
+        for lane in self._lanes:
+            lane.thread.start()
+
+    def _lane(self, key: str | None) -> _Lane:
+        if key is None:
+            return self._lanes[next(self._round_robin)]
+        return self._lanes[zlib.crc32(key.encode()) % len(self._lanes)]
+
+    def _push(self, job: _Job) -> None:
+        # Caller holds the condition, or is the constructor before the lanes start.
+        heapq.heappush(self._lane(job.key).heap, job)
+        if job.key is not None:
+            self._waiting[job.identity] = job
+        self._size += 1
+
+    def _submit(self, func: Callable, args: tuple, key: str | None, delay: float) -> bool:
+        job = _Job(time.monotonic() + delay, 0, func_path(func), args, key)
+        deadline = time.monotonic() + settings.job_enqueue_timeout_seconds
+        with self._cond:
+            if self._closed:
+                raise RuntimeError("job backend is closed")
+            if key is not None and job.identity in self._waiting:
+                return False
+            if getattr(self._held, "count", 0) > 0:
+                self._held.count -= 1
+                self._reserved -= 1
+            else:
+                self._wait_for_room(1, deadline)
+            job.seq = next(self._seq)
+            if self._store is not None:
+                # The journal keeps wall-clock due times; monotonic ones mean nothing after a restart.
+                job.row_id = self._store.add(job, time.time() + delay)
+            self._push(job)
+            self._cond.notify_all()
+        return True
+
+    def _wait_for_room(self, count: int, deadline: float) -> None:
+        # Caller holds the condition.
+        while self._size + self._reserved + count > self.max_queued:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                raise Full(f"{self._size} jobs waiting")
+            self._cond.wait(remaining)
+
+    @contextmanager
+    def reserve(self, count: int) -> Iterator[None]:
+        """Hold room for ``count`` jobs that this thread enqueues inside the block.
+
+        Waits and raises ``queue.Full`` like ``enqueue``; inside the block, that
+        many enqueues neither wait nor fail. Unused room is released on exit.
+        """
+        count = min(count, self.max_queued)
+        deadline = time.monotonic() + settings.job_enqueue_timeout_seconds
+        with self._cond:
+            self._wait_for_room(count, deadline)
+            self._reserved += count
+        self._held.count = count
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._reserved -= self._held.count
+                self._cond.notify_all()
+            self._held.count = 0
+
+    def enqueue(self, func: Callable, *args: Any, key: str | None = None) -> bool:
+        """Queue ``func(*args)``; returns False when merged into an identical waiting job."""
+        return self._submit(func, args, key, 0.0)
+
+    def enqueue_many(self, func: Callable, arg_lists: Iterable[tuple]) -> None:
+        for args in arg_lists:
+            self._submit(func, tuple(args), None, 0.0)
+
+    def enqueue_in(self, delay: timedelta, func: Callable, *args: Any, key: str | None = None) -> bool:
+        return self._submit(func, args, key, delay.total_seconds())
+
+    def depth(self) -> dict[str, int]:
+        with self._cond:
+            return {"queued": self._size - self._running, "started": self._running}
+
+    def _execute(self, job: _Job) -> None:
+        try:
+            func = resolve(job.func)
+        except Exception as exc:
+            # A journaled job whose function was renamed or removed; retrying cannot help.
+            log.exception("job_unresolvable", func=job.func, key=job.key)
+            if self._store is not None and job.row_id is not None:
+                self._store.failed(job.row_id, repr(exc))
+            return
+        for attempt in range(self.retries + 1):
+            try:
+                func(*job.args)
+            except Exception as exc:
+                if attempt < self.retries:
+                    log.warning("job_retry", func=job.func, key=job.key, attempt=attempt + 1, error=str(exc))
+                    time.sleep(self.backoff * 2**attempt)
+                    continue
+                log.exception("job_failed", func=job.func, key=job.key, attempts=attempt + 1)
+                if self._store is not None and job.row_id is not None:
+                    self._store.failed(job.row_id, repr(exc))
+                return
+            if self._store is not None and job.row_id is not None:
+                self._store.done(job.row_id)
+            return
+
+    def close(self, timeout: float | None = None) -> None:
+        """Run every waiting job now, including those the running jobs enqueue, then stop the workers.
+
+        Waits up to ``timeout`` seconds; jobs left over are only kept if journaled.
+        """
+        with self._cond:
+            self._draining = True
+            self._cond.notify_all()
+        deadline = None if timeout is None else time.monotonic() + timeout
+        for lane in self._lanes:
+            lane.thread.join(None if deadline is None else max(0.0, deadline - time.monotonic()))
+        with self._cond:
+            self._closed = True
+        if any(lane.thread.is_alive() for lane in self._lanes):
+            log.warning("job_drain_timeout", waiting=self._size)
+        elif self._store is not None:
+            self._store.close()
+
+
+_backend: RQBackend | LocalBackend | SyncBackend | None = None
+_backend_lock = threading.Lock()
+
+
+def get_backend() -> RQBackend | LocalBackend | SyncBackend:
+    """The ``JOB_BACKEND`` of this process, created on first use."""
+    global _backend
+    if _backend is None:
+        with _backend_lock:
+            if _backend is None:
+                _backend = {"rq": RQBackend, "local": LocalBackend, "sync": SyncBackend}[settings.job_backend]()
+    return _backend
+
+
+def close_backend(timeout: float | None = None) -> None:
+    """Drain and drop the backend, if one was created."""
+    global _backend
+    with _backend_lock:
+        backend, _backend = _backend, None
+    if backend is not None:
+        backend.close(timeout)
@@ -0,0 +1,154 @@
+"""Prometheus metrics shared by the API and the RQ workers.
+
+With ``PROMETHEUS_MULTIPROC_DIR`` set (to a directory shared by every API and
+worker process, emptied on deploy), ``/metrics`` aggregates the samples of all
+of them; otherwise it reports the serving process only. Every pid leaves its
+own files there, so workers must be ``rq.worker.SimpleWorker`` rather than
+forking a work horse per job.
+"""
+from __future__ import annotations
+
+import functools
+import os
+import time
+from datetime import datetime, timezone
+from typing import Any, Callable, TypeVar
+
+import redis
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+from prometheus_client.core import GaugeMetricFamily
+from rq import get_current_job
+
+from .db import track_queries
+from .profiling import profiled
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Statements per request or job.
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 200, 500, 1000)
+# Events per ingest call.
+BATCH_BUCKETS = (0, 1, 10, 50, 100, 250, 500, 1000, 5000)
+
+SCORE_RECOMPUTE_REQUESTS = Counter(
+    "score_recompute_requests_total", "Score recomputes requested by the pipeline"
+)
+SCORE_RECOMPUTE_MERGED = Counter(
+    "score_recompute_merged_total", "Recompute requests merged into an already pending recompute"
+)
+SCORE_RECOMPUTES = Counter("score_recomputes_total", "Score recomputes executed")
+EVENTS_UNPARSEABLE = Counter(
+    "normalize_events_unparseable_total", "Events skipped by normalization because their payload holds no indicator"
+)
+SCORES_UNCHANGED = Counter(
+    "scores_unchanged_total", "Recomputed scores identical to the current score and not written as new rows"
+)
+SCORE_STATE_DRIFT = Counter(
+    "score_state_drift_total", "Assets whose incremental score state differed from a full recompute"
+)
+SCORE_ROWS_COMPACTED = Counter("score_rows_compacted_total", "Score history rows removed by compaction")
+HEATMAP_CACHE_HITS = Counter("heatmap_cache_hits_total", "Heatmap responses served from the Redis cache")
+HEATMAP_CACHE_MISSES = Counter("heatmap_cache_misses_total", "Heatmap responses rebuilt from the database")
+STREAM_CLIENTS = Gauge(
+    "heatmap_stream_clients", "Connected heatmap stream clients", ["transport"], multiprocess_mode="livesum"
+)
+STREAM_MESSAGES_PUBLISHED = Counter("heatmap_stream_published_total", "Heatmap updates published to Redis")
+STREAM_MESSAGES_RECEIVED = Counter("heatmap_stream_received_total", "Heatmap updates received from Redis by this process")
+STREAM_MESSAGES_SENT = Counter("heatmap_stream_sent_total", "Heatmap updates sent to clients", ["transport"])
+STREAM_MESSAGES_COALESCED = Counter(
+    "heatmap_stream_coalesced_total", "Heatmap updates replaced by a newer one before a slow client read them"
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds", "Time to response headers per route", ["method", "route", "status"]
+)
+INGEST_EVENTS = Histogram(
+    "ingest_events_per_call", "Events per ingest call by outcome", ["result"], buckets=BATCH_BUCKETS
+)
+JOB_WAIT_SECONDS = Histogram(
+    "rq_job_wait_seconds",
+    "Time from enqueue to start",
+    ["job"],
+    buckets=(0.01, 0.05, 0.1, 0.5, 1, 2.5, 5, 10, 30, 60, 300),
+)
+JOB_SECONDS = Histogram("rq_job_duration_seconds", "Job run time", ["job"])
+JOB_FAILURES = Counter("rq_job_failures_total", "Jobs that raised", ["job"])
+STAGE_SECONDS = Histogram("pipeline_stage_duration_seconds", "Time spent per pipeline stage", ["stage"])
+SQL_STATEMENTS = Histogram(
+    "sql_statements", "SQL statements per request or job", ["scope", "name"], buckets=STATEMENT_BUCKETS
+)
+SQL_SECONDS = Histogram("sql_duration_seconds", "Time spent executing SQL per request or job", ["scope", "name"])
+SCORE_WRITES = Counter("score_writes_total", "Score rows inserted or touched", ["mode"])
+
+
+class QueueCollector:
+    """Job queue depth of the configured backend, read at scrape time (from Redis for RQ)."""
+
+    def describe(self):
+        # Nothing to describe up front; keeps registration from querying Redis.
+        return []
+
+    def collect(self):
+        from .jobqueue import get_backend
+
+        backend = get_backend()
+        depth = GaugeMetricFamily("rq_queue_depth", "Jobs per RQ queue and state", labels=["queue", "state"])
+        try:
+            for state, count in backend.depth().items():
+                depth.add_metric([backend.name, state], count)
+        except redis.RedisError:
+            return
+        yield depth
+
+
+QUEUE_COLLECTOR = QueueCollector()
+REGISTRY.register(QUEUE_COLLECTOR)
+
+
+def exposition() -> tuple[bytes, str]:
+    """The ``/metrics`` body and content type, aggregated across processes when configured."""
+    registry = REGISTRY
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        registry.register(QUEUE_COLLECTOR)
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+def tracked_job(func: F) -> F:
+    """Record wait time, run time, failures and SQL statements and time of an RQ job function.
+
+    Wait time is only observed when ``func`` is the job RQ started, not when it
+    is called from inside another job. Sampled runs are profiled (see
+    :mod:`infra.profiling`).
+    """
+    name = func.__name__
+    path = f"{func.__module__}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        job = get_current_job()
+        if job is not None and job.func_name == path and job.enqueued_at is not None:
+            enqueued = job.enqueued_at.replace(tzinfo=timezone.utc) if job.enqueued_at.tzinfo is None else job.enqueued_at
+            JOB_WAIT_SECONDS.labels(name).observe(max(0.0, (datetime.now(timezone.utc) - enqueued).total_seconds()))
+        start = time.perf_counter()
+        with track_queries() as stats, profiled("job", name):
+            try:
+                return func(*args, **kwargs)
+            except Exception:
+                JOB_FAILURES.labels(name).inc()
+                raise
+            finally:
+                JOB_SECONDS.labels(name).observe(time.perf_counter() - start)
+                SQL_STATEMENTS.labels("job", name).observe(stats.statements)
+                SQL_SECONDS.labels("job", name).observe(stats.db_seconds)
+
+    return wrapper  # type: ignore[return-value]
@@ -0,0 +1,71 @@
+"""Sampled cProfile captures of requests and RQ jobs.
+
+Set ``PROFILE_SAMPLE_RATE`` (0..1) to run that fraction of requests and jobs
+under cProfile, optionally only those whose request path or job name matches
+one of the comma-separated fnmatch patterns in ``PROFILE_TARGETS``
+(``/heatmap/*,normalize_events_job``). Each capture is a pstats file::
+
+    <PROFILE_DIR>/<request|job>/<name>-<UTC timestamp>-<pid>.pstats
+
+Read it with ``python -m pstats`` or any pstats viewer. The interpreter allows
+one active profiler, so a process takes one capture at a time and skips
+sampling while one is running. A request capture covers the event-loop thread:
+it also contains whatever other coroutines ran meanwhile, and on Python older
+than 3.12 a sync route's body, which runs in the threadpool, is not in it.
+"""
+from __future__ import annotations
+
+import cProfile
+import os
+import random
+import re
+import threading
+from contextlib import contextmanager
+from datetime import datetime, timezone
+from fnmatch import fnmatchcase
+from pathlib import Path
+from typing import Iterator
+
+import structlog
+
+from .settings import settings
+
+log = structlog.get_logger(__name__)
+
+_capturing = threading.Lock()
+
+
+def should_profile(name: str) -> bool:
+    """Sampling decision for a request path or job name."""
+    rate = settings.profile_sample_rate
+    if rate <= 0 or random.random() >= rate:
+        return False
+    patterns = [p.strip() for p in settings.profile_targets.split(",") if p.strip()]
+    return not patterns or any(fnmatchcase(name, p) for p in patterns)
+
+
+def capture_path(kind: str, name: str) -> Path:
+    slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", name).strip("_") or "root"
+    stamp = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%f")
+    return Path(settings.profile_dir) / kind / f"{slug}-{stamp}-{os.getpid()}.pstats"
+
+
+@contextmanager
+def profiled(kind: str, name: str) -> Iterator[None]:
+    """Run the block under cProfile when sampled, writing the capture when it exits."""
+    if not should_profile(name) or not _capturing.acquire(blocking=False):
+        yield
+        return
+    try:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            yield
+        finally:
+            profiler.disable()
+            path = capture_path(kind, name)
+            path.parent.mkdir(parents=True, exist_ok=True)
+            profiler.dump_stats(path)
+            log.info("profile_captured", kind=kind, name=name, path=str(path))
+    finally:
+        _capturing.release()
@@ -0,0 +1,147 @@
+"""Heatmap update fan-out over Redis pub/sub.
+
+Score writers publish one message per changed asset on :data:`CHANNEL` after
+committing. Each API process runs a single listener, started with its first
+subscriber, and hands messages to the local subscriptions that include the
+asset. A subscription buffers at most one pending message per asset: a slow
+consumer gets the newest state of every asset it follows instead of a
+growing backlog, and superseded messages are counted as coalesced.
+"""
+from __future__ import annotations
+
+import asyncio
+import json
+from typing import Any, Callable, Iterable
+
+import redis
+import structlog
+
+from .metrics import STREAM_MESSAGES_COALESCED, STREAM_MESSAGES_PUBLISHED, STREAM_MESSAGES_RECEIVED
+from .redis import get_async_redis, get_redis
+from .settings import settings
+
+CHANNEL = "heatmap:updates"
+
+log = structlog.get_logger(__name__)
+
+
+def publish_heatmaps(updates: Iterable[dict[str, Any]]) -> None:
+    """Publish ``{"asset": symbol, ...}`` updates; Redis errors are logged and dropped."""
+    messages = [json.dumps(u, separators=(",", ":"), default=str) for u in updates]
+    if not messages or not settings.heatmap_stream_enabled:
+        return
+    try:
+        pipe = get_redis().pipeline(transaction=False)
+        for message in messages:
+            pipe.publish(CHANNEL, message)
+        pipe.execute()
+    except redis.RedisError as exc:
+        log.warning("heatmap_publish_failed", error=str(exc))
+        return
+    STREAM_MESSAGES_PUBLISHED.inc(len(messages))
+
+
+class Subscription:
+    """One client's asset filter and its pending messages, at most one per asset."""
+
+    def __init__(self, symbols: set[str] | None) -> None:
+        # None follows every asset.
+        self.symbols = symbols
+        self._pending: dict[str, bytes] = {}
+        self._ready = asyncio.Event()
+
+    def wants(self, symbol: str) -> bool:
+        return self.symbols is None or symbol in self.symbols
+
+    def offer(self, symbol: str, body: bytes) -> None:
+        if symbol in self._pending:
+            STREAM_MESSAGES_COALESCED.inc()
+        self._pending[symbol] = body
+        self._ready.set()
+
+    async def drain(self, timeout: float | None = None) -> list[bytes]:
+        """Wait up to ``timeout`` seconds for messages and take all that are pending."""
+        try:
+            await asyncio.wait_for(self._ready.wait(), timeout)
+        except asyncio.TimeoutError:
+            return []
+        self._ready.clear()
+        bodies = list(self._pending.values())
+        self._pending.clear()
+        return bodies
+
+
+class Hub:
+    """Per-process fan-out of one Redis channel to local subscriptions.
+
+    ``decode`` turns a raw message into ``(symbol, body)``; bodies are encoded
+    once per process, not once per subscriber.
+    """
+
+    def __init__(self, decode: Callable[[bytes], tuple[str, bytes]], channel: str = CHANNEL) -> None:
+        self.decode = decode
+        self.channel = channel
+        self._subscriptions: set[Subscription] = set()
+        self._task: asyncio.Task | None = None
+        self._live: asyncio.Future | None = None
+
+    async def subscribe(self, symbols: set[str] | None) -> Subscription:
+        """Register a subscription; the Redis subscription is live when this returns.
+
+        Raises ``redis.RedisError`` when the listener cannot subscribe.
+        """
+        loop = asyncio.get_running_loop()
+        if self._task is None or self._task.done() or self._task.get_loop() is not loop:
+            self._live = loop.create_future()
+            self._task = loop.create_task(self._listen(self._live))
+        live = self._live
+        assert live is not None  # set together with the task
+        subscription = Subscription(symbols)
+        self._subscriptions.add(subscription)
+        try:
+            await asyncio.shield(live)
+        except BaseException:
+            self.unsubscribe(subscription)
+            raise
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+        if not self._subscriptions and self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _listen(self, live: asyncio.Future) -> None:
+        pubsub = get_async_redis().pubsub(ignore_subscribe_messages=True)
+        try:
+            try:
+                await pubsub.subscribe(self.channel)
+            except redis.RedisError as exc:
+                live.set_exception(exc)
+                return
+            live.set_result(None)
+            while True:
+                try:
+                    message = await pubsub.get_message(timeout=1.0)
+                except redis.RedisError as exc:
+                    log.warning("heatmap_subscribe_failed", error=str(exc))
+                    await asyncio.sleep(1.0)
+                    try:
+                        await pubsub.subscribe(self.channel)
+                    except redis.RedisError:
+                        pass
+                    continue
+                if message is None:
+                    continue
+                STREAM_MESSAGES_RECEIVED.inc()
+                try:
+                    symbol, body = self.decode(message["data"])
+                except Exception as exc:
+                    # One bad message must not end the listener every subscriber depends on.
+                    log.warning("heatmap_message_undecodable", channel=self.channel, error=repr(exc))
+                    continue
+                for subscription in list(self._subscriptions):
+                    if subscription.wants(symbol):
+                        subscription.offer(symbol, body)
+        finally:
+            await pubsub.aclose()  # type: ignore[attr-defined]  # missing from types-redis
@@ -1,9 +1,52 @@
+"""Redis clients and the RQ queue, created on first use.
+
+Nothing is constructed, and no connection is opened, by importing this module.
+``redis_conn``, ``async_redis_conn`` and ``queue`` remain module attributes,
+but ``from infra.redis import redis_conn`` builds the client on the spot, so
+code that is imported at startup calls :func:`get_redis` and friends where the
+client is used instead.
+"""
 from __future__ import annotations
 
+import functools
+from typing import Any
+
 import redis
 from rq import Queue
 
 from .settings import settings
 
-redis_conn = redis.Redis.from_url(settings.redis_url)
-queue = Queue(connection=redis_conn)
+
+@functools.cache
+def get_redis() -> redis.Redis:
+    return redis.Redis.from_url(settings.redis_url)
+
+
+@functools.cache
+def get_async_redis() -> redis.asyncio.Redis:
+    # For async endpoints; RQ and workers keep the blocking client.
+    import redis.asyncio
+
+    return redis.asyncio.Redis.from_url(settings.redis_url)
+
+
+@functools.cache
+def get_queue() -> Queue:
+    return Queue(connection=get_redis())
+
+
+_LAZY = {"redis_conn": get_redis, "async_redis_conn": get_async_redis, "queue": get_queue}
+
+
+def __getattr__(name: str) -> Any:
+    if name in _LAZY:
+        return _LAZY[name]()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+async def close_connections() -> None:
+    """Release the pools of whichever clients were created."""
+    if get_async_redis.cache_info().currsize:
+        await get_async_redis().aclose()  # type: ignore[attr-defined]  # missing from types-redis
+    if get_redis.cache_info().currsize:
+        get_redis().close()
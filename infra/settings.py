@@ -1,5 +1,7 @@
 from __future__ import annotations
 
+from typing import Literal
+
 from pydantic import Field
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
@@ -10,6 +12,65 @@ class Settings(BaseSettings):
     database_url: str = Field(default="sqlite:///./app.db")
     redis_url: str = Field(default="redis://localhost:6379/0")
     environment: str = Field(default="dev")
+    ingest_stream_chunk_size: int = Field(default=1000)
+    normalize_batch_size: int = Field(default=100)
+    # 0 recomputes synchronously after every event; >0 coalesces per asset.
+    recompute_debounce_seconds: float = Field(default=0.0)
+    recompute_max_staleness_seconds: float = Field(default=30.0)
+    # A pending recompute still unclaimed this long after it was due lost its job; the next request reschedules it.
+    recompute_lost_after_seconds: float = Field(default=60.0)
+    heatmap_cache_enabled: bool = Field(default=True)
+    heatmap_cache_ttl_seconds: int = Field(default=300)
+    heatmap_batch_max_assets: int = Field(default=1000)
+    # Publish score changes for /heatmap/stream and /heatmap/ws subscribers.
+    heatmap_stream_enabled: bool = Field(default=True)
+    heatmap_stream_keepalive_seconds: float = Field(default=15.0)
+    # Maintain asset_stats during normalization and read it in /assets/.
+    asset_stats_enabled: bool = Field(default=False)
+    # "incremental" folds new indicators into score_state and scores from it.
+    score_mode: Literal["full", "incremental"] = Field(default="full")
+    # Incremental mode checks score_state against a full recompute this often (0 disables);
+    # scheduled by `rq cron core.pipeline.cron`, or by the API process for local jobs.
+    score_state_verify_interval_seconds: float = Field(default=3600.0)
+    # What a recompute does when the result matches the asset's current score:
+    # "touch" moves its as-of ts forward, "skip" leaves it alone, "insert" writes a new row.
+    score_unchanged: Literal["insert", "touch", "skip"] = Field(default="touch")
+    # Score history compaction: one row per asset per hour, then per day, past these ages.
+    score_compact_hourly_after_days: float = Field(default=7.0)
+    score_compact_daily_after_days: float = Field(default=90.0)
+    # Drop history older than this (0 keeps it forever). Current scores are never removed.
+    score_retention_days: float = Field(default=0.0)
+    score_compact_batch_size: int = Field(default=1000)
+    # Cold events move to compressed chunks under archive_dir (see core.pipeline.archive).
+    archive_dir: str = Field(default="./archive")
+    archive_after_days: float = Field(default=30.0)
+    archive_batch_size: int = Field(default=5000)
+    # Events per keyset page and upsert transaction in a replay (see core.pipeline.replay).
+    replay_batch_size: int = Field(default=5000)
+    # Memory-mapped indicator series fed by normalization (see infra.tsstore).
+    tsstore_enabled: bool = Field(default=False)
+    tsstore_dir: str = Field(default="./tsstore")
+    # Series kept mapped per process; each mapping holds one file descriptor.
+    tsstore_max_open_series: int = Field(default=256)
+    # Statements slower than this are logged with their parameter shapes (0 disables).
+    slow_query_ms: float = Field(default=250.0)
+    # Add Server-Timing headers with DB time and statement counts to responses.
+    server_timing_enabled: bool = Field(default=True)
+    # Fraction of requests and jobs run under cProfile (see infra.profiling).
+    profile_sample_rate: float = Field(default=0.0)
+    # Comma-separated fnmatch patterns of request paths or job names to profile; empty profiles all.
+    profile_targets: str = Field(default="")
+    profile_dir: str = Field(default="./profiles")
+    # Where jobs run (see infra.jobqueue): RQ workers, threads in this process, or inline.
+    job_backend: Literal["rq", "local", "sync"] = Field(default="rq")
+    job_workers: int = Field(default=4)
+    job_queue_max: int = Field(default=10000)
+    job_enqueue_timeout_seconds: float = Field(default=5.0)
+    job_retries: int = Field(default=2)
+    job_retry_backoff_seconds: float = Field(default=0.5)
+    # SQLite file journaling waiting local jobs across restarts; empty keeps them in memory only.
+    job_queue_path: str = Field(default="")
+    job_drain_timeout_seconds: float = Field(default=30.0)
 
 
 settings = Settings()
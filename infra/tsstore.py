@@ -0,0 +1,385 @@
+"""Memory-mapped indicator time series kept beside the ``indicators`` table.
+
+Each ``(asset_id, key)`` is one append-only file of ``(ts, value)`` records
+(int64 microseconds since the epoch, float64) sorted by ``ts``::
+
+    <TSSTORE_DIR>/<asset_id>/<quoted key>.bin
+
+Readers map the file and get zero-copy NumPy views; writers take an
+exclusive ``flock`` and either append or, for out-of-order or updated
+points, rewrite the file and swap it in with ``os.replace``. Enable with
+``TSSTORE_ENABLED=true``; normalization then feeds it after every commit.
+
+Beside each series a watermark (``<quoted key>.mark``) records the writes in
+flight and the point count and newest timestamp the last completed write left.
+Normalization marks its series pending before committing and clears that once
+the points are stored, so a write that never reached the store (a crash
+between the two, a failed commit) keeps the series pending. ``rebuild`` resets
+every watermark from the database and marks the store complete; after that,
+series normalization creates are complete from their first point. Readers only
+trust a series whose watermark has nothing pending and matches the mapped
+file (:meth:`TimeSeriesStore.coverage`), without querying the database, and
+read the rest from SQL. Every process writing indicators must therefore run
+with the store enabled. Backfill and verify against the database with::
+
+    python -m infra.tsstore rebuild
+    python -m infra.tsstore check
+"""
+from __future__ import annotations
+
+import argparse
+import fcntl
+import os
+import threading
+from collections import OrderedDict, defaultdict
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Sequence
+from urllib.parse import quote, unquote
+
+import numpy as np
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from .db import Indicator, SessionLocal
+from .settings import settings
+
+RECORD = np.dtype([("ts", "<i8"), ("value", "<f8")])
+# Writes in flight, then the point count and newest ts of the last completed write.
+WATERMARK = np.dtype([("pending", "<i8"), ("count", "<i8"), ("newest", "<i8")])
+# Written by rebuild once every database series is in the store.
+COMPLETE = "COMPLETE"
+EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+_EMPTY = np.empty(0, dtype=RECORD)
+
+
+def to_micros(ts: datetime) -> int:
+    """Microseconds since the epoch; naive timestamps are taken as UTC."""
+    if ts.tzinfo is None:
+        ts = ts.replace(tzinfo=timezone.utc)
+    return (ts - EPOCH) // timedelta(microseconds=1)
+
+
+def from_micros(us: int) -> datetime:
+    return EPOCH + timedelta(microseconds=int(us))
+
+
+class Series:
+    """One ``(asset_id, key)`` file and its current mapping."""
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        self.mark_path = path.with_suffix(".mark")
+        self._stamp: tuple[int, int] | None = None
+        self._records: np.ndarray = _EMPTY
+
+    @contextmanager
+    def _locked(self) -> Iterator[None]:
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with open(self.path.with_suffix(".lock"), "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            yield
+
+    def watermark(self) -> tuple[int, int, int] | None:
+        """``(pending, count, newest)``, or None when the series has none."""
+        try:
+            mark = np.fromfile(self.mark_path, dtype=WATERMARK)
+        except FileNotFoundError:
+            return None
+        if len(mark) != 1:
+            return None
+        return int(mark["pending"][0]), int(mark["count"][0]), int(mark["newest"][0])
+
+    def _set_watermark(self, pending: int) -> None:
+        records = self.records()
+        newest = int(records["ts"][-1]) if len(records) else 0
+        tmp = self.mark_path.with_suffix(".mark.tmp")
+        np.array([(max(pending, 0), len(records), newest)], dtype=WATERMARK).tofile(tmp)
+        os.replace(tmp, self.mark_path)
+
+    def covered(self) -> bool:
+        """Whether no write is pending and the file holds what the last completed write left."""
+        mark = self.watermark()
+        if mark is None or mark[0]:
+            return False
+        records = self.records()
+        return mark[1] == len(records) and (not len(records) or mark[2] == int(records["ts"][-1]))
+
+    def begin(self, create: bool) -> None:
+        """Count a write in flight; ``create`` starts a watermark for a series with no file yet."""
+        with self._locked():
+            mark = self.watermark()
+            if mark is not None:
+                self._set_watermark(mark[0] + 1)
+            elif create and not self.path.exists():
+                self._set_watermark(1)
+
+    def cancel(self) -> None:
+        """Drop a write counted by :meth:`begin` that stored nothing (its commit failed)."""
+        with self._locked():
+            mark = self.watermark()
+            if mark is not None:
+                self._set_watermark(mark[0] - 1)
+
+    def reset(self, records: np.ndarray) -> None:
+        """Replace every record and the watermark with ``records`` (from the database)."""
+        with self._locked():
+            tmp = self.path.with_suffix(".tmp")
+            records.tofile(tmp)
+            os.replace(tmp, self.path)
+            self._set_watermark(0)
+
+    def remove(self) -> None:
+        with self._locked():
+            self.path.unlink(missing_ok=True)
+            self.mark_path.unlink(missing_ok=True)
+
+    def records(self) -> np.ndarray:
+        """Read-only structured view of every record, remapped when the file changed."""
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return _EMPTY
+        stamp = (st.st_ino, st.st_size)
+        if stamp != self._stamp:
+            n = st.st_size // RECORD.itemsize
+            self._records = np.memmap(self.path, dtype=RECORD, mode="r", shape=(n,)) if n else _EMPTY
+            self._stamp = stamp
+        return self._records
+
+    def latest(self) -> tuple[int, float] | None:
+        records = self.records()
+        if not len(records):
+            return None
+        return int(records["ts"][-1]), float(records["value"][-1])
+
+    def slice(self, start: int | None = None, end: int | None = None) -> np.ndarray:
+        """Records with ``start <= ts <= end`` (microseconds), still a view of the mapping."""
+        records = self.records()
+        ts = records["ts"]
+        lo = int(np.searchsorted(ts, start, "left")) if start is not None else 0
+        hi = int(np.searchsorted(ts, end, "right")) if end is not None else len(records)
+        return records[lo:hi]
+
+    def merge(self, points: np.ndarray) -> None:
+        """Add records sorted by ``ts`` with unique ts; an existing ts takes the new value.
+
+        Completes one write counted by :meth:`begin` in the watermark, if the series has one.
+        """
+        with self._locked():
+            current = self.records()
+            if not len(current) or points["ts"][0] > current["ts"][-1]:
+                with open(self.path, "ab") as fh:
+                    fh.write(points.tobytes())
+            else:
+                merged = np.concatenate([current, points])
+                # Stable sort keeps the new record last among equal ts; keep that one.
+                merged = merged[np.argsort(merged["ts"], kind="stable")]
+                keep = np.append(merged["ts"][1:] != merged["ts"][:-1], True)
+                tmp = self.path.with_suffix(".tmp")
+                merged[keep].tofile(tmp)
+                os.replace(tmp, self.path)
+            mark = self.watermark()
+            if mark is not None:
+                self._set_watermark(mark[0] - 1)
+
+
+class TimeSeriesStore:
+    """Series under ``root``; at most ``max_open`` of them stay mapped, least recently used dropped first.
+
+    Safe to share between threads (``JOB_BACKEND=local`` workers and the API).
+    """
+
+    def __init__(self, root: str | os.PathLike[str], max_open: int | None = None) -> None:
+        self.root = Path(root)
+        self.max_open = max_open or settings.tsstore_max_open_series
+        self._series: OrderedDict[tuple[int, str], Series] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def series(self, asset_id: int, key: str) -> Series:
+        with self._lock:
+            s = self._series.get((asset_id, key))
+            if s is None:
+                s = self._series[(asset_id, key)] = Series(self.root / str(asset_id) / f"{quote(key, safe='')}.bin")
+                while len(self._series) > self.max_open:
+                    # Every mapping holds a file descriptor. It is released with the last view of it
+                    # rather than closed here, so records a caller is still reading stay valid.
+                    self._series.popitem(last=False)
+            else:
+                self._series.move_to_end((asset_id, key))
+            return s
+
+    @property
+    def complete(self) -> bool:
+        """Whether ``rebuild`` loaded every database series into this store."""
+        return (self.root / COMPLETE).exists()
+
+    def keys(self, asset_id: int) -> list[str]:
+        """Keys with a series file or a watermark (a series whose first write is pending)."""
+        directory = self.root / str(asset_id)
+        if not directory.is_dir():
+            return []
+        return sorted({unquote(p.stem) for suffix in ("bin", "mark") for p in directory.glob(f"*.{suffix}")})
+
+    def begin(self, rows: Iterable[dict[str, Any]]) -> None:
+        """Mark the series of ``rows`` pending; call before committing the rows, then :meth:`write` them."""
+        complete = self.complete
+        for asset_id, key in sorted({(row["asset_id"], row["key"]) for row in rows}):
+            self.series(asset_id, key).begin(create=complete)
+
+    def cancel(self, rows: Iterable[dict[str, Any]]) -> None:
+        """Undo :meth:`begin` for rows whose commit failed."""
+        for asset_id, key in sorted({(row["asset_id"], row["key"]) for row in rows}):
+            self.series(asset_id, key).cancel()
+
+    def write(self, rows: Iterable[dict[str, Any]]) -> None:
+        """Store indicator rows (``asset_id``, ``key``, ``ts``, ``value``); the last row per ts wins."""
+        grouped: dict[tuple[int, str], dict[int, float]] = defaultdict(dict)
+        for row in rows:
+            grouped[(row["asset_id"], row["key"])][to_micros(row["ts"])] = float(row["value"])
+        for (asset_id, key), points in grouped.items():
+            records = np.fromiter(sorted(points.items()), dtype=RECORD, count=len(points))
+            self.series(asset_id, key).merge(records)
+
+    def coverage(self, asset_id: int, keys: Sequence[str] | None = None) -> tuple[list[str], list[str]]:
+        """Return the keys asked for and those this store covers.
+
+        ``keys=None`` asks for all of the asset's keys, which only a complete
+        store knows; otherwise none are returned. A key is covered when its
+        watermark has no write pending and matches the mapped series.
+        """
+        if keys is None:
+            keys = self.keys(asset_id) if self.complete else []
+        return list(keys), [key for key in keys if self.series(asset_id, key).covered()]
+
+    def latest_values(self, asset_id: int, keys: Sequence[str]) -> dict[str, float]:
+        """Newest value of each of ``keys`` that has a series."""
+        values = {}
+        for key in keys:
+            latest = self.series(asset_id, key).latest()
+            if latest is not None:
+                values[key] = latest[1]
+        return values
+
+    def points(
+        self,
+        asset_id: int,
+        keys: Sequence[str],
+        start: datetime | None = None,
+        end: datetime | None = None,
+        after: tuple[datetime, str] | None = None,
+    ) -> Iterator[tuple[str, datetime, float]]:
+        """``(key, ts, value)`` ordered by ``(ts, key)`` like ``core.timeseries.series_stmt``."""
+        lo = to_micros(start) if start else None
+        hi = to_micros(end) if end else None
+        if after is not None:
+            lo = max(lo, to_micros(after[0])) if lo is not None else to_micros(after[0])
+        keys = sorted(keys)
+        parts = [self.series(asset_id, key).slice(lo, hi) for key in keys]
+        if not parts:
+            return
+        ts = np.concatenate([p["ts"] for p in parts])
+        values = np.concatenate([p["value"] for p in parts])
+        key_idx = np.repeat(np.arange(len(keys)), [len(p) for p in parts])
+        order = np.lexsort((key_idx, ts))
+        after_us = to_micros(after[0]) if after is not None else None
+        for i in order:
+            t, k = int(ts[i]), keys[key_idx[i]]
+            if after is not None and t == after_us and k <= after[1]:
+                continue
+            yield k, from_micros(t), float(values[i])
+
+
+_stores: dict[str, TimeSeriesStore] = {}
+
+
+def get_store() -> TimeSeriesStore | None:
+    """The configured store, or None when ``TSSTORE_ENABLED`` is off."""
+    if not settings.tsstore_enabled:
+        return None
+    store = _stores.get(settings.tsstore_dir)
+    if store is None:
+        store = _stores[settings.tsstore_dir] = TimeSeriesStore(settings.tsstore_dir)
+    return store
+
+
+def _db_series(session: Session, asset_id: int | None = None) -> Iterator[tuple[int, str, np.ndarray]]:
+    q = select(Indicator.asset_id, Indicator.key, Indicator.ts, Indicator.value)
+    if asset_id is not None:
+        q = q.where(Indicator.asset_id == asset_id)
+    q = q.order_by(Indicator.asset_id, Indicator.key, Indicator.ts).execution_options(yield_per=10000)
+    current: tuple[int, str] | None = None
+    points: list[tuple[int, float]] = []
+    for a, key, ts, value in session.execute(q):
+        if (a, key) != current:
+            if current is not None:
+                yield (*current, np.array(points, dtype=RECORD))
+            current, points = (a, key), []
+        points.append((to_micros(ts), value))
+    if current is not None:
+        yield (*current, np.array(points, dtype=RECORD))
+
+
+def _stored_series(store: TimeSeriesStore) -> Iterator[tuple[int, str]]:
+    for directory in sorted(store.root.glob("*")) if store.root.is_dir() else []:
+        if directory.name.isdigit():
+            for key in store.keys(int(directory.name)):
+                yield int(directory.name), key
+
+
+def rebuild(session: Session, store: TimeSeriesStore) -> int:
+    """Load every indicator series from the database into ``store``; returns the number of series.
+
+    Series the database no longer has are removed, and the store is marked complete.
+    """
+    seen: set[tuple[int, str]] = set()
+    for asset_id, key, records in _db_series(session):
+        store.series(asset_id, key).reset(records)
+        seen.add((asset_id, key))
+    for asset_id, key in list(_stored_series(store)):
+        if (asset_id, key) not in seen:
+            store.series(asset_id, key).remove()
+    store.root.mkdir(parents=True, exist_ok=True)
+    (store.root / COMPLETE).touch()
+    return len(seen)
+
+
+def check(session: Session, store: TimeSeriesStore) -> list[str]:
+    """Compare ``store`` with the database; returns one line per differing series."""
+    problems = []
+    seen: set[tuple[int, str]] = set()
+    for asset_id, key, expected in _db_series(session):
+        seen.add((asset_id, key))
+        series = store.series(asset_id, key)
+        actual = series.records()
+        if len(actual) != len(expected):
+            problems.append(f"{asset_id}/{key}: {len(actual)} points in store, {len(expected)} in database")
+        elif not (np.array_equal(actual["ts"], expected["ts"]) and np.array_equal(actual["value"], expected["value"])):
+            problems.append(f"{asset_id}/{key}: values differ")
+        elif not series.covered():
+            problems.append(f"{asset_id}/{key}: watermark pending or stale, read from the database")
+    for asset_id, key in _stored_series(store):
+        if (asset_id, key) not in seen:
+            problems.append(f"{asset_id}/{key}: not in database")
+    return problems
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Maintain the memory-mapped indicator store")
+    parser.add_argument("command", choices=["rebuild", "check"])
+    args = parser.parse_args()
+    store = TimeSeriesStore(settings.tsstore_dir)
+    with SessionLocal() as session:
+        if args.command == "rebuild":
+            print(f"rebuilt {rebuild(session, store)} series under {store.root}")
+            return
+        problems = check(session, store)
+    for line in problems:
+        print(line)
+    print(f"{len(problems)} series differ")
+    raise SystemExit(1 if problems else 0)
+
+
+if __name__ == "__main__":
+    main()
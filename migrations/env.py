@@ -4,14 +4,19 @@ from alembic import context
 from sqlalchemy import engine_from_config, pool
 
 from infra.settings import settings
-from infra.db import Base
+from infra.db import Base, include_in_autogenerate
 
 config = context.config
 
 
 def run_migrations_offline() -> None:
     url = settings.database_url
-    context.configure(url=url, target_metadata=Base.metadata, literal_binds=True)
+    context.configure(
+        url=url,
+        target_metadata=Base.metadata,
+        literal_binds=True,
+        include_object=include_in_autogenerate,
+    )
     with context.begin_transaction():
         context.run_migrations()
 
@@ -21,7 +26,9 @@ def run_migrations_online() -> None:
         {"sqlalchemy.url": settings.database_url}, prefix="sqlalchemy.", poolclass=pool.NullPool
     )
     with connectable.connect() as connection:
-        context.configure(connection=connection, target_metadata=Base.metadata)
+        context.configure(
+            connection=connection, target_metadata=Base.metadata, include_object=include_in_autogenerate
+        )
         with context.begin_transaction():
             context.run_migrations()
 
@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002"
+down_revision = "0001"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Serves the per-asset "latest value of every weighted key" lookup in compute_score;
+    # on Postgres the INCLUDE makes it an index-only scan.
+    op.create_index(
+        "ix_indicators_asset_key_ts_desc",
+        "indicators",
+        ["asset_id", "key", sa.text("ts DESC")],
+        unique=False,
+        postgresql_include=["value"],
+    )
+    op.create_index("ix_indicators_ts", "indicators", ["ts"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_indicators_ts", table_name="indicators")
+    op.drop_index("ix_indicators_asset_key_ts_desc", table_name="indicators")
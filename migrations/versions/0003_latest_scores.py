@@ -0,0 +1,27 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003"
+down_revision = "0002"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Backfill from existing history with `python -m core.scoring.latest rebuild`.
+    op.create_table(
+        "latest_scores",
+        sa.Column("asset_id", sa.Integer, sa.ForeignKey("assets.id"), primary_key=True),
+        sa.Column("score_id", sa.Integer, sa.ForeignKey("scores.id"), nullable=False),
+        sa.Column("ts", sa.DateTime(timezone=True), nullable=False),
+        sa.Column("total", sa.Integer, nullable=False),
+        sa.Column("heatmap_score", sa.Float, nullable=False),
+        sa.Column("pillars", sa.JSON, nullable=False),
+        sa.Column("version", sa.String(20), nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("latest_scores")
@@ -0,0 +1,23 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004"
+down_revision = "0003"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Populate with `python -m core.pipeline.stats rebuild` before enabling ASSET_STATS_ENABLED.
+    op.create_table(
+        "asset_stats",
+        sa.Column("asset_id", sa.Integer, sa.ForeignKey("assets.id"), primary_key=True),
+        sa.Column("indicator_count", sa.Integer, nullable=False),
+        sa.Column("last_updated", sa.DateTime(timezone=True), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("asset_stats")
@@ -0,0 +1,18 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005"
+down_revision = "0004"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Existing rows keep a NULL hash; the next recompute of each asset writes a hashed row.
+    op.add_column("scores", sa.Column("content_hash", sa.String(32), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column("scores", "content_hash")
@@ -0,0 +1,25 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0006"
+down_revision = "0005"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Filled lazily by incremental scoring, or with `python -m core.scoring.incremental rebuild`.
+    op.create_table(
+        "score_state",
+        sa.Column("asset_id", sa.Integer, sa.ForeignKey("assets.id"), primary_key=True),
+        sa.Column("version", sa.String(20), nullable=False),
+        sa.Column("components", sa.JSON, nullable=False),
+        sa.Column("pillars", sa.JSON, nullable=False),
+        sa.Column("total", sa.Float, nullable=False),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("score_state")
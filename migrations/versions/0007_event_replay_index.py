@@ -0,0 +1,17 @@
+from __future__ import annotations
+
+from alembic import op
+
+revision = "0007"
+down_revision = "0006"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Keyset order of `python -m core.pipeline.replay`: each page is one index range scan.
+    op.create_index("ix_events_asset_ingested_id", "events", ["asset_id", "ingested_at", "id"], unique=False)
+
+
+def downgrade() -> None:
+    op.drop_index("ix_events_asset_ingested_id", table_name="events")
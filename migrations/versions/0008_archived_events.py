@@ -0,0 +1,22 @@
+from __future__ import annotations
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0008"
+down_revision = "0007"
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    # Trace ids of archived events for ingest dedup. Events archived before this
+    # revision are added with `python -m core.pipeline.archive tombstones`.
+    op.create_table(
+        "archived_events",
+        sa.Column("trace_id", sa.String(36), primary_key=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_table("archived_events")
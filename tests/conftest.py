@@ -0,0 +1,24 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.orm import Session
+
+# No Redis in the test environment; tests that exercise the cache or streams patch in fakeredis.
+os.environ.setdefault("HEATMAP_CACHE_ENABLED", "false")
+os.environ.setdefault("HEATMAP_STREAM_ENABLED", "false")
+
+
+@pytest.fixture
+def session(tmp_path):
+    """A session on a throwaway SQLite database with the full schema."""
+    # Imported lazily so test modules can set DATABASE_URL before settings load.
+    from infra.db import Base
+
+    engine = create_engine(f"sqlite:///{tmp_path / 'unit.db'}", future=True)
+    Base.metadata.create_all(engine)
+    with Session(engine, expire_on_commit=False) as s:
+        yield s
+    engine.dispose()
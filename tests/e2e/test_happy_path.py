@@ -4,15 +4,19 @@ import os
 if os.path.exists("test.db"): os.remove("test.db")
 from uuid import uuid4
 
+from alembic import command
+from alembic.config import Config
 from fastapi.testclient import TestClient
 
 os.environ["DATABASE_URL"] = "sqlite:///./test.db"
 
 from api.main import app  # noqa: E402
-from infra.db import SessionLocal, Event
+from infra.db import SessionLocal, Asset, Event
 from infra.redis import queue
 from core.pipeline.jobs import normalize_event_job
 
+# The app no longer creates tables on import; build the schema the way deployments do.
+command.upgrade(Config(os.path.join(os.path.dirname(__file__), "..", "..", "alembic.ini")), "head")
 client = TestClient(app)
 
 
@@ -20,8 +24,14 @@ def run_job(func, *args, **kwargs):
     func(*args, **kwargs)
 
 
-# patch queue.enqueue to run job synchronously
+def run_jobs(job_datas, pipeline=None):
+    for data in job_datas:
+        data.func(*data.args, **(data.kwargs or {}))
+
+
+# patch queue.enqueue/enqueue_many to run jobs synchronously
 queue.enqueue = run_job  # type: ignore
+queue.enqueue_many = run_jobs  # type: ignore
 
 
 def test_ingest_and_heatmap(tmp_path):
@@ -37,10 +47,12 @@ def test_ingest_and_heatmap(tmp_path):
     }
     resp = client.post("/ingest/events", json={"events": [payload]})
     assert resp.status_code == 202
+    assert resp.json()["accepted"] == 1
 
     # repost same trace_id
     resp = client.post("/ingest/events", json={"events": [payload]})
     assert resp.status_code == 202
+    assert resp.json()["duplicates"] == 1
 
     with SessionLocal() as s:
         count = s.query(Event).count()
@@ -54,3 +66,206 @@ def test_ingest_and_heatmap(tmp_path):
     macro = next(p for p in data["pillars"] if p["name"] == "Macro")
     assert macro["score"] == 5
     assert macro["components"][0]["score"] == 5
+
+
+def test_stream_ingest_ndjson_gzip(monkeypatch):
+    import gzip
+    import json
+    from infra.settings import settings
+
+    monkeypatch.setattr(settings, "ingest_stream_chunk_size", 2)
+    events = [
+        {
+            "schema_version": "2025.08.1",
+            "source": "test",
+            "asset": "EURUSD",
+            "kind": "indicator",
+            "ingested_at": f"2024-01-0{i + 1}T00:00:00Z",
+            "payload": {"key": "trend", "value": i},
+            "trace_id": str(uuid4()),
+        }
+        for i in range(3)
+    ]
+    lines = [json.dumps(events[0]), "{not json", json.dumps(events[1]), json.dumps(events[2]), json.dumps(events[0])]
+    body = gzip.compress("\n".join(lines).encode())
+    resp = client.post(
+        "/ingest/events/stream",
+        content=body,
+        headers={"Content-Type": "application/x-ndjson", "Content-Encoding": "gzip"},
+    )
+    assert resp.status_code == 202
+    report = resp.json()
+    assert (report["accepted"], report["duplicates"], report["rejected"]) == (3, 1, 1)
+    assert [(c["first_line"], c["last_line"]) for c in report["chunks"]] == [(1, 2), (3, 4), (5, 5)]
+    assert report["chunks"][0]["errors"][0]["line"] == 2
+
+
+def test_stream_ingest_failure_hides_internal_errors(monkeypatch):
+    import json
+    from api.routers import ingest as ingest_router
+
+    def broken(events):
+        raise RuntimeError("password=hunter2")
+
+    monkeypatch.setattr(ingest_router, "_commit_chunk", broken)
+    event = {
+        "schema_version": "2025.08.1",
+        "source": "test",
+        "asset": "EURUSD",
+        "kind": "indicator",
+        "ingested_at": "2024-02-01T00:00:00Z",
+        "payload": {"key": "trend", "value": 1},
+        "trace_id": str(uuid4()),
+    }
+    resp = client.post(
+        "/ingest/events/stream", content=json.dumps(event), headers={"Content-Type": "application/x-ndjson"}
+    )
+    assert resp.status_code == 500
+    assert (resp.json()["error"], resp.json()["resume_from_line"]) == ("internal error at line 1", 1)
+    assert "hunter2" not in resp.text
+
+
+def test_heatmap_cache_etag_and_invalidation(monkeypatch):
+    import fakeredis
+    from infra import cache
+    from infra.settings import settings
+    from core.pipeline.jobs import recompute_score_job
+    from api.schemas.heatmap import HeatmapBatchResponse
+
+    server = fakeredis.FakeServer()
+    fake, fake_async = fakeredis.FakeRedis(server=server), fakeredis.FakeAsyncRedis(server=server)
+    monkeypatch.setattr(cache, "get_redis", lambda: fake)
+    monkeypatch.setattr(cache, "get_async_redis", lambda: fake_async)
+    monkeypatch.setattr(settings, "heatmap_cache_enabled", True)
+
+    first = client.get("/heatmap/batch", params={"assets": "xauusd,NOPE"})
+    assert first.status_code == 200
+    assert first.content == HeatmapBatchResponse.model_validate(first.json()).model_dump_json().encode()
+    assert first.json()["errors"] == ["Asset 'NOPE' not found"]
+    assert fake.get(cache.heatmap_key("XAUUSD", "heatmap")) is not None
+
+    again = client.get("/heatmap/batch", params={"assets": "XAUUSD,NOPE"}, headers={"If-None-Match": first.headers["etag"]})
+    assert again.status_code == 304
+
+    with SessionLocal() as s:
+        from infra.db import Asset
+        asset_id = s.query(Asset.id).filter_by(symbol="XAUUSD").scalar()
+    recompute_score_job(asset_id)
+    assert fake.get(cache.heatmap_key("XAUUSD", "heatmap")) is None
+
+
+def test_heatmap_batch_whole_universe():
+    resp = client.get("/heatmap/batch", params={"assets": "*"})
+    assert resp.status_code == 200
+    data = resp.json()
+    assert "XAUUSD" in data["requested_assets"]
+    assert [h["asset"] for h in data["heatmaps"]] == data["requested_assets"]
+    assert data["errors"] is None
+
+
+def test_list_assets_keyset_pagination():
+    resp = client.get("/assets/")
+    assert resp.status_code == 200
+    everything = resp.json()
+    xau = next(a for a in everything if a["asset"]["symbol"] == "XAUUSD")
+    assert xau["latest_score"] == 5 and xau["indicator_count"] == 1
+
+    pages, after = [], None
+    while True:
+        params = {"limit": 1} | ({"after": after} if after is not None else {})
+        resp = client.get("/assets/", params=params)
+        pages += resp.json()
+        after = resp.headers.get("x-next-cursor")
+        if after is None:
+            break
+    assert pages == everything
+    assert client.get("/assets/", params={"kind": "nope"}).json() == []
+    assert client.get("/assets/XAUUSD").json() == xau
+
+
+def test_indicator_series_formats():
+    import json
+
+    legacy = client.get("/assets/XAUUSD/indicators")
+    assert legacy.status_code == 200
+    assert legacy.json() == [{"key": "macro", "ts": "2024-01-01T00:00:00", "value": 5.0}]
+
+    page = client.get("/assets/XAUUSD/indicators", params={"key": "macro", "resolution": "1d", "limit": 10, "format": "ndjson"})
+    assert page.headers["content-type"].startswith("application/x-ndjson")
+    assert [json.loads(line) for line in page.text.splitlines()] == legacy.json()
+    assert "x-next-cursor" not in page.headers
+    assert client.get("/assets/XAUUSD/indicators", params={"cursor": "bogus"}).status_code == 400
+
+
+def test_indicator_series_from_tsstore(tmp_path, monkeypatch):
+    from infra.settings import settings
+    from infra.tsstore import get_store, rebuild
+
+    expected = client.get("/assets/XAUUSD/indicators", params={"limit": 5})
+    monkeypatch.setattr(settings, "tsstore_enabled", True)
+    monkeypatch.setattr(settings, "tsstore_dir", str(tmp_path))
+    with SessionLocal() as s:
+        rebuild(s, get_store())
+        asset_id = s.query(Asset.id).filter_by(symbol="XAUUSD").scalar()
+    store_keys, covered = get_store().coverage(asset_id)
+    assert covered == store_keys != []
+    stored = client.get("/assets/XAUUSD/indicators", params={"limit": 5})
+    assert stored.json() == expected.json()
+    assert stored.headers.get("x-next-cursor") == expected.headers.get("x-next-cursor")
+
+
+def test_heatmap_websocket_pushes_score_changes(monkeypatch):
+    import fakeredis
+    from infra import pubsub
+    from infra.settings import settings
+    from core.pipeline.jobs import recompute_score_job
+
+    server = fakeredis.FakeServer()
+    fake, fake_async = fakeredis.FakeRedis(server=server), fakeredis.FakeAsyncRedis(server=server)
+    monkeypatch.setattr(pubsub, "get_redis", lambda: fake)
+    monkeypatch.setattr(pubsub, "get_async_redis", lambda: fake_async)
+    monkeypatch.setattr(settings, "heatmap_stream_enabled", True)
+    monkeypatch.setattr(settings, "score_unchanged", "insert")
+
+    with client.websocket_connect("/heatmap/ws?assets=XAUUSD") as ws:
+        snapshot = ws.receive_json()
+        assert snapshot["type"] == "snapshot"
+        assert [h["asset"] for h in snapshot["heatmaps"]] == ["XAUUSD"]
+
+        with SessionLocal() as s:
+            from infra.db import Asset
+            asset_id = s.query(Asset.id).filter_by(symbol="XAUUSD").scalar()
+        recompute_score_job(asset_id)
+        update = ws.receive_json()
+        assert update["type"] == "update"
+        assert update["heatmap"] == client.get("/heatmap/batch", params={"assets": "XAUUSD"}).json()["heatmaps"][0]
+
+
+def test_heatmap_sse_frames_and_coalescing():
+    import asyncio
+    from api.routers.heatmap import _sse
+    from infra.pubsub import Subscription
+
+    async def scenario():
+        subscription = Subscription({"EUR"})
+        stream = _sse(subscription, [b'{"asset":"EUR"}'])
+        assert await stream.__anext__() == b'event: snapshot\ndata: [{"asset":"EUR"}]\n\n'
+        # A slow reader only sees the newest pending update per asset.
+        subscription.offer("EUR", b"1")
+        subscription.offer("EUR", b"2")
+        assert await stream.__anext__() == b"event: heatmap\ndata: 2\n\n"
+        await stream.aclose()
+
+    asyncio.run(scenario())
+
+
+def test_metrics_cover_routes_ingest_and_jobs():
+    resp = client.get("/heatmap", params={"asset": "XAUUSD"})
+    assert resp.headers["server-timing"].startswith("db;dur=")
+    body = client.get("/metrics").text
+    assert 'http_request_duration_seconds_count{method="GET",route="/heatmap",status="200"}' in body
+    assert 'sql_statements_count{name="/heatmap",scope="request"}' in body
+    assert 'sql_duration_seconds_count{name="/heatmap",scope="request"}' in body
+    assert 'ingest_events_per_call_sum{result="accepted"}' in body
+    assert 'rq_job_duration_seconds_count{job="normalize_events_job"}' in body
+    assert 'pipeline_stage_duration_seconds_count{stage="score"}' in body
@@ -0,0 +1,115 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+from uuid import uuid4
+
+import pytest
+
+from api.schemas.ingest import EventDTO
+from core.pipeline.archive import EventArchive, archive_events, backfill_tombstones, iter_events
+from core.pipeline.ingest import bulk_ingest
+from infra.db import ArchivedEvent, Asset, Event
+
+
+def _seed(session) -> list[Asset]:
+    assets = [Asset(symbol="EUR", kind="fx"), Asset(symbol="USD", kind="fx")]
+    session.add_all(assets)
+    session.commit()
+    start = datetime(2024, 1, 1)
+    for i in range(10):
+        session.add(
+            Event(
+                trace_id=str(uuid4()),
+                source="test",
+                asset_id=assets[i % 2].id,
+                kind="cot" if i % 3 == 0 else "indicator",
+                ingested_at=start + timedelta(hours=12 * i),
+                payload={"key": "macro", "value": i},
+            )
+        )
+    session.commit()
+    return assets
+
+
+def test_archive_moves_old_events_and_reads_them_back(session, tmp_path):
+    eur, usd = _seed(session)
+    before = {e.trace_id: e.payload for e in session.query(Event)}
+    archive = EventArchive(tmp_path)
+
+    report = archive_events(session, datetime(2024, 1, 4, tzinfo=timezone.utc), archive, batch_size=4)
+    assert (report.archived, session.query(Event).count()) == (6, 4)
+    assert [c.day for c in archive.chunks()] == ["2024-01-01", "2024-01-02", "2024-01-03"]
+    assert not list(tmp_path.glob("events/**/*.pending"))
+
+    archived = list(archive.iter_events())
+    assert [e.ingested_at for e in archived] == [datetime(2024, 1, 1) + timedelta(hours=12 * i) for i in range(6)]
+    assert {e.trace_id: e.payload for e in iter_events(session, archive=archive)} == before
+
+    only = list(archive.iter_events(asset_ids=[usd.id], kinds=["indicator"], start=datetime(2024, 1, 1, 6)))
+    assert [(e.asset_id, e.kind, e.payload["value"]) for e in only] == [(usd.id, "indicator", 1), (usd.id, "indicator", 5)]
+
+
+def test_recover_settles_pending_chunks(session, tmp_path):
+    _seed(session)
+    archive = EventArchive(tmp_path)
+    events = session.query(Event).order_by(Event.id).all()
+
+    # Written but never committed: discarded, rows stay in the table.
+    archive.write(events[:2])
+    # Committed but not published: finished on recovery.
+    pending, _ = archive.write(events[2:4])
+    session.query(Event).filter(Event.id.in_([e.id for e in events[2:4]])).delete()
+    session.commit()
+
+    assert archive.recover(session) == 1
+    assert not pending.exists()
+    assert [(c.min_id, c.count) for c in archive.chunks()] == [(events[2].id, 2)]
+    assert session.query(Event).count() == 8
+
+
+def test_recover_indexes_a_renamed_chunk_missing_from_the_manifest(session, tmp_path, monkeypatch):
+    _seed(session)
+    archive = EventArchive(tmp_path)
+    events = session.query(Event).order_by(Event.id).all()
+    pending, chunk = archive.write(events[:3])
+    session.query(Event).filter(Event.id.in_([e.id for e in events[:3]])).delete()
+    session.commit()
+
+    # The process dies after the rename, before the manifest append.
+    def crash(chunk):
+        raise SystemExit
+
+    monkeypatch.setattr(archive, "_index", crash)
+    with pytest.raises(SystemExit):
+        archive.publish(pending, chunk)
+    monkeypatch.undo()
+    assert archive.chunks() == []
+
+    assert archive.recover(session) == 1
+    assert archive.chunks() == [chunk]
+    assert [e.id for e in archive.iter_events()] == [e.id for e in events[:3]]
+    assert archive.recover(session) == 0
+
+
+def test_archived_events_stay_duplicates_for_ingest(session, tmp_path):
+    _seed(session)
+    first = session.query(Event).order_by(Event.id).first()
+    resend = EventDTO(
+        schema_version="2025.08.1",
+        source="test",
+        asset="EUR",
+        kind="indicator",
+        ingested_at=first.ingested_at.isoformat() + "Z",
+        payload=first.payload,
+        trace_id=first.trace_id,
+    )
+    archive = EventArchive(tmp_path)
+    archive_events(session, datetime(2024, 1, 4, tzinfo=timezone.utc), archive)
+    assert session.query(ArchivedEvent).count() == 6
+
+    result = bulk_ingest(session, [resend])
+    assert (result.accepted, result.duplicates) == (0, 1)
+
+    session.query(ArchivedEvent).delete()
+    assert backfill_tombstones(session, archive) == 6
+    assert bulk_ingest(session, [resend]).accepted == 0
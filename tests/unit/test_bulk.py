@@ -0,0 +1,45 @@
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta
+
+from core.scoring.bulk import rescore_all
+from core.scoring.engine import compute_score
+from core.scoring.weights import CompiledWeights, registry
+from infra.db import Asset, Indicator, Score
+from infra.settings import settings
+
+WEIGHTS = CompiledWeights.from_mapping(
+    {
+        "version": "test",
+        "pillars": {
+            "Macro": {"components": {"macro": 1.0, "rates": 0.3, "cpi": -0.7}},
+            "Trend": {"components": {"trend": 1.5, "macro": 0.1}},
+            "Empty": {"components": {}},
+        },
+    }
+)
+
+
+def test_rescore_all_matches_compute_score(session, monkeypatch):
+    monkeypatch.setattr(registry, "get", lambda version=None: WEIGHTS)
+    monkeypatch.setattr(settings, "score_unchanged", "insert")
+
+    rng = random.Random(7)
+    assets = [Asset(symbol=f"A{i}", kind="x") for i in range(25)]
+    session.add_all(assets)
+    session.commit()
+    now = datetime(2024, 1, 1)
+    for asset in assets[1:]:
+        for key in ("macro", "rates", "cpi", "trend", "unweighted"):
+            for h in range(rng.randint(0, 3)):
+                value = rng.choice([rng.uniform(-30, 30), rng.randint(-9, 9), 0.1 * 3])
+                session.add(Indicator(asset_id=asset.id, key=key, ts=now + timedelta(hours=h), value=value, meta={}))
+    session.commit()
+
+    expected = {a.id: compute_score(session, a.id) for a in assets}
+    assert rescore_all(session) == len(assets)
+    rows = session.query(Score).order_by(Score.id.desc()).limit(len(assets)).all()
+    for row in rows:
+        ref = expected[row.asset_id]
+        assert (row.ts, row.total, row.breakdown, row.version) == (ref.ts, ref.total, ref.breakdown, ref.version)
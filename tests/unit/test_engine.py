@@ -18,3 +18,39 @@ def test_compute_score_clamps(tmp_path):
         compute_score(s, asset.id)
         score = s.query(Score).filter_by(asset_id=asset.id).first()
         assert score.total == 24
+
+
+def test_latest_indicator_values_picks_newest_per_key(session):
+    from datetime import timedelta
+    from core.scoring.engine import latest_indicator_values
+
+    asset = Asset(symbol="XYZ", kind="x")
+    session.add(asset)
+    session.commit()
+    now = datetime(2024, 1, 1)
+    for i, (key, value) in enumerate([("macro", 1), ("macro", 2), ("trend", -3), ("other", 9)]):
+        session.add(Indicator(asset_id=asset.id, key=key, ts=now + timedelta(hours=i), value=value, meta={}))
+    session.commit()
+    assert latest_indicator_values(session, asset.id, ["macro", "trend", "sentiment"]) == {"macro": 2.0, "trend": -3.0}
+
+
+def test_compute_score_maintains_latest_projection(session):
+    from core.scoring.latest import rebuild_latest_scores
+    from infra.db import LatestScore
+
+    asset = Asset(symbol="PRJ", kind="x")
+    session.add(asset)
+    session.commit()
+    session.add(Indicator(asset_id=asset.id, key="macro", ts=datetime(2024, 1, 1), value=6, meta={}))
+    session.commit()
+    score = compute_score(session, asset.id)
+
+    latest = session.get(LatestScore, asset.id)
+    assert (latest.score_id, latest.total, latest.heatmap_score) == (score.id, 6, 0.5)
+    assert latest.pillars[0] == {"name": "Macro", "score": 6, "components": [{"key": "macro", "score": 6}]}
+
+    session.query(LatestScore).delete()
+    session.commit()
+    assert rebuild_latest_scores(session) == 1
+    session.expire_all()
+    assert session.get(LatestScore, asset.id).score_id == score.id
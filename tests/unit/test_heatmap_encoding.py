@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timezone
+from types import SimpleNamespace
+
+import pytest
+
+from api.routers.heatmap import _decode_update, _etag_matches, _heatmap_for_asset
+from api.schemas.heatmap import HeatmapResponse
+from core.scoring.latest import heatmap_update, shape_pillars
+
+
+def _model_bytes(symbol: str, latest) -> bytes:
+    if latest is None:
+        model = HeatmapResponse(asset=symbol, score=0, scale=(-2, 2), pillars=[], as_of=None, version="0.0.0")
+    else:
+        model = HeatmapResponse(
+            asset=symbol,
+            score=latest.heatmap_score,
+            scale=(-2, 2),
+            pillars=latest.pillars,
+            as_of=latest.ts,
+            version=latest.version,
+        )
+    return model.model_dump_json().encode()
+
+
+@pytest.mark.parametrize(
+    "ts",
+    [
+        datetime(2024, 1, 1, 12, 30),
+        datetime(2024, 1, 1, 12, 30, 0, 4500),
+        datetime(2024, 1, 1, 12, 30, tzinfo=timezone.utc),
+        datetime(2024, 1, 1, 12, 30, 0, 120000, tzinfo=timezone.utc),
+    ],
+)
+def test_fast_heatmap_entry_matches_model_bytes(ts):
+    breakdown = {"Macro": [("cpi", 3), ("gdp", -1)], "Prix é": [("momentum", 0)], "Empty": []}
+    latest = SimpleNamespace(heatmap_score=0.17, pillars=shape_pillars(breakdown), ts=ts, version="2025.08.1")
+    assert _heatmap_for_asset("XAUUSD", latest) == _model_bytes("XAUUSD", latest)
+    assert _heatmap_for_asset("NEW", None) == _model_bytes("NEW", None)
+
+    for score in (0.0, -2.0, 1.5, 0.30000000000000004):
+        latest.heatmap_score = score
+        assert _heatmap_for_asset("XAUUSD", latest) == _model_bytes("XAUUSD", latest)
+
+    # Stream messages carry the same bytes as the batch entry.
+    message = heatmap_update("XAUUSD", latest)
+    assert _decode_update(json.dumps(message).encode()) == ("XAUUSD", _model_bytes("XAUUSD", latest))
+
+
+def test_if_none_match_compares_whole_entity_tags():
+    tag = '"abc123"'
+    assert _etag_matches(tag, tag)
+    assert _etag_matches('"other", W/"abc123"', tag)
+    assert _etag_matches("*", tag)
+    # Neither a tag containing ours nor one contained in ours matches.
+    assert not _etag_matches('"xabc123"', tag)
+    assert not _etag_matches('"abc123x", "abc"', tag)
+    assert not _etag_matches('"abc"', tag)
+    assert not _etag_matches("", tag)
@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+from core.scoring.bulk import rescore_all
+from core.scoring.engine import compute_score
+from core.scoring.history import compact_scores, content_hash
+from infra.db import Asset, Indicator, LatestScore, Score
+from infra.settings import settings
+
+
+def _asset_with_macro(session, symbol: str, value: float, ts: datetime) -> Asset:
+    asset = Asset(symbol=symbol, kind="x")
+    session.add(asset)
+    session.commit()
+    session.add(Indicator(asset_id=asset.id, key="macro", ts=ts, value=value, meta={}))
+    session.commit()
+    return asset
+
+
+def test_unchanged_score_is_touched_not_inserted(session, monkeypatch):
+    monkeypatch.setattr(settings, "score_unchanged", "touch")
+    asset = _asset_with_macro(session, "TCH", 6, datetime(2024, 1, 1))
+    first = compute_score(session, asset.id)
+    assert first.content_hash == content_hash(6, first.breakdown, first.version)
+
+    # A newer, unrelated indicator moves the as-of ts without changing the score.
+    session.add(Indicator(asset_id=asset.id, key="unweighted", ts=datetime(2024, 1, 2), value=1, meta={}))
+    session.commit()
+    again = compute_score(session, asset.id)
+    assert again.id == first.id
+    assert again.ts == datetime(2024, 1, 2)
+    assert session.get(LatestScore, asset.id).ts == datetime(2024, 1, 2)
+    assert rescore_all(session) == 1
+    assert session.query(Score).count() == 1
+
+    session.add(Indicator(asset_id=asset.id, key="macro", ts=datetime(2024, 1, 3), value=9, meta={}))
+    session.commit()
+    changed = compute_score(session, asset.id)
+    assert changed.id != first.id and changed.total == 9
+    assert session.query(Score).count() == 2
+
+
+def test_unchanged_score_skip_and_insert_modes(session, monkeypatch):
+    asset = _asset_with_macro(session, "SKP", 6, datetime(2024, 1, 1))
+    first = compute_score(session, asset.id)
+    session.add(Indicator(asset_id=asset.id, key="unweighted", ts=datetime(2024, 1, 2), value=1, meta={}))
+    session.commit()
+
+    monkeypatch.setattr(settings, "score_unchanged", "skip")
+    assert compute_score(session, asset.id).ts == datetime(2024, 1, 1)
+    assert session.query(Score).count() == 1
+
+    monkeypatch.setattr(settings, "score_unchanged", "insert")
+    assert compute_score(session, asset.id).id != first.id
+    assert session.query(Score).count() == 2
+
+
+def test_compact_scores_downsamples_by_age(session, monkeypatch):
+    monkeypatch.setattr(settings, "score_compact_hourly_after_days", 7)
+    monkeypatch.setattr(settings, "score_compact_daily_after_days", 90)
+    monkeypatch.setattr(settings, "score_retention_days", 365)
+    now = datetime(2024, 6, 1, tzinfo=timezone.utc)
+    asset = Asset(symbol="CMP", kind="x")
+    session.add(asset)
+    session.commit()
+
+    def add(ts: datetime) -> Score:
+        score = Score(asset_id=asset.id, ts=ts.replace(tzinfo=None), total=1, breakdown={}, version="v")
+        session.add(score)
+        return score
+
+    recent = [add(now - timedelta(days=1, minutes=m)) for m in (0, 10, 20)]
+    hourly = [add(now - timedelta(days=10) + timedelta(minutes=m)) for m in (0, 10, 20, 70)]
+    daily = [add(now - timedelta(days=100) + timedelta(hours=h)) for h in (1, 2, 3)]
+    expired = [add(now - timedelta(days=400))]
+    session.flush()
+    session.add(
+        LatestScore(
+            asset_id=asset.id, score_id=recent[0].id, ts=recent[0].ts, total=1, heatmap_score=0.0, pillars=[], version="v"
+        )
+    )
+    session.commit()
+    kept_ids = {recent[0].id, recent[1].id, recent[2].id, hourly[2].id, hourly[3].id, daily[2].id}
+
+    report = compact_scores(session, now=now, batch_size=2)
+    assert (report.expired, report.daily, report.hourly, report.total) == (1, 2, 2, 5)
+    assert {s.id for s in session.query(Score)} == kept_ids
+    assert compact_scores(session, now=now).total == 0
@@ -0,0 +1,128 @@
+from __future__ import annotations
+
+import asyncio
+import random
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from core.pipeline import jobs
+from core.pipeline.normalize import upsert_indicators
+from core.scoring.engine import compute_score
+from core.scoring.incremental import apply_indicators, build_states, compute_incremental_score, verify_states
+from core.scoring.weights import CompiledWeights, registry
+from infra.db import Asset, ScoreState
+from infra.settings import settings
+
+WEIGHTS = CompiledWeights.from_mapping(
+    {
+        "version": "test",
+        "pillars": {
+            "Macro": {"components": {"macro": 1.0, "rates": 0.3, "cpi": -0.7}},
+            "Trend": {"components": {"trend": 1.5, "macro": 0.1}},
+        },
+    }
+)
+
+
+def test_incremental_matches_full_recompute_with_out_of_order_points(session, monkeypatch):
+    monkeypatch.setattr(registry, "get", lambda version=None: WEIGHTS)
+    monkeypatch.setattr(registry, "current", lambda: WEIGHTS)
+    monkeypatch.setattr(settings, "score_unchanged", "insert")
+    asset = Asset(symbol="INC", kind="x")
+    session.add(asset)
+    session.commit()
+
+    rng = random.Random(3)
+    start = datetime(2024, 1, 1)
+    for _ in range(60):
+        row = {
+            "asset_id": asset.id,
+            "key": rng.choice(["macro", "rates", "cpi", "trend", "unweighted"]),
+            # Random hours, so many points arrive older than the one already held.
+            "ts": start + timedelta(hours=rng.randint(0, 20)),
+            "value": rng.uniform(-20, 20),
+            "meta": {},
+        }
+        upsert_indicators(session, [row])
+        session.commit()
+        apply_indicators(session, [row])
+
+        incremental = compute_incremental_score(session, asset.id)
+        full = compute_score(session, asset.id)
+        assert (incremental.total, incremental.breakdown) == (full.total, full.breakdown)
+    assert verify_states(session) == []
+
+
+def test_verify_repairs_drift(session, monkeypatch):
+    monkeypatch.setattr(registry, "current", lambda: WEIGHTS)
+    asset = Asset(symbol="DRF", kind="x")
+    session.add(asset)
+    session.commit()
+    row = {"asset_id": asset.id, "key": "macro", "ts": datetime(2024, 1, 1), "value": 5.0, "meta": {}}
+    upsert_indicators(session, [row])
+    session.commit()
+    apply_indicators(session, [row])
+    assert session.get(ScoreState, asset.id).total == 5.0 + 0.5
+
+    session.get(ScoreState, asset.id).total = 99.0
+    session.commit()
+    assert verify_states(session) == [asset.id]
+    assert session.get(ScoreState, asset.id).total == 5.5
+    assert verify_states(session) == []
+
+
+def test_first_state_survives_a_concurrent_build(session, monkeypatch):
+    monkeypatch.setattr(registry, "current", lambda: WEIGHTS)
+    asset = Asset(symbol="RACE", kind="x")
+    session.add(asset)
+    session.commit()
+    row = {"asset_id": asset.id, "key": "macro", "ts": datetime(2024, 1, 1), "value": 5.0, "meta": {}}
+    upsert_indicators(session, [row])
+    session.commit()
+    engine = session.get_bind()
+    raced = []
+
+    def other_worker(conn, cursor, statement, parameters, context, executemany):
+        # Another worker inserts the asset's first state just before this one writes it.
+        if statement.startswith("INSERT INTO score_state") and not raced:
+            raced.append(True)
+            with Session(engine) as other:
+                other.add(build_states(other, WEIGHTS, [asset.id])[asset.id])
+                other.commit()
+
+    event.listen(engine, "before_cursor_execute", other_worker)
+    try:
+        assert compute_incremental_score(session, asset.id).total == 5
+    finally:
+        event.remove(engine, "before_cursor_execute", other_worker)
+    assert raced and session.get(ScoreState, asset.id).total == 5.5
+
+
+def test_verification_is_scheduled_only_in_incremental_mode(monkeypatch):
+    monkeypatch.setattr(settings, "score_state_verify_interval_seconds", 0.01)
+    monkeypatch.setattr(settings, "score_mode", "full")
+    assert jobs.score_state_verify_interval() == 0
+    monkeypatch.setattr(settings, "score_mode", "incremental")
+    assert jobs.score_state_verify_interval() == 1
+    monkeypatch.setattr(settings, "score_state_verify_interval_seconds", 0)
+    assert jobs.score_state_verify_interval() == 0
+
+    enqueued = []
+
+    class Backend:
+        def enqueue(self, func, *args, key=None):
+            enqueued.append((func, key))
+            return True
+
+    monkeypatch.setattr(jobs, "get_backend", Backend)
+
+    async def run_for_a_while():
+        task = asyncio.create_task(jobs.verify_score_state_periodically(0.01))
+        await asyncio.sleep(0.1)
+        task.cancel()
+
+    asyncio.run(run_for_a_while())
+    assert len(enqueued) >= 2
+    assert set(enqueued) == {(jobs.verify_score_state_job, "score-state:verify")}
@@ -0,0 +1,71 @@
+from __future__ import annotations
+
+import threading
+from datetime import datetime, timezone
+from queue import Full
+from uuid import uuid4
+
+import pytest
+
+from api.schemas.ingest import EventDTO
+from core.pipeline import ingest
+from core.pipeline.ingest import bulk_ingest, ingest_and_enqueue
+from infra.db import Asset, Event
+from infra.jobqueue import LocalBackend
+from infra.settings import settings
+
+
+def _event(asset: str, trace_id=None) -> EventDTO:
+    return EventDTO(
+        schema_version="2025.08.1",
+        source="test",
+        asset=asset,
+        kind="indicator",
+        ingested_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        payload={"key": "macro", "value": 1},
+        trace_id=trace_id or uuid4(),
+    )
+
+
+def test_bulk_ingest_dedups_and_creates_assets(session):
+    first = _event("EUR")
+    result = bulk_ingest(session, [first, _event("USD"), _event("EUR"), first])
+    assert result.accepted == 3
+    assert result.duplicates == 1
+    assert result.trace_ids[0] == str(first.trace_id)
+    assert session.query(Asset).count() == 2
+
+    again = bulk_ingest(session, [first, _event("GBP")])
+    assert again.accepted == 1
+    assert again.duplicates == 1
+    assert session.query(Event).count() == 4
+    assert session.query(Asset).count() == 3
+
+
+release = threading.Event()
+normalized: list[list[str]] = []
+
+
+def blocked() -> None:
+    release.wait(5)
+
+
+def fake_normalize(trace_ids: list[str]) -> None:
+    normalized.append(trace_ids)
+
+
+def test_full_job_queue_rejects_before_commit(session, monkeypatch):
+    monkeypatch.setattr(settings, "job_enqueue_timeout_seconds", 0.05)
+    backend = LocalBackend(workers=1, max_queued=2, path="")
+    monkeypatch.setattr(ingest, "get_backend", lambda: backend)
+    monkeypatch.setattr(ingest, "normalize_events_job", fake_normalize)
+    backend.enqueue(blocked)
+    backend.enqueue(blocked)
+    with pytest.raises(Full):
+        ingest_and_enqueue(session, [_event("EUR")])
+    assert session.query(Event).count() == 0
+
+    release.set()
+    result = ingest_and_enqueue(session, [_event("EUR"), _event("USD")])
+    backend.close(timeout=5)
+    assert normalized == [result.trace_ids]
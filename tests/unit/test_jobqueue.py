@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import threading
+from datetime import timedelta
+from queue import Full
+
+import pytest
+
+from infra.jobqueue import LocalBackend
+from infra.settings import settings
+
+ran: list[tuple[str, int]] = []
+attempts: dict[str, int] = {}
+release = threading.Event()
+
+
+def record(key: str, i: int) -> None:
+    ran.append((key, i))
+
+
+def flaky(name: str) -> None:
+    attempts[name] = attempts.get(name, 0) + 1
+    if attempts[name] == 1:
+        raise RuntimeError("first attempt fails")
+
+
+def blocked() -> None:
+    release.wait(5)
+
+
+@pytest.fixture(autouse=True)
+def _reset():
+    ran.clear()
+    attempts.clear()
+    release.clear()
+
+
+def test_keyed_jobs_keep_order_and_failures_retry():
+    backend = LocalBackend(workers=3, path="", retries=1, backoff=0)
+    for i in range(20):
+        for key in ("a", "b", "c"):
+            backend.enqueue(record, key, i, key=key)
+    backend.enqueue(flaky, "once")
+    backend.close()
+
+    for key in ("a", "b", "c"):
+        assert [i for k, i in ran if k == key] == list(range(20))
+    assert attempts == {"once": 2}
+
+
+def test_waiting_keyed_duplicates_merge_and_close_runs_delayed_jobs():
+    backend = LocalBackend(workers=2, path="")
+    assert backend.enqueue_in(timedelta(hours=1), record, "x", 1, key="asset:1")
+    assert not backend.enqueue_in(timedelta(hours=1), record, "x", 1, key="asset:1")
+    assert backend.depth() == {"queued": 1, "started": 0}
+    backend.close(timeout=5)
+    assert ran == [("x", 1)]
+
+
+def test_journaled_jobs_survive_a_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    # Never closed, like a process that died with the job still waiting.
+    LocalBackend(workers=1, path=path).enqueue_in(timedelta(hours=1), record, "kept", 7, key="k")
+
+    restarted = LocalBackend(workers=1, path=path)
+    restarted.close(timeout=5)
+    assert ran == [("kept", 7)]
+    again = LocalBackend(workers=1, path=path)
+    assert again.depth()["queued"] == 0
+    again.close()
+
+
+def test_full_queue_rejects_after_timeout(monkeypatch):
+    monkeypatch.setattr(settings, "job_enqueue_timeout_seconds", 0.05)
+    backend = LocalBackend(workers=1, max_queued=1, path="")
+    backend.enqueue(blocked)
+    with pytest.raises(Full):
+        backend.enqueue(record, "late", 1)
+    release.set()
+    backend.close(timeout=5)
+    assert ran == []
+
+
+def test_unresolvable_journaled_job_is_marked_failed(tmp_path):
+    import sqlite3
+
+    path = str(tmp_path / "jobs.db")
+    LocalBackend(workers=1, path=path).enqueue_in(timedelta(hours=1), record, "kept", 1, key="k")
+    db = sqlite3.connect(path)
+    db.execute("UPDATE jobs SET func = 'tests.unit.test_jobqueue.renamed'")
+    db.commit()
+
+    backend = LocalBackend(workers=1, path=path)
+    backend.enqueue(record, "after", 2, key="k")
+    backend.close(timeout=5)
+    assert ran == [("after", 2)]
+    assert db.execute("SELECT failed FROM jobs").fetchall() == [(1,)]
@@ -0,0 +1,77 @@
+from __future__ import annotations
+
+import pstats
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+from sqlalchemy import text
+from structlog.testing import capture_logs
+
+from infra import metrics
+from infra.db import parameter_shape, track_queries
+from infra.settings import settings
+
+
+def _sample(metric: str, **labels) -> float:
+    return metrics.REGISTRY.get_sample_value(metric, labels) or 0.0
+
+
+def test_track_queries_counts_nested_blocks(session):
+    with track_queries() as outer:
+        session.execute(text("select 1"))
+        with track_queries() as inner:
+            session.execute(text("select 2"))
+    assert (outer.statements, inner.statements) == (2, 1)
+    assert outer.db_seconds >= inner.db_seconds > 0
+
+
+def test_slow_queries_are_logged_with_parameter_shapes(session, monkeypatch):
+    monkeypatch.setattr(settings, "slow_query_ms", 1e-6)
+    with capture_logs() as logs:
+        session.execute(text("select :a, :b"), {"a": 1, "b": "x"})
+    slow = [e for e in logs if e["event"] == "slow_query"]
+    assert slow and "1" not in str(slow[-1]["parameters"])
+    assert parameter_shape((1, 2, 3, "a", None)) == ["int*3", "str", "NoneType"]
+    assert parameter_shape([(1, "a"), (2, "b")]) == {"rows": 2, "row": ["int", "str"]}
+
+
+def test_sampled_job_is_profiled_to_disk(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "profile_dir", str(tmp_path))
+    monkeypatch.setattr(settings, "profile_sample_rate", 1.0)
+    monkeypatch.setattr(settings, "profile_targets", "other_*, profiled_*")
+
+    @metrics.tracked_job
+    def profiled_job() -> int:
+        return sum(range(100))
+
+    profiled_job()
+    [capture] = (tmp_path / "job").glob("profiled_job-*.pstats")
+    assert "profiled_job" in str(pstats.Stats(str(capture)).stats)
+
+    monkeypatch.setattr(settings, "profile_targets", "other_*")
+    profiled_job()
+    assert len(list((tmp_path / "job").iterdir())) == 1
+
+
+def test_tracked_job_records_wait_only_for_the_started_job(session, monkeypatch):
+    @metrics.tracked_job
+    def sample_job() -> int:
+        session.execute(text("select 1"))
+        return 7
+
+    path = f"{sample_job.__module__}.{sample_job.__qualname__}"
+    enqueued = datetime.now(timezone.utc) - timedelta(seconds=3)
+    monkeypatch.setattr(metrics, "get_current_job", lambda: SimpleNamespace(func_name=path, enqueued_at=enqueued))
+    waits = _sample("rq_job_wait_seconds_count", job="sample_job")
+    statements = _sample("sql_statements_sum", scope="job", name="sample_job")
+
+    assert sample_job() == 7
+    assert _sample("rq_job_wait_seconds_count", job="sample_job") == waits + 1
+    assert _sample("rq_job_wait_seconds_sum", job="sample_job") >= 3
+    assert _sample("sql_statements_sum", scope="job", name="sample_job") == statements + 1
+
+    # Called from inside another job: run time is recorded, wait time is not.
+    monkeypatch.setattr(metrics, "get_current_job", lambda: SimpleNamespace(func_name="other", enqueued_at=enqueued))
+    sample_job()
+    assert _sample("rq_job_wait_seconds_count", job="sample_job") == waits + 1
+    assert _sample("rq_job_duration_seconds_count", job="sample_job") >= 2
@@ -0,0 +1,28 @@
+from __future__ import annotations
+
+from pathlib import Path
+
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine
+
+from infra.db import Base, include_in_autogenerate
+from infra.settings import settings
+
+ALEMBIC_INI = Path(__file__).resolve().parents[2] / "alembic.ini"
+
+
+def test_migrations_match_models(monkeypatch, tmp_path):
+    url = f"sqlite:///{tmp_path / 'migrated.db'}"
+    monkeypatch.setattr(settings, "database_url", url)
+    command.upgrade(Config(str(ALEMBIC_INI)), "head")
+
+    engine = create_engine(url)
+    try:
+        with engine.connect() as conn:
+            context = MigrationContext.configure(conn, opts={"include_object": include_in_autogenerate})
+            assert compare_metadata(context, Base.metadata) == []
+    finally:
+        engine.dispose()
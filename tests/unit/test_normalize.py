@@ -0,0 +1,67 @@
+from __future__ import annotations
+
+from datetime import datetime
+
+from core.pipeline.normalize import normalize_event, normalize_events
+from infra.db import Asset, Event, Indicator
+
+
+def _event(asset_id: int, trace: str, key: str, value: float, day: int) -> Event:
+    return Event(
+        trace_id=trace,
+        source="test",
+        asset_id=asset_id,
+        kind="indicator",
+        ingested_at=datetime(2024, 1, day),
+        payload={"key": key, "value": value},
+    )
+
+
+def test_normalize_events_is_idempotent(session):
+    a, b = Asset(symbol="EUR", kind="fx"), Asset(symbol="USD", kind="fx")
+    session.add_all([a, b])
+    session.commit()
+    events = [
+        _event(a.id, "t1", "macro", 1, 1),
+        _event(a.id, "t2", "macro", 2, 1),  # same (asset, key, ts): last wins
+        _event(b.id, "t3", "trend", 3, 2),
+    ]
+    assert normalize_events(session, events) == {a.id, b.id}
+    assert normalize_events(session, events) == {a.id, b.id}
+    rows = session.query(Indicator.asset_id, Indicator.key, Indicator.value).order_by(Indicator.id).all()
+    assert rows == [(a.id, "macro", 2.0), (b.id, "trend", 3.0)]
+
+    normalize_event(session, _event(a.id, "t4", "macro", 7, 1))
+    assert session.query(Indicator).filter_by(asset_id=a.id).one().value == 7.0
+
+
+def test_unparseable_payloads_do_not_fail_the_batch(session):
+    a = Asset(symbol="EUR", kind="fx")
+    session.add(a)
+    session.commit()
+    news = _event(a.id, "t1", "macro", 1, 1)
+    news.payload = {"headline": "rates unchanged"}
+    price = _event(a.id, "t2", "macro", 1, 1)
+    price.payload = {"key": "close", "value": "n/a"}
+    assert normalize_events(session, [news, price, _event(a.id, "t3", "trend", 3, 2)]) == {a.id}
+    assert session.query(Indicator.key, Indicator.value).all() == [("trend", 3.0)]
+
+
+def test_asset_stats_follow_inserted_indicators(session, monkeypatch):
+    from core.pipeline.stats import rebuild_asset_stats
+    from infra.db import AssetStats
+    from infra.settings import settings
+
+    monkeypatch.setattr(settings, "asset_stats_enabled", True)
+    a = Asset(symbol="EUR", kind="fx")
+    session.add(a)
+    session.commit()
+    normalize_events(session, [_event(a.id, "t1", "macro", 1, 1), _event(a.id, "t2", "trend", 1, 3)])
+    normalize_events(session, [_event(a.id, "t1", "macro", 5, 1), _event(a.id, "t3", "macro", 1, 2)])
+    stats = session.get(AssetStats, a.id)
+    assert (stats.indicator_count, stats.last_updated) == (3, datetime(2024, 1, 3))
+
+    session.query(AssetStats).delete()
+    assert rebuild_asset_stats(session) == 1
+    session.expire_all()
+    assert session.get(AssetStats, a.id).indicator_count == 3
@@ -0,0 +1,32 @@
+from __future__ import annotations
+
+import asyncio
+import json
+
+import fakeredis
+
+from infra import pubsub
+from infra.pubsub import Hub
+
+
+def _decode(data: bytes) -> tuple[str, bytes]:
+    return json.loads(data)["asset"], data
+
+
+def test_undecodable_message_does_not_stop_the_listener(monkeypatch):
+    server = fakeredis.FakeServer()
+    fake = fakeredis.FakeAsyncRedis(server=server)
+    monkeypatch.setattr(pubsub, "get_async_redis", lambda: fake)
+    publisher = fakeredis.FakeRedis(server=server)
+
+    async def scenario() -> list[bytes]:
+        hub = Hub(_decode, channel="test:updates")
+        subscription = await hub.subscribe({"EUR"})
+        publisher.publish("test:updates", b"{not json")
+        publisher.publish("test:updates", b'{"asset":"EUR"}')
+        try:
+            return await subscription.drain(timeout=5)
+        finally:
+            hub.unsubscribe(subscription)
+
+    assert asyncio.run(scenario()) == [b'{"asset":"EUR"}']
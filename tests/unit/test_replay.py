@@ -0,0 +1,111 @@
+from __future__ import annotations
+
+import json
+from datetime import datetime, timedelta
+from uuid import uuid4
+
+from sqlalchemy import select
+
+from core.pipeline.normalize import normalize_events
+from core.pipeline.replay import partition, replay
+from core.scoring.weights import CompiledWeights, registry
+from infra import db
+from infra.db import Asset, Event, Indicator, LatestScore
+from infra.settings import settings
+
+WEIGHTS = CompiledWeights.from_mapping(
+    {"version": "test", "pillars": {"Macro": {"components": {"macro": 1.0, "rates": 0.5}}}}
+)
+
+
+def _seed(session) -> list[Asset]:
+    assets = [Asset(symbol=f"A{i}", kind="fx") for i in range(4)]
+    session.add_all(assets)
+    session.commit()
+    start = datetime(2024, 1, 1)
+    for i in range(40):
+        session.add(
+            Event(
+                trace_id=str(uuid4()),
+                source="test",
+                asset_id=assets[i % 4].id,
+                kind="indicator",
+                ingested_at=start + timedelta(hours=i // 8),
+                payload={"key": "macro" if i % 3 else "rates", "value": i},
+            )
+        )
+    session.commit()
+    return assets
+
+
+def _indicators(session) -> dict[tuple, float]:
+    # Plain rows: the session is not expired on commit, so ORM objects would show stale values.
+    rows = session.execute(select(Indicator.asset_id, Indicator.key, Indicator.ts, Indicator.value))
+    return {(asset_id, key, ts): value for asset_id, key, ts, value in rows}
+
+
+def test_diff_reports_drift_and_run_repairs_it(session, monkeypatch, tmp_path):
+    monkeypatch.setattr(registry, "get", lambda version=None: WEIGHTS)
+    a0, a1, a2, a3 = _seed(session)
+    normalize_events(session, session.scalars(select(Event).order_by(Event.id)).all())
+    expected = _indicators(session)
+    drifted = session.scalars(select(Indicator).where(Indicator.asset_id == a1.id)).first()
+    drifted.value = 99.0
+    session.execute(Indicator.__table__.delete().where(Indicator.asset_id == a2.id))
+    session.commit()
+
+    report = replay(session, workers=0, batch_size=7, dry_run=True, checkpoint=None, archive_root="")
+    assert report.events == 40
+    diffs = {d.asset_id: (d.added, d.changed, d.orphaned) for d in report.diffs}
+    assert diffs[a1.id] == (0, 1, 0)
+    assert diffs[a2.id][0] > 0
+    assert all(d.score_changed for d in report.diffs)
+    assert session.query(LatestScore).count() == 0
+
+    report = replay(session, workers=0, batch_size=7, checkpoint=tmp_path / "cp.json", archive_root="")
+    assert (report.scored, _indicators(session)) == (4, expected)
+    assert not (tmp_path / "cp.json").exists()
+    assert replay(session, workers=0, dry_run=True, checkpoint=None, archive_root="").diffs == []
+
+
+def test_prune_replaces_indicators_and_bad_payloads_are_skipped(session, monkeypatch):
+    monkeypatch.setattr(registry, "get", lambda version=None: WEIGHTS)
+    a0, a1, a2, a3 = _seed(session)
+    session.add(Event(trace_id=str(uuid4()), source="test", asset_id=a0.id, kind="news",
+                      ingested_at=datetime(2024, 1, 2), payload={"headline": "no indicator"}))
+    assert replay(session, workers=0, checkpoint=None, archive_root="").skipped == 1
+    expected = _indicators(session)
+    # A newer point no event produces any more, e.g. from an older payload mapping.
+    session.add(Indicator(asset_id=a0.id, key="rates", ts=datetime(2025, 1, 1), value=50, meta={}))
+    session.commit()
+
+    kept = replay(session, workers=0, dry_run=True, checkpoint=None, archive_root="")
+    assert [(d.asset_id, d.orphaned, d.score_changed) for d in kept.diffs] == [(a0.id, 1, True)]
+    pruned = replay(session, workers=0, dry_run=True, checkpoint=None, archive_root="", prune=True)
+    assert [(d.asset_id, d.orphaned, d.score_changed) for d in pruned.diffs] == [(a0.id, 1, False)]
+
+    report = replay(session, workers=0, checkpoint=None, archive_root="", prune=True)
+    assert (report.events, report.skipped, report.pruned) == (41, 1, 1)
+    assert _indicators(session) == expected
+
+
+def test_process_pool_resumes_from_checkpoint(session, monkeypatch, tmp_path):
+    monkeypatch.setattr(registry, "get", lambda version=None: WEIGHTS)
+    monkeypatch.setattr(settings, "database_url", str(session.get_bind().url))
+    db.get_engine.cache_clear()
+    a0, a1, a2, a3 = _seed(session)
+    checkpoint = tmp_path / "cp.json"
+    report = {"assets": 1, "events": 10, "indicators": 0, "scored": 0, "diffs": []}
+    checkpoint.write_text(json.dumps({"mode": "run", "done": [a0.id], "report": report}))
+
+    try:
+        result = replay(session, workers=2, batch_size=3, checkpoint=checkpoint, archive_root="")
+    finally:
+        db.get_engine.cache_clear()
+    assert (result.assets, result.events, result.scored) == (4, 40, 4)
+    assert {asset_id for asset_id, _, _ in _indicators(session)} == {a1.id, a2.id, a3.id}
+
+
+def test_partition_balances_event_counts():
+    assert partition({1: 10, 2: 1, 3: 1, 4: 8, 5: 10}, 3) == [[1], [2, 3, 4], [5]]
+    assert partition({}, 4) == []
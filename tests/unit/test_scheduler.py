@@ -0,0 +1,59 @@
+from __future__ import annotations
+
+import fakeredis
+import pytest
+
+from core.pipeline import scheduler
+from infra.settings import settings
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = fakeredis.FakeRedis()
+    monkeypatch.setattr(scheduler, "get_redis", lambda: fake)
+    scheduler._script.cache_clear()
+    monkeypatch.setattr(settings, "recompute_debounce_seconds", 5.0)
+    monkeypatch.setattr(settings, "recompute_max_staleness_seconds", 12.0)
+    now = [1000.0]
+    monkeypatch.setattr(scheduler.time, "time", lambda: now[0])
+    yield now
+    scheduler._script.cache_clear()
+
+
+def test_requests_merge_within_window(clock):
+    assert scheduler.mark_dirty(1) == 5.0
+    assert scheduler.mark_dirty(1) is None
+    assert scheduler.mark_dirty(2) == 5.0
+
+    clock[0] += 3
+    assert scheduler.mark_dirty(1) is None  # pushes asset 1 to t=1008
+    clock[0] += 2
+    assert scheduler.claim_due(1) == pytest.approx(3.0)
+    assert scheduler.claim_due(2) == 0
+    assert scheduler.claim_due(2) is None
+
+
+def test_max_staleness_bounds_the_window(clock):
+    scheduler.mark_dirty(1)
+    for _ in range(5):
+        clock[0] += 4
+        scheduler.mark_dirty(1)
+    # Requests kept arriving, but the recompute is due 12s after the first one.
+    clock[0] = 1012.0
+    assert scheduler.claim_due(1) == 0
+
+
+def test_lost_job_is_rescheduled(clock, monkeypatch):
+    monkeypatch.setattr(settings, "recompute_lost_after_seconds", 30.0)
+    assert scheduler.mark_dirty(1) == 5.0
+    # The job scheduled for t=1005 never runs. Later requests push the entry to
+    # t=1012 (max staleness) and merge into it until it is 30s overdue.
+    clock[0] = 1030.0
+    assert scheduler.mark_dirty(1) is None
+    clock[0] = 1040.0
+    assert scheduler.mark_dirty(1) is None
+    clock[0] = 1043.0
+    assert scheduler.mark_dirty(1) == 5.0
+    assert scheduler.mark_dirty(1) is None
+    clock[0] = 1048.0
+    assert scheduler.claim_due(1) == 0
@@ -0,0 +1,62 @@
+from __future__ import annotations
+
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[2]
+
+# Cumulative import time per entry point in microseconds, as reported by -X importtime.
+# Roughly twice what a warm run takes today; raise it deliberately, not to make a failure go away.
+IMPORT_BUDGET_US = {"core.pipeline.jobs": 2_000_000, "api.main": 3_000_000}
+
+
+def _import(module: str, tmp_path: Path, check: str = "") -> subprocess.CompletedProcess:
+    env = {
+        **os.environ,
+        "DATABASE_URL": f"sqlite:///{tmp_path / 'app.db'}",
+        # Nothing listens here: importing must not need Redis.
+        "REDIS_URL": "redis://127.0.0.1:1/0",
+    }
+    return subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}\n{check}"],
+        cwd=ROOT,
+        env=env,
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+
+def _cumulative_us(stderr: str, module: str) -> int:
+    for line in stderr.splitlines():
+        parts = line.split("|")
+        if len(parts) == 3 and parts[2].strip() == module:
+            return int(parts[1])
+    raise AssertionError(f"{module} not in importtime output")
+
+
+# Builds no engine and no Redis client; the checks run after the import.
+NOTHING_BUILT = (
+    "from infra import db, redis\n"
+    "built = [f.__name__ for f in (db.get_engine, db.get_async_engine, redis.get_redis, redis.get_async_redis)"
+    " if f.cache_info().currsize]\n"
+    "assert not built, built\n"
+)
+
+
+def test_worker_import_skips_web_stack_and_fits_budget(tmp_path):
+    check = NOTHING_BUILT + (
+        "import sys\n"
+        "loaded = [m for m in ('fastapi', 'starlette', 'sqlalchemy.ext.asyncio') if m in sys.modules]\n"
+        "assert not loaded, loaded"
+    )
+    result = _import("core.pipeline.jobs", tmp_path, check)
+    assert _cumulative_us(result.stderr, "core.pipeline.jobs") < IMPORT_BUDGET_US["core.pipeline.jobs"]
+
+
+def test_app_import_has_no_side_effects_and_fits_budget(tmp_path):
+    result = _import("api.main", tmp_path, NOTHING_BUILT)
+    assert not (tmp_path / "app.db").exists()
+    assert _cumulative_us(result.stderr, "api.main") < IMPORT_BUDGET_US["api.main"]
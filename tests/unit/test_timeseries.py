@@ -0,0 +1,47 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta
+
+from core.timeseries import decode_cursor, encode_cursor, series_stmt
+from infra.db import Asset, Indicator
+
+
+def _seed(session) -> int:
+    asset = Asset(symbol="TS", kind="x")
+    session.add(asset)
+    session.commit()
+    start = datetime(2024, 1, 1)
+    for i in range(6):  # 20-minute spacing: three points per hour
+        ts = start + timedelta(minutes=20 * i)
+        session.add(Indicator(asset_id=asset.id, key="macro", ts=ts, value=i, meta={}))
+        session.add(Indicator(asset_id=asset.id, key="trend", ts=ts, value=-i, meta={}))
+    session.commit()
+    return asset.id
+
+
+def test_raw_series_keyset_pages(session):
+    asset_id = _seed(session)
+    page1 = session.execute(series_stmt(session, asset_id, ["macro"]).limit(4)).all()
+    after = decode_cursor(encode_cursor(page1[-1][1], page1[-1][0]))
+    page2 = session.execute(series_stmt(session, asset_id, ["macro"], after=after)).all()
+    assert [v for _, _, v in page1 + page2] == [0, 1, 2, 3, 4, 5]
+
+
+def test_bucketed_aggregates(session):
+    asset_id = _seed(session)
+    last = session.execute(series_stmt(session, asset_id, resolution="1h")).all()
+    assert [(k, ts.hour, v) for k, ts, v in last] == [("macro", 0, 2), ("trend", 0, -2), ("macro", 1, 5), ("trend", 1, -5)]
+    mean = session.execute(series_stmt(session, asset_id, ["macro"], resolution="1h", agg="mean")).all()
+    assert [v for _, _, v in mean] == [1.0, 4.0]
+    after = (last[1][1], last[1][0])
+    rest = session.execute(series_stmt(session, asset_id, resolution="1h", agg="max", after=after)).all()
+    assert [(k, v) for k, _, v in rest] == [("macro", 5), ("trend", -3)]
+
+
+def test_bucketed_pages_of_one_keep_every_key(session):
+    asset_id = _seed(session)
+    rows, after = [], None
+    while page := session.execute(series_stmt(session, asset_id, resolution="1h", after=after).limit(1)).all():
+        rows += page
+        after = decode_cursor(encode_cursor(page[-1][1], page[-1][0]))
+    assert [(k, ts.hour, v) for k, ts, v in rows] == [("macro", 0, 2), ("trend", 0, -2), ("macro", 1, 5), ("trend", 1, -5)]
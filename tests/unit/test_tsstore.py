@@ -0,0 +1,149 @@
+from __future__ import annotations
+
+from datetime import datetime, timedelta, timezone
+
+import os
+import sys
+import threading
+
+import numpy as np
+
+from core.pipeline.normalize import normalize_events
+from core.scoring.engine import latest_indicator_values
+from core.timeseries import series_stmt
+from infra import tsstore
+from infra.db import Asset, Event, Indicator
+from infra.settings import settings
+from infra.tsstore import TimeSeriesStore, check, rebuild, to_micros
+
+T0 = datetime(2024, 1, 1)
+
+
+def _row(key: str, minutes: int, value: float, asset_id: int = 1) -> dict:
+    return {"asset_id": asset_id, "key": key, "ts": T0 + timedelta(minutes=minutes), "value": value}
+
+
+def test_store_appends_merges_and_slices(tmp_path):
+    store = TimeSeriesStore(tmp_path)
+    store.write([_row("macro", 0, 1), _row("macro", 20, 2)])
+    store.write([_row("macro", 40, 3)])
+    # Out of order plus an update of an existing point.
+    store.write([_row("macro", 10, 1.5), _row("macro", 20, 2.5)])
+
+    series = store.series(1, "macro")
+    records = series.records()
+    assert records["value"].tolist() == [1, 1.5, 2.5, 3]
+    assert series.latest() == (to_micros(T0 + timedelta(minutes=40)), 3.0)
+    window = series.slice(to_micros(T0 + timedelta(minutes=10)), to_micros(T0 + timedelta(minutes=20)))
+    assert window["value"].tolist() == [1.5, 2.5]
+    assert np.shares_memory(window, records)
+    assert store.latest_values(1, ["macro", "nope"]) == {"macro": 3.0}
+    assert store.keys(1) == ["macro"]
+
+
+def test_store_points_match_database_order(session, tmp_path):
+    asset = Asset(symbol="TSS", kind="x")
+    session.add(asset)
+    session.commit()
+    rows = [_row(key, m, m * sign, asset.id) for m in range(0, 100, 20) for key, sign in (("trend", -1), ("macro", 1))]
+    session.add_all(Indicator(meta={}, **row) for row in rows)
+    session.commit()
+    store = TimeSeriesStore(tmp_path)
+    assert rebuild(session, store) == 2
+    assert check(session, store) == []
+
+    expected = [(k, ts, v) for k, ts, v in session.execute(series_stmt(session, asset.id))]
+    got = list(store.points(asset.id, ["trend", "macro"]))
+    assert [(k, ts.replace(tzinfo=None), v) for k, ts, v in got] == expected
+    after = (expected[4][1], expected[4][0])
+    resumed = [(k, ts.replace(tzinfo=None), v) for k, ts, v in store.points(asset.id, ["macro", "trend"], after=after)]
+    assert resumed == expected[5:]
+
+    store.write([_row("macro", 200, 9, asset.id)])
+    assert check(session, store) == [f"{asset.id}/macro: 6 points in store, 5 in database"]
+
+
+def test_normalization_feeds_store_and_scoring_reads_it(session, tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "tsstore_enabled", True)
+    monkeypatch.setattr(settings, "tsstore_dir", str(tmp_path))
+    asset = Asset(symbol="FED", kind="x")
+    session.add(asset)
+    session.commit()
+    store = tsstore.get_store()
+    # History from before the store: unknown to it until rebuilt.
+    session.add(Indicator(asset_id=asset.id, key="trend", ts=datetime(2023, 1, 1), value=2, meta={}))
+    session.commit()
+    assert store.coverage(asset.id) == ([], [])
+    assert rebuild(session, store) == 1
+
+    event = Event(
+        trace_id="t-1",
+        source="test",
+        asset_id=asset.id,
+        kind="indicator",
+        ingested_at=datetime(2024, 1, 1, tzinfo=timezone.utc),
+        payload={"key": "macro", "value": 4},
+    )
+    session.add(event)
+    session.commit()
+    normalize_events(session, [event])
+    assert store.coverage(asset.id) == (["macro", "trend"], ["macro", "trend"])
+    assert latest_indicator_values(session, asset.id, ["macro", "trend"]) == {"macro": 4.0, "trend": 2.0}
+
+    # A writer that committed but died before storing its points leaves the series pending.
+    row = {"asset_id": asset.id, "key": "macro", "ts": datetime(2024, 1, 2), "value": 6}
+    store.begin([row])
+    session.add(Indicator(meta={}, **row))
+    session.commit()
+    assert store.coverage(asset.id, ["macro"]) == (["macro"], [])
+    assert latest_indicator_values(session, asset.id, ["macro"]) == {"macro": 6.0}
+    assert check(session, store) == [f"{asset.id}/macro: 1 points in store, 2 in database"]
+    assert rebuild(session, store) == 2
+    assert store.coverage(asset.id, ["macro"]) == (["macro"], ["macro"])
+    assert check(session, store) == []
+
+
+def test_failed_commit_clears_pending_and_rebuild_drops_orphans(tmp_path):
+    store = TimeSeriesStore(tmp_path)
+    store.write([_row("macro", 0, 1)])
+    # Series the store did not build from the database have no watermark.
+    assert store.coverage(1, ["macro"]) == (["macro"], [])
+    store.series(1, "macro").reset(store.series(1, "macro").records().copy())
+    store.begin([_row("macro", 10, 2)])
+    assert store.coverage(1, ["macro"]) == (["macro"], [])
+    store.cancel([_row("macro", 10, 2)])
+    assert store.coverage(1, ["macro"]) == (["macro"], ["macro"])
+
+
+def test_store_bounds_open_mappings(tmp_path):
+    store = TimeSeriesStore(tmp_path, max_open=4)
+    store.write([_row(f"k{i}", 0, i) for i in range(50)])
+    before = len(os.listdir("/proc/self/fd"))
+    for i in range(50):
+        assert store.series(1, f"k{i}").latest()[1] == i
+    assert len(os.listdir("/proc/self/fd")) - before <= 4
+
+
+def test_series_cache_is_shared_safely_between_threads(tmp_path):
+    store = TimeSeriesStore(tmp_path, max_open=4)
+    interval = sys.getswitchinterval()
+    # Switch threads as often as possible so unguarded cache updates interleave.
+    sys.setswitchinterval(1e-6)
+    errors = []
+
+    def look_up(step: int) -> None:
+        try:
+            for i in range(20000):
+                store.series(1, f"k{i * step % 9}")
+        except Exception as exc:
+            errors.append(exc)
+
+    threads = [threading.Thread(target=look_up, args=(step,)) for step in range(1, 9)]
+    try:
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+    finally:
+        sys.setswitchinterval(interval)
+    assert errors == [] and len(store._series) == 4
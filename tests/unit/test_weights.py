@@ -0,0 +1,44 @@
+from __future__ import annotations
+
+import os
+
+import pytest
+
+from core.scoring.weights import WeightsRegistry
+
+WEIGHTS = """version: {version}
+pillars:
+  Macro:
+    components:
+      macro: {w}
+      rates: 0.5
+  Trend:
+    components:
+      trend: 1.0
+      macro: 2
+"""
+
+
+def test_registry_compiles_and_hot_reloads(tmp_path):
+    path = tmp_path / "weights.yaml"
+    path.write_text(WEIGHTS.format(version="1.0.0", w=1.0))
+    registry = WeightsRegistry(path)
+
+    v1 = registry.current()
+    assert registry.current() is v1
+    assert v1.keys == ("macro", "rates", "trend")
+    assert v1.pillars[1].keys == ("trend", "macro") and v1.pillars[1].weights == (1.0, 2.0)
+
+    path.write_text(WEIGHTS.format(version="1.1.0", w=3.0))
+    os.utime(path, ns=(0, os.stat(path).st_mtime_ns + 10**9))
+    v2 = registry.current()
+    assert v2.version == "1.1.0" and v2.pillars[0].weights == (3.0, 0.5)
+    assert registry.get("1.0.0") is v1
+    assert registry.versions() == ["1.0.0", "1.1.0"]
+
+    candidate = tmp_path / "candidate.yaml"
+    candidate.write_text(WEIGHTS.format(version="2.0.0-rc1", w=0.1))
+    registry.load(candidate)
+    assert registry.get("2.0.0-rc1").pillars[0].weights == (0.1, 0.5)
+    with pytest.raises(ValueError):
+        registry.get("9.9.9")